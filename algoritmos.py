@@ -1,7 +1,28 @@
-from typing import List, Tuple, Dict
-from models import CentroDistribuicao, Entrega, Caminhao
-from grafo import calcular_distancia, dijkstra, encontrar_nome_local
-import csv
+from typing import List, Tuple, Dict, Union
+from models import CentroDistribuicao, Entrega, Caminhao, EntregaBatch
+from busca_local import melhorar_rota
+from carregamento import carregar_entregas_em_lotes
+from malha_viaria import MalhaViaria
+from relatorio import Relatorio, DETALHADO, relatorio_padrao
+from grafo import (Grafo, GrafoMatriz, GrafoNos, ArvoreCaminhos, CacheCaminhos, RegistroLocais, calcular_distancia,
+                   calcular_distancias_haversine, coordenadas_esfera, distancia_entre, dijkstra, no_centro,
+                   no_entrega)
+import numpy as np
+
+# Acima deste número de centros a busca do centro mais próximo usa uma KD-tree
+LIMITE_CENTROS_INDICE_ESPACIAL = 64
+
+# Tolerância relativa usada para detectar empates entre centros
+TOLERANCIA_EMPATE = 1e-9
+
+# Estados da pré-verificação de viabilidade (pre_verificar_viabilidade)
+INVIAVEL, VIAVEL, INDEFINIDA = 0, 1, 2
+
+# Folga relativa da pré-verificação: as distâncias de ida e volta calculadas
+# em lote só diferem da soma trecho a trecho de verificar_viabilidade_entrega
+# por arredondamento, então fora desta faixa em torno do prazo a decisão é a
+# mesma; dentro dela a verificação exata é refeita
+FOLGA_VIABILIDADE = 1e-9
 
 def encontrar_centro_mais_proximo(centros: List[CentroDistribuicao], entrega: Entrega) -> CentroDistribuicao:
     """Encontra o centro de distribuição mais próximo para uma entrega"""
@@ -16,14 +37,133 @@ def encontrar_centro_mais_proximo(centros: List[CentroDistribuicao], entrega: En
     
     return centro_mais_proximo
 
-def atribuir_entregas_aos_centros(centros: List[CentroDistribuicao], entregas: List[Entrega]) -> None:
+def _desempatar_centros(centros: List[CentroDistribuicao], ponto: Tuple[float, float], candidatos) -> int:
+    """Escolhe entre centros quase empatados com a mesma regra de encontrar_centro_mais_proximo"""
+    melhor = -1
+    menor_distancia = float('inf')
+    
+    for i in sorted(int(c) for c in candidatos):
+        distancia = calcular_distancia(centros[i].localizacao, ponto)
+        if distancia < menor_distancia:
+            menor_distancia = distancia
+            melhor = i
+    
+    return melhor
+
+def _centros_mais_proximos_denso(centros: List[CentroDistribuicao], lat: np.ndarray, lon: np.ndarray,
+                                 tamanho_bloco: int) -> np.ndarray:
+    """Argmin vetorizado sobre a matriz entregas x centros, calculada em blocos"""
+    coordenadas_centros = np.array([centro.localizacao for centro in centros], dtype=np.float64)
+    lat_centros = coordenadas_centros[None, :, 0]
+    lon_centros = coordenadas_centros[None, :, 1]
+    resultado = np.empty(len(lat), dtype=np.int64)
+    
+    for inicio in range(0, len(lat), tamanho_bloco):
+        fim = min(inicio + tamanho_bloco, len(lat))
+        distancias = calcular_distancias_haversine(lat_centros, lon_centros,
+                                                   lat[inicio:fim, None], lon[inicio:fim, None])
+        melhores = np.argmin(distancias, axis=1)
+        menores = distancias[np.arange(fim - inicio), melhores]
+        
+        # Linhas com mais de um centro dentro da tolerância são resolvidas com o cálculo escalar
+        quase_empates = distancias <= (menores * (1 + TOLERANCIA_EMPATE) + TOLERANCIA_EMPATE)[:, None]
+        for linha in np.flatnonzero(quase_empates.sum(axis=1) > 1):
+            ponto = (float(lat[inicio + linha]), float(lon[inicio + linha]))
+            melhores[linha] = _desempatar_centros(centros, ponto, np.flatnonzero(quase_empates[linha]))
+        
+        resultado[inicio:fim] = melhores
+    
+    return resultado
+
+def _centros_mais_proximos_indice(centros: List[CentroDistribuicao], lat: np.ndarray, lon: np.ndarray,
+                                  k_candidatos: int = 4) -> np.ndarray:
+    """Consulta uma KD-tree sobre os centros (esfera unitária) e confirma os candidatos com Haversine"""
+    from scipy.spatial import cKDTree
+    
+    coordenadas_centros = np.array([centro.localizacao for centro in centros], dtype=np.float64)
+    arvore = cKDTree(coordenadas_esfera(coordenadas_centros))
+    k = min(k_candidatos, len(centros))
+    _, candidatos = arvore.query(coordenadas_esfera(np.column_stack((lat, lon))), k=k)
+    candidatos = candidatos.reshape(len(lat), k)
+    
+    distancias = calcular_distancias_haversine(coordenadas_centros[candidatos, 0], coordenadas_centros[candidatos, 1],
+                                               lat[:, None], lon[:, None])
+    posicoes = np.argmin(distancias, axis=1)
+    linhas = np.arange(len(lat))
+    resultado = candidatos[linhas, posicoes]
+    menores = distancias[linhas, posicoes]
+    
+    quase_empates = distancias <= (menores * (1 + TOLERANCIA_EMPATE) + TOLERANCIA_EMPATE)[:, None]
+    for linha in np.flatnonzero(quase_empates.sum(axis=1) > 1):
+        ponto = (float(lat[linha]), float(lon[linha]))
+        if k < len(centros) and quase_empates[linha, -1]:
+            # Pode haver outros centros empatados além dos k candidatos: busca completa
+            resultado[linha] = _desempatar_centros(centros, ponto, range(len(centros)))
+        else:
+            resultado[linha] = _desempatar_centros(centros, ponto, candidatos[linha, quase_empates[linha]])
+    
+    return resultado
+
+def encontrar_centros_mais_proximos(centros: List[CentroDistribuicao], entregas: Union[List[Entrega], EntregaBatch],
+                                    tamanho_bloco: int = 65536) -> np.ndarray:
+    """
+    Encontra, de uma vez, o centro de distribuição mais próximo de cada entrega.
+    
+    Com poucos centros calcula a matriz de distâncias entregas x centros em
+    blocos e aplica um argmin vetorizado; acima de LIMITE_CENTROS_INDICE_ESPACIAL
+    centros usa uma KD-tree. Quase empates são confirmados com calcular_distancia,
+    então o resultado é o mesmo de encontrar_centro_mais_proximo (inclusive o
+    desempate pelo primeiro centro da lista).
+    
+    Args:
+        centros: Lista de centros de distribuição
+        entregas: Lista de entregas ou EntregaBatch
+        tamanho_bloco: Número de entregas processadas por vez no modo denso
+        
+    Returns:
+        Array com o índice (na lista centros) do centro mais próximo de cada entrega
+    """
+    if len(entregas) == 0:
+        return np.empty(0, dtype=np.int64)
+    if not centros:
+        raise ValueError("É necessário pelo menos um centro de distribuição")
+    
+    if isinstance(entregas, EntregaBatch):
+        lat = entregas.latitude
+        lon = entregas.longitude
+    else:
+        coordenadas = np.array([entrega.destino_localizacao for entrega in entregas], dtype=np.float64)
+        lat = coordenadas[:, 0]
+        lon = coordenadas[:, 1]
+    
+    if len(centros) > LIMITE_CENTROS_INDICE_ESPACIAL:
+        return _centros_mais_proximos_indice(centros, lat, lon)
+    return _centros_mais_proximos_denso(centros, lat, lon, tamanho_bloco)
+
+def agrupar_entregas_por_centro(centros: List[CentroDistribuicao], lote: EntregaBatch) -> List[np.ndarray]:
+    """
+    Versão em colunas de atribuir_entregas_aos_centros: em vez de preencher
+    centro.entregas com objetos, retorna para cada centro o array de índices
+    (no lote) das entregas atribuídas a ele, na ordem do lote.
+    """
+    indices_centros = encontrar_centros_mais_proximos(centros, lote)
+    ordem = np.argsort(indices_centros, kind='stable')
+    limites = np.searchsorted(indices_centros[ordem], np.arange(len(centros) + 1))
+    return [ordem[limites[i]:limites[i + 1]] for i in range(len(centros))]
+
+def atribuir_entregas_aos_centros(centros: List[CentroDistribuicao], entregas: List[Entrega],
+                                  relatorio: Relatorio = None) -> None:
     """Atribui cada entrega ao centro de distribuição mais próximo"""
-    for entrega in entregas:
-        centro = encontrar_centro_mais_proximo(centros, entrega)
+    relatorio = relatorio_padrao(relatorio)
+    detalhar = relatorio.ativo(DETALHADO)
+    indices = encontrar_centros_mais_proximos(centros, entregas)
+    for entrega, i in zip(entregas, indices.tolist()):
+        centro = centros[i]
         centro.entregas.append(entrega)
-        print(f"Entrega {entrega.id} para {entrega.destino_nome} atribuída ao centro {centro.nome}")
+        if detalhar:
+            relatorio.registrar('entrega_centro', entrega.id, entrega.destino_nome, centro.nome)
 
-def estimar_tempo_rota(rota: List[Tuple[float, float]], velocidade_media: float) -> float:
+def estimar_tempo_rota(rota: List[Tuple[float, float]], velocidade_media: float, grafo: Grafo = None) -> float:
     """
     Estima o tempo total necessário para percorrer uma rota em horas.
     A distância é calculada em km e a velocidade em km/h.
@@ -31,40 +171,49 @@ def estimar_tempo_rota(rota: List[Tuple[float, float]], velocidade_media: float)
     Args:
         rota: Lista de pontos (latitude, longitude)
         velocidade_media: Velocidade média do caminhão em km/h
+        grafo: Grafo opcional; se for um GrafoMatriz, as distâncias são lidas da matriz;
+            se for uma MalhaViaria com velocidades, cada via é percorrida no máximo
+            à sua velocidade (MalhaViaria.tempo_caminho)
         
     Returns:
         Tempo estimado em horas
     """
     if len(rota) <= 1:
         return 0.0
+    if isinstance(grafo, MalhaViaria) and grafo.velocidades:
+        return grafo.tempo_caminho(rota, velocidade_media)
     
     # Calcula a distância total em km
-    distancia_total = sum(calcular_distancia(rota[i], rota[i+1]) for i in range(len(rota)-1))
+    distancia_total = sum(distancia_entre(grafo, rota[i], rota[i+1]) for i in range(len(rota)-1))
     
     # Tempo = distância / velocidade (em horas)
     tempo_estimado = distancia_total / velocidade_media
     
     return tempo_estimado
 
-def calcular_rota_entrega(grafo: Dict, origem: Tuple[float, float], destino: Tuple[float, float], 
-                          centros: List[CentroDistribuicao], todas_entregas: List[Entrega]) -> List[Tuple[float, float]]:
-    """Calcula a rota entre origem e destino e retorna o caminho"""
+def calcular_rota_entrega(grafo: Grafo, origem: Tuple[float, float], destino: Tuple[float, float], 
+                          centros: List[CentroDistribuicao], todas_entregas: List[Entrega],
+                          cache: CacheCaminhos = None) -> List[Tuple[float, float]]:
+    """Calcula a rota entre origem e destino (chaves do grafo) e retorna o caminho (usando o cache, se informado)"""
+    if cache is not None:
+        return cache.caminho(origem, destino)
     return dijkstra(grafo, origem, destino)
 
 def verificar_viabilidade_entrega(caminhao: Caminhao, entrega: Entrega, centro: CentroDistribuicao, 
-                                 grafo: Dict, centros: List[CentroDistribuicao], todas_entregas: List[Entrega]) -> bool:
+                                 grafo: Grafo, centros: List[CentroDistribuicao], todas_entregas: List[Entrega],
+                                 cache: CacheCaminhos = None) -> bool:
     """Verifica se é possível realizar a entrega dentro do prazo e limite de horas do caminhão"""
     # Simula a rota com esta entrega
-    origem = centro.localizacao
-    destino = entrega.destino_localizacao
+    origem = no_centro(grafo, centro)
+    destino = no_entrega(grafo, entrega)
     
     # Calcula a rota de ida e volta
-    rota_ida = calcular_rota_entrega(grafo, origem, destino, centros, todas_entregas)
-    rota_volta = calcular_rota_entrega(grafo, destino, origem, centros, todas_entregas)
+    rota_ida = calcular_rota_entrega(grafo, origem, destino, centros, todas_entregas, cache)
+    rota_volta = calcular_rota_entrega(grafo, destino, origem, centros, todas_entregas, cache)
     rota_completa = rota_ida + rota_volta[1:]  # Evita duplicar o ponto de destino
     
     # Estima o tempo necessário
-    tempo_estimado = estimar_tempo_rota(rota_completa, caminhao.velocidade_media)
+    tempo_estimado = estimar_tempo_rota(rota_completa, caminhao.velocidade_media, grafo)
     
     # Calcula quantos dias serão necessários baseado no limite de horas por dia
     dias_necessarios = tempo_estimado / caminhao.limite_de_horas
@@ -72,152 +221,294 @@ def verificar_viabilidade_entrega(caminhao: Caminhao, entrega: Entrega, centro:
         return False
     return True
 
-def atribuir_entregas_aos_caminhoes(centros: List[CentroDistribuicao], grafo: Dict, todas_entregas: List[Entrega]) -> None:
-    """Atribui entregas aos caminhões considerando capacidade, prazo e limite de horas"""
+def distancias_ida_e_volta(centro: CentroDistribuicao, entregas: List[Entrega], grafo: Grafo,
+                           cache: CacheCaminhos = None) -> np.ndarray:
+    """
+    Distância de caminho mais curto do centro até o destino de cada entrega e
+    de volta, para todas as entregas de uma vez: recortada da matriz no
+    GrafoMatriz; nos demais grafos, de uma única busca a partir do centro
+    (mais uma nas arestas invertidas, se o grafo tiver mão única).
+
+    Returns:
+        Array com a distância de ida e volta (km) de cada entrega (inf se inalcançável)
+    """
+    origem = no_centro(grafo, centro)
+    destinos = [no_entrega(grafo, entrega) for entrega in entregas]
+    if isinstance(grafo, GrafoMatriz):
+        i = grafo.indice[origem]
+        indices = np.fromiter((grafo.indice[destino] for destino in destinos), dtype=np.int64, count=len(destinos))
+        return (np.asarray(grafo.distancias[i, indices], dtype=np.float64) +
+                np.asarray(grafo.distancias[indices, i], dtype=np.float64))
+
+    if cache is None:
+        cache = CacheCaminhos(grafo)
+    ida = cache.arvore(origem).distancias_para(destinos)
+    reverso = getattr(grafo, 'reverso', grafo)
+    if reverso is grafo:
+        return ida + ida
+    if cache.hierarquia is not None:
+        volta = cache.hierarquia.tabela(destinos, [origem])[:, 0]
+    else:
+        volta = ArvoreCaminhos(reverso, origem).distancias_para(destinos)
+    return ida + volta
+
+def pre_verificar_viabilidade(centro: CentroDistribuicao, entregas: List[Entrega], grafo: Grafo,
+                              cache: CacheCaminhos = None) -> np.ndarray:
+    """
+    Versão em lote do teste de prazo de verificar_viabilidade_entrega para
+    todos os caminhões do centro e todas as entregas: (ida e volta / velocidade)
+    / limite_de_horas <= prazo, com as distâncias de distancias_ida_e_volta.
+
+    Resultados a menos de FOLGA_VIABILIDADE do prazo (e destinos
+    inalcançáveis) ficam INDEFINIDA, para a verificação exata decidir. Numa
+    MalhaViaria com velocidades por via, distância / velocidade_media é só o
+    menor tempo possível (as vias mais lentas atrasam o caminhão), então só
+    INVIAVEL é decidido aqui e o resto fica INDEFINIDA.
+
+    Returns:
+        Array (caminhões x entregas) com VIAVEL, INVIAVEL ou INDEFINIDA
+    """
+    estados = np.full((len(centro.caminhoes), len(entregas)), INDEFINIDA, dtype=np.int8)
+    if estados.size == 0:
+        return estados
+
+    distancias = distancias_ida_e_volta(centro, entregas, grafo, cache)
+    prazos = np.fromiter((entrega.prazo for entrega in entregas), dtype=np.float64, count=len(entregas))
+    velocidades = np.array([caminhao.velocidade_media for caminhao in centro.caminhoes], dtype=np.float64)
+    limites = np.array([caminhao.limite_de_horas for caminhao in centro.caminhoes], dtype=np.float64)
+
+    # Mesma ordem de operações de estimar_tempo_rota e verificar_viabilidade_entrega
+    dias = distancias[None, :] / velocidades[:, None] / limites[:, None]
+    with np.errstate(invalid='ignore'):
+        estados[dias * (1 + FOLGA_VIABILIDADE) <= prazos] = VIAVEL
+        estados[dias * (1 - FOLGA_VIABILIDADE) > prazos] = INVIAVEL
+    estados[~np.isfinite(dias)] = INDEFINIDA
+    if isinstance(grafo, MalhaViaria) and grafo.velocidades:
+        estados[estados == VIAVEL] = INDEFINIDA
+    return estados
+
+def atribuir_entregas_aos_caminhoes(centros: List[CentroDistribuicao], grafo: Grafo, todas_entregas: List[Entrega],
+                                    cache: CacheCaminhos = None, relatorio: Relatorio = None) -> None:
+    """
+    Atribui entregas aos caminhões considerando capacidade, prazo e limite de horas.
+    
+    O prazo de todas as combinações caminhão x entrega de um centro é testado
+    antes, em lote (pre_verificar_viabilidade); verificar_viabilidade_entrega
+    só é chamada nos casos a menos de FOLGA_VIABILIDADE do prazo, e as
+    decisões são as mesmas de chamá-la para cada combinação. Sem relatório
+    detalhado, as entregas inviáveis para um caminhão nem são percorridas.
+    
+    Os caminhos são consultados em um CacheCaminhos (criado aqui se não for
+    informado), então as buscas a partir do centro e de cada destino são feitas
+    uma única vez para todos os caminhões.
+    """
+    if cache is None:
+        cache = CacheCaminhos(grafo)
+    relatorio = relatorio_padrao(relatorio)
+    detalhar = relatorio.ativo(DETALHADO)
+    
     for centro in centros:
         # Ordena entregas por prazo (mais urgentes primeiro)
         centro.entregas.sort(key=lambda e: e.prazo)
+        entregas = centro.entregas
+        estados = pre_verificar_viabilidade(centro, entregas, grafo, cache)
+        atribuida = [False] * len(entregas)
         
-        for caminhao in centro.caminhoes:
+        for k, caminhao in enumerate(centro.caminhoes):
             capacidade_restante = caminhao.capacidade_max
             caminhao.entregas = []
+            estado = estados[k].tolist()
+            if detalhar:
+                candidatas = range(len(entregas))
+            else:
+                candidatas = np.flatnonzero(estados[k] != INVIAVEL).tolist()
             
             # Atribui entregas até encher o caminhão
-            for entrega in centro.entregas[:]:
-                if (entrega.peso <= capacidade_restante and 
-                    verificar_viabilidade_entrega(caminhao, entrega, centro, grafo, centros, todas_entregas)):
+            for j in candidatas:
+                if atribuida[j]:
+                    continue
+                entrega = entregas[j]
+                if (entrega.peso <= capacidade_restante and
+                    (estado[j] == VIAVEL or (estado[j] == INDEFINIDA and verificar_viabilidade_entrega(
+                        caminhao, entrega, centro, grafo, centros, todas_entregas, cache)))):
                     
                     caminhao.entregas.append(entrega)
                     capacidade_restante -= entrega.peso
-                    centro.entregas.remove(entrega)
-                    print(f"Entrega {entrega.id} atribuída ao caminhão {caminhao.id} do centro {centro.nome}")
-                else:
+                    atribuida[j] = True
+                    if detalhar:
+                        relatorio.registrar('entrega_caminhao', entrega.id, caminhao.id, centro.nome)
+                elif detalhar:
                     if entrega.peso > capacidade_restante:
-                        print(f"Entrega {entrega.id} excede capacidade do caminhão {caminhao.id}")
+                        relatorio.registrar('excede_capacidade', entrega.id, caminhao.id)
                     else:
-                        print(f"Entrega {entrega.id} não pode ser entregue a tempo pelo caminhão {caminhao.id}")
+                        relatorio.registrar('fora_do_prazo', entrega.id, caminhao.id)
+        
+        centro.entregas = [entrega for entrega, sim in zip(entregas, atribuida) if not sim]
         
         # Verifica se sobraram entregas não atribuídas
         if centro.entregas:
-            print(f"AVISO: {len(centro.entregas)} entregas não puderam ser atribuídas do centro {centro.nome}")
+            relatorio.registrar('nao_atribuidas', len(centro.entregas), centro.nome)
+
+def ordenar_paradas_vizinho_mais_proximo(caminhao: Caminhao, centro: CentroDistribuicao,
+                                         cache: CacheCaminhos) -> List[Tuple[Tuple[float, float], Entrega]]:
+    """
+    Ordena as paradas do caminhão pela heurística do vizinho mais próximo.
+    
+    A cada passo usa uma única busca (do cache) a partir da posição atual e
+    compara as distâncias até todos os destinos restantes de uma vez. Nos
+    grafos com chaves de coordenadas, entregas com as mesmas coordenadas são
+    atendidas na mesma parada; no GrafoNos cada entrega é uma parada.
+    
+    Returns:
+        Lista de (nó, entrega) na ordem de visita (o nó é o ponto, ou o ID no GrafoNos)
+    """
+    grafo = cache.grafo
+    posicao_atual = no_centro(grafo, centro)
+    destinos = [(no_entrega(grafo, entrega), entrega) for entrega in caminhao.entregas]
+    paradas = []
+    
+    # Enquanto houver destinos para visitar
+    while destinos:
+        # Encontra o destino mais próximo da posição atual (o primeiro, em caso de empate)
+        distancias = cache.arvore(posicao_atual).distancias_para([destino for destino, _ in destinos])
+        destino_mais_proximo, entrega_mais_proxima = destinos[int(np.argmin(distancias))]
+        
+        paradas.append((destino_mais_proximo, entrega_mais_proxima))
+        
+        # Remove o destino da lista
+        destinos = [(d, e) for d, e in destinos if d != destino_mais_proximo]
+        posicao_atual = destino_mais_proximo
+    
+    return paradas
+
+def melhorar_paradas(paradas: List[Tuple[Tuple[float, float], Entrega]], centro: CentroDistribuicao,
+                     cache: CacheCaminhos, max_iteracoes: int = 10000,
+                     tempo_limite: float = None) -> Tuple[List[Tuple[Tuple[float, float], Entrega]], float, float]:
+    """
+    Aplica 2-opt e Or-opt (busca_local.melhorar_rota) sobre a ordem das paradas,
+    usando a tabela de distâncias de caminho mais curto entre o centro e as paradas.
+    
+    Returns:
+        Tupla (paradas na nova ordem, distância antes, distância depois)
+    """
+    pontos = [no_centro(cache.grafo, centro)] + [ponto for ponto, _ in paradas]
+    tabela = cache.tabela(pontos)
+    
+    ordem, distancia_antes, distancia_depois = melhorar_rota(tabela, max_iteracoes=max_iteracoes,
+                                                             tempo_limite=tempo_limite)
+    return [paradas[i - 1] for i in ordem], distancia_antes, distancia_depois
 
-def calcular_rota_caminhao(grafo: Dict, caminhao: Caminhao, centro: CentroDistribuicao, centros: List[CentroDistribuicao], todas_entregas: List[Entrega]) -> List[Tuple[float, float]]:
-    """Calcula a rota para um caminhão fazer todas as suas entregas"""
+def calcular_rota_caminhao(grafo: Grafo, caminhao: Caminhao, centro: CentroDistribuicao, centros: List[CentroDistribuicao], todas_entregas: List[Entrega],
+                           cache: CacheCaminhos = None, registro: RegistroLocais = None, melhorar: bool = False,
+                           max_iteracoes_melhoria: int = 10000, tempo_limite_melhoria: float = None,
+                           manter_ordem: bool = False, relatorio: Relatorio = None) -> List[Tuple[float, float]]:
+    """
+    Calcula a rota para um caminhão fazer todas as suas entregas.
+    
+    A ordem de visita é construída pelo vizinho mais próximo (ou, com
+    manter_ordem=True, é a própria ordem de caminhao.entregas, como a deixada
+    por atribuir_entregas_por_economias) e, se melhorar=True, refinada com
+    2-opt e Or-opt dentro do limite de iterações ou de tempo.
+    Os nomes dos locais vêm do registro, que deve ser construído uma vez por
+    problema e compartilhado entre os caminhões. Os trechos percorridos são
+    registrados no relatório (impressos na hora se nenhum for informado).
+    """
     if not hasattr(caminhao, 'entregas') or not caminhao.entregas:
         return []
     
-    print(f"\n=== DETALHAMENTO DA ROTA PARA O CAMINHÃO {caminhao.id} DO CENTRO {centro.nome} ===")
-    print(f"Velocidade média: {caminhao.velocidade_media} km/h, Limite de horas por dia: {caminhao.limite_de_horas} horas")
+    if cache is None:
+        cache = CacheCaminhos(grafo)
+    if registro is None:
+        registro = RegistroLocais(centros, todas_entregas)
+    relatorio = relatorio_padrao(relatorio)
+    detalhar = relatorio.ativo(DETALHADO)
+    
+    relatorio.registrar('rota_inicio', caminhao.id, centro.nome, caminhao.velocidade_media, caminhao.limite_de_horas)
+    
+    if manter_ordem:
+        paradas = [(no_entrega(grafo, entrega), entrega) for entrega in caminhao.entregas]
+    else:
+        paradas = ordenar_paradas_vizinho_mais_proximo(caminhao, centro, cache)
+    if melhorar:
+        paradas, distancia_antes, distancia_depois = melhorar_paradas(paradas, centro, cache, max_iteracoes_melhoria,
+                                                                      tempo_limite_melhoria)
+        relatorio.registrar('melhoria', caminhao.id, distancia_antes, distancia_depois)
     
     # Começa no centro de distribuição
-    posicao_atual = centro.localizacao
+    posicao_atual = no_centro(grafo, centro)
     rota = [posicao_atual]
-    destinos = [(entrega.destino_localizacao, entrega) for entrega in caminhao.entregas]
     distancia_total = 0
+    tipo_posicao_atual = RegistroLocais.CENTRO
     
-    print(f"Partida: {centro.nome} {posicao_atual}")
+    if detalhar:
+        relatorio.registrar('partida', caminhao.id, centro.nome, centro.localizacao)
     
-    # Enquanto houver destinos para visitar
-    while destinos:
-        # Encontra o destino mais próximo da posição atual
-        destino_mais_proximo = None
-        entrega_mais_proxima = None
-        menor_distancia = float('inf')
-        melhor_caminho = None
+    # Percorre as paradas e, por fim, volta ao centro
+    trechos = [(destino, entrega) for destino, entrega in paradas] + [(no_centro(grafo, centro), None)]
+    for destino, entrega in trechos:
+        if entrega is not None:
+            tipo_destino = RegistroLocais.ENTREGA
+            if detalhar:
+                relatorio.registrar('trajeto_entrega', caminhao.id, entrega.id, entrega.destino_nome)
+        else:
+            tipo_destino = RegistroLocais.CENTRO
+            if detalhar:
+                relatorio.registrar('trajeto_retorno', caminhao.id, centro.nome)
         
-        for destino, entrega in destinos:
-            caminho = dijkstra(grafo, posicao_atual, destino)
-            distancia = sum(calcular_distancia(caminho[i], caminho[i+1]) for i in range(len(caminho)-1))
-            if distancia < menor_distancia:
-                menor_distancia = distancia
-                destino_mais_proximo = destino
-                entrega_mais_proxima = entrega
-                melhor_caminho = caminho
-        
-        # Adiciona o destino à rota
-        print(f"\nTrajeto para entrega {entrega_mais_proxima.id} ({entrega_mais_proxima.destino_nome}):")
+        caminho = cache.caminho(posicao_atual, destino)
         
         # Mostrar o caminho percorrido detalhadamente
-        for i in range(len(melhor_caminho) - 1):
-            ponto_atual = melhor_caminho[i]
-            proximo_ponto = melhor_caminho[i + 1]
-            distancia_trecho = calcular_distancia(ponto_atual, proximo_ponto)
+        for i in range(len(caminho) - 1):
+            ponto_atual = caminho[i]
+            proximo_ponto = caminho[i + 1]
+            distancia_trecho = distancia_entre(grafo, ponto_atual, proximo_ponto)
             distancia_total += distancia_trecho
             
-            nome_atual = encontrar_nome_local(ponto_atual, centros, todas_entregas)
-            nome_proximo = encontrar_nome_local(proximo_ponto, centros, todas_entregas)
-            
-            print(f"  {nome_atual} → {nome_proximo} ({distancia_trecho:.2f} km)")
+            if detalhar:
+                # Nas pontas do trajeto o tipo do local é conhecido (útil quando uma
+                # entrega tem as mesmas coordenadas de um centro)
+                nome_atual = registro.nome(ponto_atual, tipo_posicao_atual if i == 0 else None)
+                nome_proximo = registro.nome(proximo_ponto, tipo_destino if i == len(caminho) - 2 else None)
+                relatorio.registrar('trecho', caminhao.id, centro.nome, nome_atual, nome_proximo, distancia_trecho)
             
             # Adiciona ponto à rota
             if i > 0:  # O primeiro ponto já está na rota
                 rota.append(ponto_atual)
         
         # Adiciona o destino final à rota
-        rota.append(destino_mais_proximo)
-        
-        # Remove o destino da lista
-        destinos = [(d, e) for d, e in destinos if d != destino_mais_proximo]
-        posicao_atual = destino_mais_proximo
-    
-    # Calcular e exibir o caminho de volta ao centro
-    caminho_volta = dijkstra(grafo, posicao_atual, centro.localizacao)
-    print(f"\nRetorno para o centro {centro.nome}:")
-    
-    for i in range(len(caminho_volta) - 1):
-        ponto_atual = caminho_volta[i]
-        proximo_ponto = caminho_volta[i + 1]
-        distancia_trecho = calcular_distancia(ponto_atual, proximo_ponto)
-        distancia_total += distancia_trecho
-        
-        nome_atual = encontrar_nome_local(ponto_atual, centros, todas_entregas)
-        nome_proximo = encontrar_nome_local(proximo_ponto, centros, todas_entregas)
-        
-        print(f"  {nome_atual} → {nome_proximo} ({distancia_trecho:.2f} km)")
-        
-        # Adiciona ponto à rota (exceto o primeiro que já está)
-        if i > 0:
-            rota.append(ponto_atual)
-    
-    # Adiciona o último ponto (centro de distribuição)
-    rota.append(centro.localizacao)
+        rota.append(destino)
+        posicao_atual = destino
+        tipo_posicao_atual = tipo_destino
     
     # Calcula e exibe o tempo estimado
-    tempo_estimado = estimar_tempo_rota(rota, caminhao.velocidade_media)
+    tempo_estimado = estimar_tempo_rota(rota, caminhao.velocidade_media, grafo)
     dias_necessarios = tempo_estimado / caminhao.limite_de_horas
     
-    print(f"\nDistância total percorrida: {distancia_total:.2f} km")
-    print(f"Tempo estimado: {tempo_estimado:.2f} horas")
-    print(f"Dias necessários: {dias_necessarios:.2f} dias (considerando {caminhao.limite_de_horas} horas/dia)")
-    print(f"Total de entregas realizadas: {len(caminhao.entregas)}")
-    print("=" * 70)
+    relatorio.registrar('rota_fim', caminhao.id, distancia_total, tempo_estimado, dias_necessarios,
+                        caminhao.limite_de_horas, len(caminhao.entregas))
     
+    # No GrafoNos a rota foi percorrida em IDs; o caminhão guarda as coordenadas
+    if isinstance(grafo, GrafoNos):
+        rota = [grafo.pontos[no] for no in rota]
     return rota
 
-# Função que implementa a visualização com pygame
-def desenhar_mapa(centros, entregas, mostrar_rotas=True):
-    import pygame
-    
-    pygame.init()
-
-    # Aumenta a largura e altura da janela
-    screen_width, screen_height = 1400, 900
-    screen = pygame.display.set_mode((screen_width, screen_height))
-    pygame.display.set_caption("Mapa Logístico - Centros e Entregas (Distâncias em km)")
+# Cores do mapa
+BRANCO = (255, 255, 255)
+PRETO = (0, 0, 0)
+AZUL = (70, 130, 180)  # Azul para centros de distribuição e caminhões ímpares
+VERDE = (34, 139, 34)  # Verde para caminhões pares
+VERMELHO = (220, 20, 60)  # Vermelho para entregas
 
-    font = pygame.font.SysFont("Arial", 16)
-    clock = pygame.time.Clock()
+# Tons mais claros para as rotas
+AZUL_ROTA = (100, 149, 237)  # Azul mais claro para rotas de caminhões ímpares
+VERDE_ROTA = (60, 179, 113)  # Verde mais claro para rotas de caminhões pares
 
-    # Cores
-    branco = (255, 255, 255)
-    preto = (0, 0, 0)
-    azul = (70, 130, 180)  # Azul para centros de distribuição e caminhões ímpares
-    verde = (34, 139, 34)  # Verde para caminhões pares
-    vermelho = (220, 20, 60)  # Vermelho para entregas
-    
-    # Tons mais claros para as rotas
-    azul_rota = (100, 149, 237)  # Azul mais claro para rotas de caminhões ímpares
-    verde_rota = (60, 179, 113)  # Verde mais claro para rotas de caminhões pares
+def _renderizar_mapa(pygame, superficie, font, centros, entregas, mostrar_rotas=True):
+    """
+    Desenha a cena completa (rotas, centros, entregas, rótulos, escala e legenda)
+    na superfície. A cena é estática: é desenhada uma única vez e reaproveitada.
+    """
+    screen_width, screen_height = superficie.get_size()
 
     # Coleta das latitudes e longitudes
     latitudes = [loc.localizacao[0] for loc in centros] + [ent.destino_localizacao[0] for ent in entregas]
@@ -237,147 +528,170 @@ def desenhar_mapa(centros, entregas, mostrar_rotas=True):
         y = int(((max_lat + padding_lat - lat) / lat_range) * screen_height)
         return x, y
 
-    # Adiciona algumas informações sobre a escala
-    centro_coords = transformar_coords((min_lat + max_lat) / 2, (min_lon + max_lon) / 2)
-    
+    def transformar_rota(rota):
+        # Mesma conta de transformar_coords, para todos os pontos da rota de uma vez
+        coords = np.asarray(rota, dtype=np.float64)
+        x = ((coords[:, 1] - (min_lon - padding_lon)) / lon_range * screen_width).astype(np.int64)
+        y = ((max_lat + padding_lat - coords[:, 0]) / lat_range * screen_height).astype(np.int64)
+        return np.column_stack((x, y)).tolist()
+
     # Tenta calcular uma escala aproximada
     try:
         escala_100km_pixels = int(100 / (calcular_distancia((min_lat, min_lon), (min_lat, min_lon + 1)) * lon_range / screen_width))
     except:
         escala_100km_pixels = 100  # Valor padrão se o cálculo falhar
+
+    # Cada texto distinto é renderizado uma única vez
+    rotulos = {}
+    def rotulo(texto):
+        if texto not in rotulos:
+            rotulos[texto] = font.render(texto, True, PRETO)
+        return rotulos[texto]
+
+    superficie.fill(BRANCO)
+
+    # Desenhar as rotas dos caminhões
+    if mostrar_rotas:
+        for centro in centros:
+            for caminhao in centro.caminhoes:
+                if hasattr(caminhao, 'rota') and len(caminhao.rota) > 1:
+                    # Determina cor da rota baseada no ID do caminhão
+                    cor_rota = AZUL_ROTA if caminhao.id % 2 != 0 else VERDE_ROTA
+                    pygame.draw.lines(superficie, cor_rota, False, transformar_rota(caminhao.rota), 3)
+
+    # Desenhar centros
+    for centro in centros:
+        x, y = transformar_coords(*centro.localizacao)
+        pygame.draw.circle(superficie, AZUL, (x, y), 8)
+        text = rotulo(centro.nome)
+        superficie.blit(text, text.get_rect(center=(x, y - 12)))  # Nome centralizado acima
+
+    # Desenhar entregas
+    for entrega in entregas:
+        x, y = transformar_coords(*entrega.destino_localizacao)
+        pygame.draw.circle(superficie, VERMELHO, (x, y), 6)
+        text = rotulo(entrega.destino_nome)
+        superficie.blit(text, text.get_rect(center=(x, y - 12)))  # Nome centralizado acima
+
+    # Desenhar escala
+    pygame.draw.line(superficie, PRETO, (50, screen_height - 50), (50 + escala_100km_pixels, screen_height - 50), 2)
+    superficie.blit(rotulo("100 km"), (50, screen_height - 70))
+
+    # Legenda dos caminhões no canto inferior esquerdo
+    largura_legenda = 200
+    altura_legenda = 100
+    margem = 20  # Margem das bordas da tela
+    pos_x = margem
+    pos_y = screen_height - altura_legenda - margem
+
+    # Retângulo de fundo para a legenda
+    pygame.draw.rect(superficie, (240, 240, 240), (pos_x, pos_y, largura_legenda, altura_legenda), 0)
+    pygame.draw.rect(superficie, PRETO, (pos_x, pos_y, largura_legenda, altura_legenda), 1)
+    superficie.blit(rotulo("Legenda"), (pos_x + 10, pos_y + 10))
+
+    # Linha para caminhões ímpares
+    pygame.draw.line(superficie, AZUL_ROTA, (pos_x + 10, pos_y + 35), (pos_x + 50, pos_y + 35), 3)
+    superficie.blit(rotulo("Caminhão ID ímpar"), (pos_x + 60, pos_y + 30))
+
+    # Linha para caminhões pares
+    pygame.draw.line(superficie, VERDE_ROTA, (pos_x + 10, pos_y + 60), (pos_x + 50, pos_y + 60), 3)
+    superficie.blit(rotulo("Caminhão ID par"), (pos_x + 60, pos_y + 55))
+
+# Função que implementa a visualização com pygame
+def desenhar_mapa(centros, entregas, mostrar_rotas=True, arquivo_png: str = None):
+    """
+    Mostra o mapa com centros, entregas e rotas.
+    
+    A cena é desenhada uma única vez em uma superfície em cache; a janela só
+    redesenha as áreas marcadas como sujas (quando é exposta ou restaurada)
+    e espera eventos em vez de redesenhar a 30 FPS.
+    
+    Com arquivo_png o mapa é salvo direto em PNG, sem janela nem laço de
+    eventos: só o módulo de fontes do pygame é iniciado e a cena é desenhada
+    em uma Surface comum, então não é preciso vídeo (uso em servidores).
+    """
+    import pygame
+
+    # Aumenta a largura e altura da janela
+    screen_width, screen_height = 1400, 900
+
+    if arquivo_png is not None:
+        pygame.font.init()
+        try:
+            font = pygame.font.SysFont("Arial", 16)
+            cena = pygame.Surface((screen_width, screen_height))
+            _renderizar_mapa(pygame, cena, font, centros, entregas, mostrar_rotas)
+            pygame.image.save(cena, arquivo_png)
+        finally:
+            pygame.font.quit()
+        return
+
+    pygame.init()
+    font = pygame.font.SysFont("Arial", 16)
+
+    screen = pygame.display.set_mode((screen_width, screen_height))
+    pygame.display.set_caption("Mapa Logístico - Centros e Entregas (Distâncias em km)")
+
+    cena = pygame.Surface((screen_width, screen_height)).convert()
+    _renderizar_mapa(pygame, cena, font, centros, entregas, mostrar_rotas)
+
+    eventos_exposicao = {getattr(pygame, nome) for nome in ("VIDEOEXPOSE", "WINDOWEXPOSED", "WINDOWRESTORED",
+                                                           "WINDOWSHOWN") if hasattr(pygame, nome)}
+    sujos = [screen.get_rect()]
     
-    # Criar uma legenda para os caminhões
-    def desenhar_legenda():
-        # Configurações da legenda
-        largura_legenda = 200
-        altura_legenda = 100
-        margem = 20  # Margem das bordas da tela
-
-        #Posição no canto inferior esquerdo
-        pos_x = margem
-        pos_y = screen_height - altura_legenda - margem
-
-        #Retângulo de fundo para a legenda
-        pygame.draw.rect(screen, (240, 240, 240), (pos_x, pos_y, largura_legenda, altura_legenda), 0)
-        pygame.draw.rect(screen, preto, (pos_x, pos_y, largura_legenda, altura_legenda), 1)
-
-        # Título da legenda
-        titulo = font.render("Legenda", True, preto)
-        screen.blit(titulo, (pos_x + 10, pos_y + 10))
-
-        # Linha para caminhões ímpares
-        pygame.draw.line(screen, azul_rota, (pos_x + 10, pos_y + 35), (pos_x + 50, pos_y + 35), 3)
-        texto_impar = font.render("Caminhão ID ímpar", True, preto)
-        screen.blit(texto_impar, (pos_x + 60, pos_y + 30))
-
-        # Linha para caminhões pares
-        pygame.draw.line(screen, verde_rota, (pos_x + 10, pos_y + 60), (pos_x + 50, pos_y + 60), 3)
-        texto_par = font.render("Caminhão ID par", True, preto)
-        screen.blit(texto_par, (pos_x + 60, pos_y + 55))
-        
     rodando = True
     while rodando:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                rodando = False
-
-        screen.fill(branco)
-
-        # Desenhar as rotas dos caminhões
-        if mostrar_rotas:
-            for centro in centros:
-                for caminhao in centro.caminhoes:
-                    if hasattr(caminhao, 'rota') and caminhao.rota:
-                        pontos = [transformar_coords(lat, lon) for lat, lon in caminhao.rota]
-                        if len(pontos) > 1:
-                            # Determina cor da rota baseada no ID do caminhão
-                            cor_rota = azul_rota if caminhao.id % 2 != 0 else verde_rota
-                            pygame.draw.lines(screen, cor_rota, False, pontos, 3)  # Aumentei a espessura para 3
-
-        # Desenhar centros
-        for centro in centros:
-            lat, lon = centro.localizacao
-            x, y = transformar_coords(lat, lon)
-            pygame.draw.circle(screen, azul, (x, y), 8)
-            text = font.render(centro.nome, True, preto)
-
-            text_rect = text.get_rect(center=(x, y - 12))  # Nome centralizado acima
-            screen.blit(text, text_rect)
-
-        # Desenhar entregas
-        for entrega in entregas:
-            lat, lon = entrega.destino_localizacao
-            x, y = transformar_coords(lat, lon)
-            pygame.draw.circle(screen, vermelho, (x, y), 6)
-            text = font.render(entrega.destino_nome, True, preto)
-
-            text_rect = text.get_rect(center=(x, y - 12))  # Nome centralizado acima
-            screen.blit(text, text_rect)
-
-        # Desenhar escala
-        pygame.draw.line(screen, preto, (50, screen_height - 50), (50 + escala_100km_pixels, screen_height - 50), 2)
-        escala_text = font.render("100 km", True, preto)
-        screen.blit(escala_text, (50, screen_height - 70))
-        
-        # Desenhar legenda
-        desenhar_legenda()
+        if sujos:
+            for area in sujos:
+                screen.blit(cena, area, area)
+            pygame.display.update(sujos)
+            sujos = []
 
-        pygame.display.flip()
-        clock.tick(30)
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            rodando = False
+        elif event.type in eventos_exposicao:
+            sujos.append(screen.get_rect())
 
     pygame.quit()
 
-def carregar_entregas_csv(caminho_arquivo: str) -> List[Entrega]:
+def carregar_entregas_csv(caminho_arquivo: str, relatorio: Relatorio = None) -> List[Entrega]:
     """
     Carrega dados de entregas a partir de um arquivo CSV.
     
     O arquivo CSV deve ter o seguinte formato:
     id,latitude,longitude,destino_nome,peso,prazo
     
+    Linhas mal formadas são ignoradas e informadas, sem descartar o restante
+    do arquivo (ver carregamento.carregar_entregas_em_lotes).
+    
     Args:
         caminho_arquivo: Caminho para o arquivo CSV
+        relatorio: Relatório que recebe os avisos e o resumo do carregamento
+            (padrão: imprime na hora)
         
     Returns:
         Lista de objetos Entrega
     """
+    relatorio = relatorio_padrao(relatorio)
     entregas = []
+    erros = []
     
     try:
-        with open(caminho_arquivo, 'r', encoding='utf-8') as arquivo:
-            leitor_csv = csv.DictReader(arquivo)
-            
-            for linha in leitor_csv:
-                # Converter valores para os tipos corretos
-                id_entrega = int(linha['id'])
-                latitude = float(linha['latitude'])
-                longitude = float(linha['longitude'])
-                destino_nome = linha['destino_nome']
-                peso = float(linha['peso'])
-                prazo = int(linha['prazo'])
-                
-                # Criar objeto Entrega
-                entrega = Entrega(
-                    id=id_entrega,
-                    destino_localizacao=(latitude, longitude),
-                    destino_nome=destino_nome,
-                    peso=peso,
-                    prazo=prazo
-                )
-                
-                entregas.append(entrega)
-                
-        print(f"Carregadas {len(entregas)} entregas do arquivo {caminho_arquivo}")
+        for lote in carregar_entregas_em_lotes(caminho_arquivo, erros=erros):
+            entregas.extend(lote)
+        
+        for numero_linha, motivo in erros:
+            relatorio.registrar('mensagem', f"Aviso: linha {numero_linha} ignorada ({motivo})")
+        relatorio.registrar('mensagem', f"Carregadas {len(entregas)} entregas do arquivo {caminho_arquivo}")
         return entregas
     
     except FileNotFoundError:
-        print(f"Erro: Arquivo {caminho_arquivo} não encontrado.")
+        relatorio.registrar('mensagem', f"Erro: Arquivo {caminho_arquivo} não encontrado.")
         return []
     except KeyError as e:
-        print(f"Erro: Coluna obrigatória ausente no CSV: {e}")
-        return []
-    except ValueError as e:
-        print(f"Erro: Problema ao converter valor no CSV: {e}")
+        relatorio.registrar('mensagem', f"Erro: Coluna obrigatória ausente no CSV: {e}")
         return []
     except Exception as e:
-        print(f"Erro inesperado ao carregar o arquivo CSV: {e}")
+        relatorio.registrar('mensagem', f"Erro inesperado ao carregar o arquivo CSV: {e}")
         return []
\ No newline at end of file
@@ -0,0 +1,428 @@
+"""
+Benchmark do pipeline completo sobre cenários sintéticos.
+
+Gera nuvens de entregas com o formato do Brasil (semente fixa), mede o tempo
+e o pico de memória de cada etapa (leitura do CSV, construir_grafo,
+atribuir_entregas_aos_centros, atribuir_entregas_aos_caminhoes e
+calcular_rota_caminhao) para tamanhos crescentes, salva os resultados em JSON
+e aponta regressões em relação a um arquivo base.
+
+Exemplo:
+    python benchmark.py --tamanhos 100 1000 10000 100000 --saida atual.json --base base.json
+"""
+from typing import Callable, Dict, List, Tuple
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from models import CentroDistribuicao, Entrega, Caminhao
+from grafo import construir_grafo, construir_grafo_matriz, construir_grafo_nos, CacheCaminhos, RegistroLocais
+from algoritmos import (
+    atribuir_entregas_aos_centros,
+    atribuir_entregas_aos_caminhoes,
+    calcular_rota_caminhao,
+    carregar_entregas_csv
+)
+from economias import atribuir_entregas_por_economias
+from relatorio import Relatorio, SILENCIOSO
+
+# Versão do formato do arquivo de resultados
+VERSAO_RESULTADOS = 1
+
+# Contorno aproximado do Brasil (latitude, longitude)
+CONTORNO_BRASIL = [
+    (5.27, -60.73), (4.00, -59.50), (2.20, -56.00), (4.40, -51.60), (-0.50, -49.50), (-1.00, -48.00),
+    (-2.50, -44.20), (-2.90, -41.00), (-3.70, -38.50), (-5.10, -35.30), (-8.00, -34.80), (-12.90, -38.30),
+    (-18.00, -39.60), (-22.90, -41.90), (-23.90, -46.40), (-28.50, -48.80), (-33.70, -53.40), (-30.20, -57.60),
+    (-27.30, -55.60), (-25.60, -54.60), (-22.50, -55.70), (-20.00, -58.10), (-16.30, -60.00), (-13.50, -61.00),
+    (-11.00, -65.30), (-10.00, -67.00), (-11.00, -70.50), (-9.50, -73.20), (-7.50, -74.00), (-4.30, -69.90),
+    (1.20, -69.90), (1.90, -67.00), (0.90, -64.00), (4.00, -64.50)
+]
+
+# Capitais usadas como centros de distribuição e como núcleos das nuvens de entregas
+CAPITAIS = [
+    ("Belém", (-1.45, -48.48)), ("Recife", (-8.05, -34.88)), ("Brasília", (-15.78, -47.93)),
+    ("São Paulo", (-23.55, -46.63)), ("Florianópolis", (-27.59, -48.55)), ("Manaus", (-3.10, -60.02)),
+    ("Salvador", (-12.97, -38.50)), ("Fortaleza", (-3.73, -38.52)), ("Belo Horizonte", (-19.92, -43.94)),
+    ("Rio de Janeiro", (-22.91, -43.17)), ("Curitiba", (-25.43, -49.27)), ("Porto Alegre", (-30.03, -51.23)),
+    ("Goiânia", (-16.68, -49.25)), ("Cuiabá", (-15.60, -56.10)), ("Campo Grande", (-20.44, -54.65)),
+    ("Porto Velho", (-8.76, -63.90)), ("Rio Branco", (-9.97, -67.81)), ("Boa Vista", (2.82, -60.67)),
+    ("Macapá", (0.03, -51.07)), ("Palmas", (-10.18, -48.33)), ("São Luís", (-2.53, -44.30)),
+    ("Teresina", (-5.09, -42.80)), ("Natal", (-5.79, -35.21)), ("João Pessoa", (-7.12, -34.86)),
+    ("Maceió", (-9.67, -35.74)), ("Aracaju", (-10.91, -37.07)), ("Vitória", (-20.32, -40.34))
+]
+
+# Acima destes números de pontos os grafos densos não cabem na memória de uma
+# máquina comum (n² arestas); o grafo e as etapas seguintes são pulados
+LIMITE_PONTOS_DENSO = {'completo': 3000, 'nos': 3000, 'matriz': 20000}
+
+ETAPAS = ('carregar_csv', 'construir_grafo', 'atribuir_centros', 'atribuir_caminhoes', 'calcular_rotas')
+
+def _dentro_do_contorno(lat: np.ndarray, lon: np.ndarray, contorno: List[Tuple[float, float]]) -> np.ndarray:
+    """Teste do raio (par/ímpar) vetorizado: quais pontos estão dentro do polígono"""
+    dentro = np.zeros(len(lat), dtype=bool)
+    for (lat1, lon1), (lat2, lon2) in zip(contorno, contorno[1:] + contorno[:1]):
+        cruza = (lat1 > lat) != (lat2 > lat)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lon_corte = lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+        dentro ^= cruza & (lon < lon_corte)
+    return dentro
+
+def _pontos_no_brasil(rng: np.random.Generator, n: int, fracao_nucleos: float = 0.7,
+                      espalhamento: float = 1.5) -> np.ndarray:
+    """
+    Sorteia n pontos dentro do contorno: uma parte em torno das capitais
+    (nuvens gaussianas) e o restante uniforme no território.
+    """
+    capitais = np.array([coords for _, coords in CAPITAIS])
+    lat_min, lon_min = np.min(CONTORNO_BRASIL, axis=0)
+    lat_max, lon_max = np.max(CONTORNO_BRASIL, axis=0)
+    pontos = np.empty((0, 2))
+
+    while len(pontos) < n:
+        faltam = n - len(pontos)
+        nucleos = rng.random(faltam) < fracao_nucleos
+        candidatos = np.column_stack((rng.uniform(lat_min, lat_max, faltam), rng.uniform(lon_min, lon_max, faltam)))
+        escolhidas = capitais[rng.integers(0, len(capitais), faltam)]
+        candidatos[nucleos] = escolhidas[nucleos] + rng.normal(0.0, espalhamento, (int(nucleos.sum()), 2))
+        validos = candidatos[_dentro_do_contorno(candidatos[:, 0], candidatos[:, 1], CONTORNO_BRASIL)]
+        pontos = np.concatenate((pontos, validos))
+
+    return pontos[:n]
+
+def gerar_cenario(n_entregas: int, n_centros: int = 5, semente: int = 42,
+                  peso: Tuple[float, float] = (50.0, 800.0), prazo: Tuple[int, int] = (1, 30),
+                  entregas_por_caminhao: int = 20) -> Tuple[List[CentroDistribuicao], List[Entrega]]:
+    """
+    Gera um cenário sintético reprodutível.
+
+    Os centros são as primeiras capitais de CAPITAIS (e pontos sorteados no
+    território, se n_centros passar do número de capitais). A frota cresce
+    com o número de entregas, alternando os dois tipos de caminhão de
+    main.criar_dados_teste.
+
+    Args:
+        n_entregas: Número de entregas
+        n_centros: Número de centros de distribuição
+        semente: Semente do gerador de números aleatórios
+        peso: Faixa (mínimo, máximo) do peso das entregas em kg
+        prazo: Faixa (mínimo, máximo) do prazo em dias
+        entregas_por_caminhao: Entregas por caminhão usadas para dimensionar a frota
+
+    Returns:
+        Tupla (centros, entregas)
+    """
+    rng = np.random.default_rng(semente)
+
+    centros = [CentroDistribuicao(i + 1, nome, coords) for i, (nome, coords) in enumerate(CAPITAIS[:n_centros])]
+    if n_centros > len(CAPITAIS):
+        extras = _pontos_no_brasil(rng, n_centros - len(CAPITAIS), fracao_nucleos=0.0)
+        centros += [CentroDistribuicao(len(centros) + i + 1, f"Centro {len(centros) + i + 1}", (float(lat), float(lon)))
+                    for i, (lat, lon) in enumerate(extras)]
+
+    pontos = _pontos_no_brasil(rng, n_entregas)
+    pesos = rng.uniform(peso[0], peso[1], n_entregas)
+    prazos = rng.integers(prazo[0], prazo[1] + 1, n_entregas)
+    entregas = [Entrega(i + 1, (round(float(lat), 5), round(float(lon), 5)), f"Destino {i + 1}",
+                        round(float(p), 1), int(d))
+                for i, ((lat, lon), p, d) in enumerate(zip(pontos, pesos, prazos))]
+
+    caminhoes_por_centro = max(2, math.ceil(n_entregas / (n_centros * entregas_por_caminhao)))
+    id_caminhao = 1
+    for centro in centros:
+        for j in range(caminhoes_por_centro):
+            if j % 2 == 0:
+                caminhao = Caminhao(id_caminhao, 1000.0, velocidade_media=80.0, limite_de_horas=8.0)
+            else:
+                caminhao = Caminhao(id_caminhao, 8000.0, velocidade_media=60.0, limite_de_horas=12.0)
+            centro.caminhoes.append(caminhao)
+            id_caminhao += 1
+
+    return centros, entregas
+
+def escrever_entregas_csv(entregas: List[Entrega], caminho_arquivo: str) -> None:
+    """Grava as entregas no formato lido por carregar_entregas_csv"""
+    with open(caminho_arquivo, 'w', encoding='utf-8', newline='') as arquivo:
+        arquivo.write("id,latitude,longitude,destino_nome,peso,prazo\n")
+        arquivo.writelines(f"{e.id},{e.destino_localizacao[0]},{e.destino_localizacao[1]},\"{e.destino_nome}\","
+                           f"{e.peso},{e.prazo}\n" for e in entregas)
+
+def medir(funcao: Callable, memoria: bool = True):
+    """
+    Executa a função medindo o tempo (perf_counter) e, se memoria=True, o pico
+    de memória alocada durante a chamada (tracemalloc, que também registra os
+    arrays do NumPy). O tracemalloc deixa o código Python mais lento, por isso
+    pode ser desligado para medir só o tempo.
+
+    Returns:
+        Tupla (retorno da função, segundos, pico em MB ou None)
+    """
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        retorno = funcao()
+    finally:
+        segundos = time.perf_counter() - inicio
+        pico = None
+        if memoria:
+            pico = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+    return retorno, segundos, pico
+
+def executar_cenario(n_entregas: int, n_centros: int = 5, semente: int = 42, grafo: str = 'completo',
+                     motor: str = 'guloso', k_vizinhos: int = 8, memoria: bool = True,
+                     etapas_puladas: Tuple[str, ...] = ()) -> List[Dict]:
+    """
+    Mede cada etapa do pipeline para um cenário gerado por gerar_cenario.
+
+    Args:
+        n_entregas: Número de entregas do cenário
+        n_centros: Número de centros de distribuição
+        semente: Semente do gerador
+        grafo: 'completo' (construir_grafo), 'matriz' (construir_grafo_matriz),
+               'knn' (construir_grafo com k_vizinhos) ou 'nos' e 'knn_nos'
+               (os mesmos grafos sobre IDs inteiros, construir_grafo_nos)
+        motor: 'guloso' (atribuir_entregas_aos_caminhoes) ou 'economias'
+        k_vizinhos: Vizinhos por ponto no grafo 'knn'
+        memoria: Mede o pico de memória de cada etapa
+        etapas_puladas: Etapas que não devem ser executadas; como o pipeline é
+                        sequencial, as etapas seguintes também são puladas
+
+    Returns:
+        Lista de resultados, um dicionário por etapa executada
+    """
+    centros, entregas = gerar_cenario(n_entregas, n_centros, semente)
+    if n_entregas + n_centros > LIMITE_PONTOS_DENSO.get(grafo, float('inf')):
+        etapas_puladas = tuple(etapas_puladas) + ('construir_grafo',)
+    relatorio = Relatorio(SILENCIOSO)
+    resultados = []
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_csv = os.path.join(pasta, 'entregas.csv')
+        escrever_entregas_csv(entregas, caminho_csv)
+
+        def carregar():
+            return carregar_entregas_csv(caminho_csv, relatorio)
+
+        def construir():
+            if grafo == 'matriz':
+                return construir_grafo_matriz(centros, entregas)
+            if grafo == 'knn':
+                return construir_grafo(centros, entregas, k_vizinhos=k_vizinhos, relatorio=relatorio)
+            if grafo == 'nos':
+                return construir_grafo_nos(centros, entregas)
+            if grafo == 'knn_nos':
+                return construir_grafo_nos(centros, entregas, k_vizinhos=k_vizinhos, relatorio=relatorio)
+            return construir_grafo(centros, entregas)
+
+        estado = {}
+
+        def atribuir_caminhoes():
+            estado['cache'] = CacheCaminhos(estado['grafo'])
+            if motor == 'economias':
+                atribuir_entregas_por_economias(centros, estado['grafo'], estado['cache'], relatorio=relatorio)
+            else:
+                atribuir_entregas_aos_caminhoes(centros, estado['grafo'], entregas, estado['cache'], relatorio)
+
+        def calcular_rotas():
+            registro = RegistroLocais(centros, entregas, estado['grafo'])
+            for centro in centros:
+                for caminhao in centro.caminhoes:
+                    if caminhao.entregas:
+                        caminhao.rota = calcular_rota_caminhao(estado['grafo'], caminhao, centro, centros, entregas,
+                                                               estado['cache'], registro,
+                                                               manter_ordem=(motor == 'economias'), relatorio=relatorio)
+
+        def construir_e_guardar():
+            estado['grafo'] = construir()
+
+        passos = [
+            ('carregar_csv', carregar),
+            ('construir_grafo', construir_e_guardar),
+            ('atribuir_centros', lambda: atribuir_entregas_aos_centros(centros, entregas, relatorio)),
+            ('atribuir_caminhoes', atribuir_caminhoes),
+            ('calcular_rotas', calcular_rotas),
+        ]
+
+        for etapa, funcao in passos:
+            if etapa in etapas_puladas:
+                break
+            _, segundos, pico = medir(funcao, memoria)
+            resultados.append({
+                'n_entregas': n_entregas, 'n_centros': n_centros, 'grafo': grafo, 'motor': motor,
+                'etapa': etapa, 'segundos': segundos, 'pico_memoria_mb': pico
+            })
+
+    return resultados
+
+def executar_curva(tamanhos: List[int], tempo_limite: float = 60.0, **opcoes) -> List[Dict]:
+    """
+    Executa os cenários em ordem crescente de tamanho. Antes de cada tamanho
+    o tempo de cada etapa é estimado a partir do tamanho anterior supondo
+    crescimento quadrático; etapas com estimativa acima de tempo_limite
+    segundos (e as seguintes) são puladas, para que a curva chegue a 10^5
+    entregas sem rodar etapas quadráticas por horas.
+    """
+    # Rodada de aquecimento descartada: imports tardios (scipy, por exemplo) e
+    # caches do interpretador não devem entrar na medida do menor tamanho
+    executar_cenario(20, **dict(opcoes, memoria=False))
+
+    resultados = []
+    ultima_medida: Dict[str, Tuple[int, float]] = {}
+    for n in sorted(tamanhos):
+        puladas = tuple(etapa for etapa in ETAPAS if etapa in ultima_medida and
+                        ultima_medida[etapa][1] * (n / ultima_medida[etapa][0]) ** 2 > tempo_limite)
+        medidas = executar_cenario(n, etapas_puladas=puladas, **opcoes)
+        executadas = {medida['etapa'] for medida in medidas}
+        for medida in medidas:
+            ultima_medida[medida['etapa']] = (n, medida['segundos'])
+        resultados.extend(medidas)
+        imprimir_medidas(medidas, tuple(etapa for etapa in ETAPAS if etapa not in executadas))
+    return resultados
+
+def imprimir_medidas(medidas: List[Dict], puladas: Tuple[str, ...] = ()) -> None:
+    """Mostra as medidas de um cenário, uma linha por etapa"""
+    for medida in medidas:
+        pico = medida['pico_memoria_mb']
+        texto_pico = f"{pico:9.1f} MB" if pico is not None else ""
+        print(f"  n={medida['n_entregas']:>7} {medida['etapa']:<20} {medida['segundos']:10.4f} s {texto_pico}")
+    if puladas:
+        print(f"  etapas puladas (estimativa acima do tempo limite ou grafo denso grande demais): {', '.join(puladas)}")
+
+def expoentes_de_escala(resultados: List[Dict]) -> Dict[str, List[Tuple[int, int, float]]]:
+    """
+    Expoente empírico de crescimento de cada etapa entre tamanhos consecutivos:
+    log(t2 / t1) / log(n2 / n1) (1 ≈ linear, 2 ≈ quadrático).
+    """
+    por_etapa: Dict[str, List[Tuple[int, float]]] = {}
+    for medida in resultados:
+        por_etapa.setdefault(medida['etapa'], []).append((medida['n_entregas'], medida['segundos']))
+
+    expoentes = {}
+    for etapa, pontos in por_etapa.items():
+        pontos.sort()
+        expoentes[etapa] = [(n1, n2, math.log(t2 / t1) / math.log(n2 / n1))
+                            for (n1, t1), (n2, t2) in zip(pontos, pontos[1:]) if t1 > 0 and t2 > 0 and n2 > n1]
+    return expoentes
+
+def salvar_resultados(resultados: List[Dict], caminho_arquivo: str, parametros: Dict) -> None:
+    """Salva os resultados em JSON, com os parâmetros e o ambiente da execução"""
+    dados = {
+        'versao': VERSAO_RESULTADOS,
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'numpy': np.__version__,
+        'parametros': parametros,
+        'resultados': resultados
+    }
+    with open(caminho_arquivo, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False, indent=2)
+
+def carregar_resultados(caminho_arquivo: str) -> List[Dict]:
+    """Lê os resultados de um arquivo salvo por salvar_resultados"""
+    with open(caminho_arquivo, 'r', encoding='utf-8') as arquivo:
+        dados = json.load(arquivo)
+    if dados.get('versao') != VERSAO_RESULTADOS:
+        raise ValueError(f"Versão de resultados não suportada: {dados.get('versao')}")
+    return dados['resultados']
+
+def _chave_medida(medida: Dict) -> Tuple:
+    return medida['n_entregas'], medida['n_centros'], medida['grafo'], medida['motor'], medida['etapa']
+
+def medidas_comparaveis(resultados: List[Dict], base: List[Dict]) -> int:
+    """Número de medidas atuais com a mesma etapa (mesmo tamanho, grafo e motor) na base"""
+    referencia = {_chave_medida(medida) for medida in base}
+    return sum(_chave_medida(medida) in referencia for medida in resultados)
+
+def comparar_com_base(resultados: List[Dict], base: List[Dict], tolerancia: float = 0.25,
+                      tempo_minimo: float = 0.05, memoria_minima: float = 1.0) -> List[str]:
+    """
+    Compara cada etapa com a mesma etapa (mesmo tamanho, grafo e motor) da base.
+
+    Args:
+        resultados: Medidas atuais
+        base: Medidas de referência
+        tolerancia: Aumento relativo aceito (0.25 = 25%)
+        tempo_minimo: Etapas abaixo deste tempo na base são ignoradas na
+                      comparação de tempo (ruído de medição)
+        memoria_minima: Idem para o pico de memória, em MB
+
+    Returns:
+        Lista de descrições das regressões encontradas (vazia se nenhuma)
+    """
+    referencia = {_chave_medida(medida): medida for medida in base}
+    regressoes = []
+    for medida in resultados:
+        anterior = referencia.get(_chave_medida(medida))
+        if anterior is None:
+            continue
+        n, _, _, _, etapa = _chave_medida(medida)
+
+        if anterior['segundos'] >= tempo_minimo and medida['segundos'] > anterior['segundos'] * (1 + tolerancia):
+            regressoes.append(f"{etapa} (n={n}): tempo {anterior['segundos']:.4f} s → {medida['segundos']:.4f} s")
+
+        pico, pico_anterior = medida['pico_memoria_mb'], anterior['pico_memoria_mb']
+        if (pico is not None and pico_anterior is not None and pico_anterior >= memoria_minima and
+                pico > pico_anterior * (1 + tolerancia)):
+            regressoes.append(f"{etapa} (n={n}): memória {pico_anterior:.1f} MB → {pico:.1f} MB")
+
+    return regressoes
+
+def main(argumentos: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de otimização logística")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help="Números de entregas dos cenários")
+    parser.add_argument('--centros', type=int, default=5, help="Número de centros de distribuição")
+    parser.add_argument('--semente', type=int, default=42, help="Semente do gerador")
+    parser.add_argument('--grafo', choices=('completo', 'matriz', 'knn', 'nos', 'knn_nos'), default='completo')
+    parser.add_argument('--motor', choices=('guloso', 'economias'), default='guloso')
+    parser.add_argument('--k-vizinhos', type=int, default=8, help="Vizinhos por ponto no grafo knn")
+    parser.add_argument('--tempo-limite', type=float, default=60.0,
+                        help="Etapas acima deste tempo (s) não são repetidas nos tamanhos maiores")
+    parser.add_argument('--sem-memoria', action='store_true', help="Não mede o pico de memória (tracemalloc)")
+    parser.add_argument('--saida', help="Arquivo JSON onde salvar os resultados")
+    parser.add_argument('--base', help="Arquivo JSON de referência para detectar regressões")
+    parser.add_argument('--tolerancia', type=float, default=0.25, help="Aumento relativo aceito em relação à base")
+    args = parser.parse_args(argumentos)
+
+    opcoes = {'n_centros': args.centros, 'semente': args.semente, 'grafo': args.grafo, 'motor': args.motor,
+              'k_vizinhos': args.k_vizinhos, 'memoria': not args.sem_memoria}
+    print(f"Benchmark: grafo={args.grafo}, motor={args.motor}, centros={args.centros}, semente={args.semente}")
+    resultados = executar_curva(args.tamanhos, args.tempo_limite, **opcoes)
+
+    print("\nExpoentes de escala (log t / log n):")
+    for etapa, expoentes in expoentes_de_escala(resultados).items():
+        texto = ", ".join(f"{n1}→{n2}: {expoente:.2f}" for n1, n2, expoente in expoentes)
+        print(f"  {etapa:<20} {texto}")
+
+    if args.saida:
+        salvar_resultados(resultados, args.saida, dict(opcoes, tamanhos=args.tamanhos))
+        print(f"\nResultados salvos em {args.saida}")
+
+    if args.base:
+        base = carregar_resultados(args.base)
+        if not medidas_comparaveis(resultados, base):
+            # Sem tamanho, grafo e motor em comum nada foi comparado: não é um "sem regressões"
+            print(f"\nNenhuma medição comparável em {args.base} (tamanhos, grafo ou motor diferentes)")
+            return 2
+        regressoes = comparar_com_base(resultados, base, args.tolerancia)
+        if regressoes:
+            print(f"\nREGRESSÕES em relação a {args.base}:")
+            for regressao in regressoes:
+                print(f"  {regressao}")
+            return 1
+        print(f"\nSem regressões em relação a {args.base}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
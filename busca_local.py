@@ -0,0 +1,176 @@
+from typing import List, Tuple
+import time
+import numpy as np
+
+# Melhorias menores que isto (em km) são ignoradas para evitar ciclos por arredondamento
+EPSILON_MELHORIA = 1e-9
+
+# Diferença relativa aceita entre d(i, j) e d(j, i) numa tabela simétrica (as
+# buscas a partir de cada ponto somam as mesmas arestas em outra ordem)
+TOLERANCIA_SIMETRIA = 1e-9
+
+def tabela_simetrica(distancias) -> bool:
+    """
+    A tabela tem d(i, j) = d(j, i), a menos de arredondamento. Não tem quando
+    vem de uma malha viária com mão única: inverter um trecho muda o seu comprimento.
+    """
+    tabela = np.asarray(distancias, dtype=np.float64)
+    return bool(np.allclose(tabela, tabela.T, rtol=TOLERANCIA_SIMETRIA, atol=TOLERANCIA_SIMETRIA))
+
+def comprimento_ciclo(ciclo: List[int], distancias: List[List[float]]) -> float:
+    """Comprimento de um ciclo fechado (a última parada volta para a primeira)"""
+    return sum(distancias[ciclo[i - 1]][ciclo[i]] for i in range(len(ciclo))) if len(ciclo) > 1 else 0.0
+
+def _listas_vizinhos(distancias: np.ndarray, vizinhos: int) -> List[List[int]]:
+    """Para cada nó, os índices dos nós mais próximos em ordem crescente de distância"""
+    n = len(distancias)
+    k = min(vizinhos, n - 1)
+    listas = []
+    for i in range(n):
+        linha = distancias[i].copy()
+        linha[i] = np.inf
+        candidatos = np.argpartition(linha, k - 1)[:k] if k < n - 1 else np.flatnonzero(np.isfinite(linha))
+        listas.append(candidatos[np.argsort(linha[candidatos], kind='stable')].tolist())
+    return listas
+
+def _inverter(ciclo: List[int], i: int, j: int) -> None:
+    """
+    Inverte as posições i..j do ciclo. O depósito fica sempre na posição 0:
+    se o trecho o incluir, inverte o complemento, que gera o mesmo ciclo.
+    """
+    if i >= 1:
+        ciclo[i:j + 1] = ciclo[i:j + 1][::-1]
+    else:
+        ciclo[j + 1:] = ciclo[j + 1:][::-1]
+
+def _passo_dois_opt(ciclo: List[int], d: List[List[float]], vizinhos: List[List[int]]) -> bool:
+    """Procura e aplica o primeiro movimento 2-opt que melhora o ciclo"""
+    n = len(ciclo)
+    posicao = {no: i for i, no in enumerate(ciclo)}
+
+    for i in range(n):
+        a = ciclo[i]
+        a_prox = ciclo[(i + 1) % n]
+        a_ant = ciclo[i - 1]
+
+        for b in vizinhos[a]:
+            d_ab = d[a][b]
+            if d_ab >= d[a][a_prox] and d_ab >= d[a_ant][a]:
+                break  # Nenhum vizinho mais distante pode gerar ganho
+            j = posicao[b]
+
+            # Troca as arestas (a, a_prox) e (b, b_prox) por (a, b) e (a_prox, b_prox)
+            b_prox = ciclo[(j + 1) % n]
+            if b != a_prox and b_prox != a:
+                delta = d_ab + d[a_prox][b_prox] - d[a][a_prox] - d[b][b_prox]
+                if delta < -EPSILON_MELHORIA:
+                    if i < j:
+                        _inverter(ciclo, i + 1, j)
+                    else:
+                        _inverter(ciclo, j + 1, i)
+                    return True
+
+            # Troca as arestas (a_ant, a) e (b_ant, b) por (a, b) e (a_ant, b_ant)
+            b_ant = ciclo[j - 1]
+            if b != a_ant and b_ant != a:
+                delta = d_ab + d[a_ant][b_ant] - d[a_ant][a] - d[b_ant][b]
+                if delta < -EPSILON_MELHORIA:
+                    if i < j:
+                        _inverter(ciclo, i, j - 1)
+                    else:
+                        _inverter(ciclo, j, i - 1)
+                    return True
+
+    return False
+
+def _passo_or_opt(ciclo: List[int], d: List[List[float]], vizinhos: List[List[int]], max_segmento: int) -> bool:
+    """
+    Procura e aplica o primeiro movimento Or-opt que melhora o ciclo: um trecho
+    de até max_segmento paradas consecutivas é movido (possivelmente invertido)
+    para junto de um de seus vizinhos mais próximos.
+    """
+    n = len(ciclo)
+    posicao = {no: i for i, no in enumerate(ciclo)}
+
+    for tamanho in range(1, max_segmento + 1):
+        # O trecho não pode conter o depósito (posição 0)
+        for i in range(1, n - tamanho + 1):
+            trecho = ciclo[i:i + tamanho]
+            inicio, fim = trecho[0], trecho[-1]
+            anterior = ciclo[i - 1]
+            proximo = ciclo[(i + tamanho) % n]
+            ganho_remocao = d[anterior][inicio] + d[fim][proximo] - d[anterior][proximo]
+            if ganho_remocao <= EPSILON_MELHORIA:
+                continue
+
+            melhor = None
+            for ponta, outra in ((inicio, fim), (fim, inicio)):
+                for c in vizinhos[ponta]:
+                    if d[ponta][c] >= ganho_remocao:
+                        break
+                    j = posicao[c]
+                    if i <= j < i + tamanho:
+                        continue
+
+                    # Insere entre (c, sucessor) e entre (antecessor, c), com a ponta ao lado de c
+                    for x, y, primeiro, ultimo in ((c, ciclo[(j + 1) % n], ponta, outra),
+                                                   (ciclo[j - 1], c, outra, ponta)):
+                        if x in trecho or y in trecho:
+                            continue
+                        delta = d[x][primeiro] + d[ultimo][y] - d[x][y] - ganho_remocao
+                        if delta < -EPSILON_MELHORIA and (melhor is None or delta < melhor[0]):
+                            melhor = (delta, x, primeiro != inicio)
+
+            if melhor is not None:
+                _, x, invertido = melhor
+                del ciclo[i:i + tamanho]
+                if invertido:
+                    trecho.reverse()
+                k = ciclo.index(x) + 1
+                ciclo[k:k] = trecho
+                return True
+
+    return False
+
+def melhorar_rota(distancias, ordem: List[int] = None, vizinhos: int = 8, max_segmento: int = 3,
+                  max_iteracoes: int = 10000, tempo_limite: float = None) -> Tuple[List[int], float, float]:
+    """
+    Melhora uma rota fechada com movimentos 2-opt e Or-opt.
+
+    Cada movimento é avaliado em tempo constante a partir da tabela de
+    distâncias, e apenas os vizinhos mais próximos de cada parada são
+    examinados. A busca para quando nenhum movimento melhora a rota ou quando
+    o limite de iterações ou de tempo é atingido. Os ganhos supõem a tabela
+    simétrica (2-opt e Or-opt invertem trechos); se ela não for
+    (tabela_simetrica), a ordem é devolvida sem alteração.
+
+    Args:
+        distancias: Tabela (n x n) de distâncias; o índice 0 é o depósito
+        ordem: Ordem inicial de visita das paradas 1..n-1 (padrão: 1, 2, ..., n-1)
+        vizinhos: Tamanho das listas de vizinhos examinadas por parada
+        max_segmento: Maior trecho movido pelo Or-opt
+        max_iteracoes: Número máximo de movimentos aplicados
+        tempo_limite: Tempo máximo em segundos (None = sem limite)
+
+    Returns:
+        Tupla (ordem melhorada, distância antes, distância depois)
+    """
+    tabela = np.asarray(distancias, dtype=np.float64)
+    n = len(tabela)
+    ciclo = [0] + (list(ordem) if ordem is not None else list(range(1, n)))
+    d = tabela.tolist()
+    distancia_antes = comprimento_ciclo(ciclo, d)
+
+    if n < 4 or not tabela_simetrica(tabela):
+        return ciclo[1:], distancia_antes, distancia_antes
+
+    listas = _listas_vizinhos(tabela, vizinhos)
+    fim = time.perf_counter() + tempo_limite if tempo_limite is not None else None
+    iteracoes = 0
+
+    while iteracoes < max_iteracoes and (fim is None or time.perf_counter() < fim):
+        if not (_passo_dois_opt(ciclo, d, listas) or _passo_or_opt(ciclo, d, listas, max_segmento)):
+            break
+        iteracoes += 1
+
+    return ciclo[1:], distancia_antes, comprimento_ciclo(ciclo, d)
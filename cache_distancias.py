@@ -0,0 +1,175 @@
+from typing import List, Optional, Tuple
+import glob
+import hashlib
+import os
+import numpy as np
+from grafo import GrafoMatriz, calcular_distancias_haversine, calcular_matriz_distancias
+
+class CacheDistancias:
+    """
+    Cache em disco de matrizes de distâncias, reaproveitado entre execuções.
+
+    Cada matriz é gravada como um arquivo .npy identificado por um hash das
+    coordenadas (do conjunto de pontos, sem depender da ordem), junto com
+    os pontos na ordem das linhas. Os dois arquivos levam no nome também um
+    hash dessa ordem e são gravados em temporários e renomeados (os pontos
+    antes da matriz): escritores concorrentes da mesma chave com ordens
+    diferentes gravam pares de arquivos diferentes, e a leitura confere os
+    pontos com o hash do nome, de modo que uma matriz nunca é lida com os
+    pontos de outra. Em uma nova execução:
+
+    - mesmo conjunto de pontos: a matriz é mapeada em memória (np.load com
+      mmap_mode='r'), sem cópia e sem recálculo; as páginas vêm do cache do
+      sistema operacional sob demanda e podem ser compartilhadas entre processos;
+    - conjunto que contém um conjunto já gravado mais alguns pontos novos: o
+      bloco gravado é copiado para o novo arquivo e só as linhas e colunas dos
+      pontos novos são calculadas;
+    - caso contrário, a matriz é calculada direto no arquivo novo.
+
+    As matrizes mapeadas são somente leitura; GrafoMatriz.adicionar_ponto
+    continua funcionando porque copia a matriz para a sua área reservada.
+    """
+
+    EXTENSAO_MATRIZ = '.distancias.npy'
+    EXTENSAO_PONTOS = '.pontos.npy'
+
+    def __init__(self, pasta: str = '.cache_distancias', dtype=np.float64, fracao_minima_reaproveitada: float = 0.5,
+                 tamanho_bloco: int = 1024):
+        """
+        Args:
+            pasta: Diretório dos arquivos do cache
+            dtype: Tipo das matrizes gravadas (float32 ocupa metade do espaço)
+            fracao_minima_reaproveitada: Só estende uma matriz gravada se ela
+                cobrir ao menos esta fração dos pontos pedidos
+            tamanho_bloco: Linhas copiadas ou calculadas por vez ao gravar
+        """
+        self.pasta = pasta
+        self.dtype = np.dtype(dtype)
+        self.fracao_minima_reaproveitada = fracao_minima_reaproveitada
+        self.tamanho_bloco = tamanho_bloco
+        self.acertos = 0
+        self.extensoes = 0
+        self.falhas = 0
+        os.makedirs(pasta, exist_ok=True)
+
+    def chave(self, pontos: List[Tuple[float, float]]) -> str:
+        """Hash do conjunto de coordenadas (e do dtype), independente da ordem"""
+        coordenadas = np.asarray(pontos, dtype=np.float64).reshape(-1, 2)
+        ordenadas = coordenadas[np.lexsort((coordenadas[:, 1], coordenadas[:, 0]))]
+        resumo = hashlib.sha1(self.dtype.str.encode())
+        resumo.update(np.ascontiguousarray(ordenadas).tobytes())
+        return resumo.hexdigest()
+
+    @staticmethod
+    def _hash_ordem(coordenadas: np.ndarray) -> str:
+        """Hash dos pontos na ordem das linhas da matriz"""
+        return hashlib.sha1(np.ascontiguousarray(coordenadas, dtype=np.float64).tobytes()).hexdigest()[:16]
+
+    def _caminhos(self, chave: str, ordem: str) -> Tuple[str, str]:
+        base = os.path.join(self.pasta, f"{chave}.{ordem}")
+        return base + self.EXTENSAO_MATRIZ, base + self.EXTENSAO_PONTOS
+
+    def _abrir_par(self, chave: str, ordem: str) -> Optional[GrafoMatriz]:
+        """Grafo de um par de arquivos, se os dois existirem e os pontos conferirem com o hash do nome"""
+        caminho_matriz, caminho_pontos = self._caminhos(chave, ordem)
+        if not (os.path.exists(caminho_matriz) and os.path.exists(caminho_pontos)):
+            return None
+        coordenadas = np.load(caminho_pontos)
+        distancias = np.load(caminho_matriz, mmap_mode='r')
+        if self._hash_ordem(coordenadas) != ordem or distancias.shape != (len(coordenadas), len(coordenadas)):
+            return None
+        return GrafoMatriz([tuple(ponto) for ponto in coordenadas.tolist()], distancias)
+
+    def _abrir(self, chave: str) -> Optional[GrafoMatriz]:
+        """Grafo de qualquer ordem gravada para a chave"""
+        for caminho_matriz in sorted(glob.glob(os.path.join(self.pasta, f"{chave}.*{self.EXTENSAO_MATRIZ}"))):
+            ordem = os.path.basename(caminho_matriz)[len(chave) + 1:-len(self.EXTENSAO_MATRIZ)]
+            grafo = self._abrir_par(chave, ordem)
+            if grafo is not None:
+                return grafo
+        return None
+
+    def _maior_subconjunto(self, pontos: List[Tuple[float, float]]) -> Optional[GrafoMatriz]:
+        """Matriz gravada com mais pontos cujos pontos estão todos entre os pedidos"""
+        pedidos = set(pontos)
+        minimo = self.fracao_minima_reaproveitada * len(pedidos)
+        melhor = None
+        for caminho_pontos in glob.glob(os.path.join(self.pasta, '*' + self.EXTENSAO_PONTOS)):
+            gravados = np.load(caminho_pontos, mmap_mode='r')
+            if not minimo <= len(gravados) < len(pedidos) or (melhor is not None and len(gravados) <= len(melhor[1])):
+                continue
+            pontos_gravados = [tuple(ponto) for ponto in gravados.tolist()]
+            if all(ponto in pedidos for ponto in pontos_gravados):
+                chave, ordem = os.path.basename(caminho_pontos)[:-len(self.EXTENSAO_PONTOS)].split('.', 1)
+                grafo = self._abrir_par(chave, ordem)
+                if grafo is not None:
+                    melhor = (grafo, pontos_gravados)
+        return melhor[0] if melhor is not None else None
+
+    def _gravar(self, chave: str, pontos: List[Tuple[float, float]], base: GrafoMatriz = None) -> None:
+        """
+        Grava a matriz dos pontos em um arquivo novo. Com base, os pontos dela
+        devem ser os primeiros da lista e o seu bloco é só copiado.
+        """
+        coordenadas = np.asarray(pontos, dtype=np.float64).reshape(-1, 2)
+        caminho_matriz, caminho_pontos = self._caminhos(chave, self._hash_ordem(coordenadas))
+        # Os pontos vão primeiro: uma matriz visível sempre tem o seu arquivo de pontos
+        temporario_pontos = f"{caminho_pontos}.{os.getpid()}.tmp"
+        with open(temporario_pontos, 'wb') as arquivo:
+            np.save(arquivo, coordenadas)
+        os.replace(temporario_pontos, caminho_pontos)
+
+        temporario = f"{caminho_matriz}.{os.getpid()}.tmp"
+        n = len(pontos)
+        matriz = np.lib.format.open_memmap(temporario, mode='w+', dtype=self.dtype, shape=(n, n))
+        try:
+            if base is None:
+                calcular_matriz_distancias(pontos, dtype=self.dtype, tamanho_bloco=self.tamanho_bloco, saida=matriz)
+            else:
+                m = len(base)
+                lat, lon = coordenadas[:, 0], coordenadas[:, 1]
+                for inicio in range(0, m, self.tamanho_bloco):
+                    fim = min(inicio + self.tamanho_bloco, m)
+                    matriz[inicio:fim, :m] = base.distancias[inicio:fim]
+                # Só as linhas dos pontos novos são calculadas; as colunas são a transposta
+                for inicio in range(m, n, self.tamanho_bloco):
+                    fim = min(inicio + self.tamanho_bloco, n)
+                    matriz[inicio:fim] = calcular_distancias_haversine(
+                        lat[inicio:fim, None], lon[inicio:fim, None], lat[None, :], lon[None, :])
+                for inicio in range(0, m, self.tamanho_bloco):
+                    fim = min(inicio + self.tamanho_bloco, m)
+                    matriz[inicio:fim, m:] = matriz[m:, inicio:fim].T
+            matriz.flush()
+        finally:
+            del matriz
+        os.replace(temporario, caminho_matriz)
+
+    def grafo(self, pontos: List[Tuple[float, float]]) -> GrafoMatriz:
+        """
+        GrafoMatriz dos pontos (sem repetição), lido do cache quando possível.
+
+        A ordem dos pontos no grafo é a do arquivo gravado, que pode diferir
+        da ordem pedida; use grafo.indice para localizar cada ponto.
+        """
+        chave = self.chave(pontos)
+        grafo = self._abrir(chave)
+        if grafo is not None:
+            self.acertos += 1
+            return grafo
+
+        base = self._maior_subconjunto(pontos)
+        if base is not None:
+            self.extensoes += 1
+            conhecidos = set(base.pontos)
+            ordem = list(base.pontos) + [ponto for ponto in pontos if ponto not in conhecidos]
+            self._gravar(chave, ordem, base)
+        else:
+            self.falhas += 1
+            self._gravar(chave, list(pontos))
+        return self._abrir(chave)
+
+    def limpar(self) -> None:
+        """Remove todos os arquivos do cache"""
+        for caminho in glob.glob(os.path.join(self.pasta, '*' + self.EXTENSAO_MATRIZ)) + \
+                       glob.glob(os.path.join(self.pasta, '*' + self.EXTENSAO_PONTOS)):
+            os.remove(caminho)
@@ -0,0 +1,178 @@
+from typing import Dict, Iterator, List, Tuple
+import csv
+import itertools
+import numpy as np
+from models import Entrega, EntregaBatch
+
+# Colunas obrigatórias do CSV de entregas
+COLUNAS_ENTREGAS = ('id', 'latitude', 'longitude', 'destino_nome', 'peso', 'prazo')
+
+# Linha inválida: (número da linha no arquivo, motivo)
+LinhaInvalida = Tuple[int, str]
+
+def _ler_cabecalho(leitor) -> Tuple[Dict[str, int], int]:
+    """
+    Lê o cabeçalho e retorna a posição de cada coluna obrigatória e o número
+    de colunas declaradas. Levanta KeyError se faltar alguma coluna.
+    """
+    cabecalho = [nome.strip() for nome in next(leitor, [])]
+    posicoes = {nome: i for i, nome in enumerate(cabecalho) if nome}
+    for coluna in COLUNAS_ENTREGAS:
+        if coluna not in posicoes:
+            raise KeyError(coluna)
+    return posicoes, len(cabecalho)
+
+def _validar_campos(campos: List[str], num_colunas: int) -> None:
+    """
+    Confere o número de campos de uma linha. Depois da última coluna são aceitos
+    campos vazios (vírgula no fim da linha, como em entregas.csv) e comentários
+    iniciados por '#'.
+    """
+    if len(campos) < num_colunas:
+        raise ValueError(f"esperados {num_colunas} campos, encontrados {len(campos)}")
+    if any(campo.strip() and not campo.lstrip().startswith('#') for campo in campos[num_colunas:]):
+        raise ValueError(f"campos a mais além das {num_colunas} colunas do cabeçalho")
+
+def _converter_linha(campos: List[str], posicoes: Dict[str, int], num_colunas: int) -> Entrega:
+    """Converte os campos de uma linha em uma Entrega (levanta ValueError se inválida)"""
+    _validar_campos(campos, num_colunas)
+    return Entrega(
+        id=int(campos[posicoes['id']]),
+        destino_localizacao=(float(campos[posicoes['latitude']]), float(campos[posicoes['longitude']])),
+        destino_nome=campos[posicoes['destino_nome']],
+        peso=float(campos[posicoes['peso']]),
+        prazo=int(campos[posicoes['prazo']])
+    )
+
+def carregar_entregas_em_lotes(caminho_arquivo: str, tamanho_lote: int = 100_000,
+                               erros: List[LinhaInvalida] = None) -> Iterator[List[Entrega]]:
+    """
+    Lê o CSV de entregas em fluxo, produzindo lotes de no máximo tamanho_lote
+    entregas, sem carregar o arquivo inteiro na memória.
+
+    Linhas mal formadas não interrompem a leitura: são ignoradas e, se a lista
+    erros for informada, registradas nela como (número da linha, motivo).
+    Linhas em branco são ignoradas silenciosamente.
+
+    Args:
+        caminho_arquivo: Caminho para o arquivo CSV
+        tamanho_lote: Número máximo de entregas por lote
+        erros: Lista opcional que recebe as linhas inválidas
+
+    Returns:
+        Iterador de listas de objetos Entrega
+    """
+    with open(caminho_arquivo, 'r', encoding='utf-8', newline='') as arquivo:
+        leitor = csv.reader(arquivo)
+        posicoes, num_colunas = _ler_cabecalho(leitor)
+        lote = []
+
+        for campos in leitor:
+            if not campos:
+                continue
+            try:
+                lote.append(_converter_linha(campos, posicoes, num_colunas))
+            except ValueError as e:
+                if erros is not None:
+                    erros.append((leitor.line_num, str(e)))
+                continue
+
+            if len(lote) >= tamanho_lote:
+                yield lote
+                lote = []
+
+        if lote:
+            yield lote
+
+def _converter_bloco(linhas: List[List[str]], posicoes: Dict[str, int]) -> Dict[str, np.ndarray]:
+    """Converte de uma vez as colunas de um bloco de linhas já validadas"""
+    colunas = list(zip(*linhas)) if linhas else [()] * (max(posicoes.values()) + 1)
+    resultado = {}
+    for coluna, tipo in (('id', np.int64), ('latitude', np.float64), ('longitude', np.float64),
+                         ('peso', np.float64), ('prazo', np.int64)):
+        # O NumPy converte os textos direto para o tipo da coluna
+        resultado[coluna] = np.array(colunas[posicoes[coluna]], dtype=tipo)
+    resultado['destino_nome'] = list(colunas[posicoes['destino_nome']])
+    return resultado
+
+def carregar_entregas_colunar(caminho_arquivo: str, tamanho_bloco: int = 10_000,
+                              erros: List[LinhaInvalida] = None) -> EntregaBatch:
+    """
+    Lê o CSV de entregas direto para arrays tipados, uma coluna por atributo,
+    sem criar objetos Entrega nem dicionários por linha.
+
+    O arquivo é lido em blocos; cada bloco é convertido coluna a coluna e só
+    quando a conversão falha as linhas do bloco são examinadas uma a uma, para
+    descartar e registrar (em erros, na ordem das linhas) apenas as linhas mal
+    formadas, inclusive inteiros fora do int64. Blocos
+    pequenos mantêm poucas listas vivas ao mesmo tempo, o que evita que o
+    coletor de lixo percorra milhões de linhas a cada coleta.
+
+    Args:
+        caminho_arquivo: Caminho para o arquivo CSV
+        tamanho_bloco: Número de linhas convertidas por vez
+        erros: Lista opcional que recebe as linhas inválidas como (número da linha, motivo)
+
+    Returns:
+        EntregaBatch com uma coluna tipada por atributo
+    """
+    blocos = []
+    inicio_erros = len(erros) if erros is not None else 0
+
+    with open(caminho_arquivo, 'r', encoding='utf-8', newline='') as arquivo:
+        leitor = csv.reader(arquivo)
+        posicoes, num_colunas = _ler_cabecalho(leitor)
+
+        while True:
+            linhas = []
+            numeros = []
+            lidas = 0
+            for campos in itertools.islice(leitor, tamanho_bloco):
+                lidas += 1
+                # Caminho rápido: número exato de campos ou uma vírgula no fim da linha
+                quantidade = len(campos)
+                if quantidade != num_colunas and not (quantidade == num_colunas + 1 and not campos[-1]):
+                    if not campos:
+                        continue
+                    try:
+                        _validar_campos(campos, num_colunas)
+                    except ValueError as e:
+                        if erros is not None:
+                            erros.append((leitor.line_num, str(e)))
+                        continue
+                linhas.append(campos)
+                numeros.append(leitor.line_num)
+
+            if lidas == 0:
+                break
+            if not linhas:
+                continue
+
+            try:
+                blocos.append(_converter_bloco(linhas, posicoes))
+            except (ValueError, OverflowError):
+                # Caminho lento: separa as linhas que não convertem (com a mesma
+                # conversão do bloco, para que inteiros fora do int64 também caiam aqui)
+                validas = []
+                for campos, numero in zip(linhas, numeros):
+                    try:
+                        _converter_bloco([campos], posicoes)
+                        validas.append(campos)
+                    except (ValueError, OverflowError) as e:
+                        if erros is not None:
+                            erros.append((numero, str(e)))
+                if validas:
+                    blocos.append(_converter_bloco(validas, posicoes))
+
+    # Os erros do caminho lento de um bloco chegam depois dos de contagem de
+    # campos das linhas seguintes do mesmo bloco
+    if erros is not None:
+        erros[inicio_erros:] = sorted(erros[inicio_erros:], key=lambda erro: erro[0])
+
+    if not blocos:
+        blocos.append(_converter_bloco([], posicoes))
+
+    colunas = {coluna: np.concatenate([bloco[coluna] for bloco in blocos])
+               for coluna in ('id', 'latitude', 'longitude', 'peso', 'prazo')}
+    colunas['destino_nome'] = [nome for bloco in blocos for nome in bloco['destino_nome']]
+    return EntregaBatch.de_colunas(colunas)
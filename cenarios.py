@@ -0,0 +1,324 @@
+"""
+Execução em lote de cenários, sem janela.
+
+Cada cenário é um arquivo JSON com os centros, a frota e o caminho (relativo
+ao JSON) do CSV de entregas:
+
+    {
+      "nome": "nordeste",
+      "entregas": "entregas_nordeste.csv",
+      "centros": [{"id": 1, "nome": "Recife", "latitude": -8.05, "longitude": -34.88}],
+      "frota": [{"id": 1, "centro": 1, "capacidade_max": 8000.0,
+                 "velocidade_media": 60.0, "limite_de_horas": 12.0}],
+      "opcoes": {"economias": true, "melhorar": false, "grafo": "matriz"}
+    }
+
+O grafo pode ser "matriz" (completo, denso), "knn" (k vizinhos mais próximos),
+"completo" (em dicionário) ou "viario", com "malha" apontando para o CSV de
+arestas ou o extrato OSM da malha viária (relativo ao JSON). Nos grafos
+esparsos ("knn" e "viario"), "hierarquia": true (ou o nome do arquivo onde
+guardá-la) responde as consultas de caminho com uma hierarquia de contração. Com "setores": true
+(ou o máximo de entregas por setor) as entregas de cada centro são divididas
+em setores de varredura resolvidos independentemente (ver decomposicao.py).
+Com "nos": true os grafos "completo" e "knn" são montados sobre IDs inteiros
+dos locais (ver grafo.GrafoNos) em vez de chaves de coordenadas. Com "lns"
+(segundos) o carregamento é melhorado por busca em grande vizinhança até esse
+tempo de relógio (ver grande_vizinhanca.py).
+
+Os cenários são resolvidos em paralelo, um por processo. Para cada um são
+gravados, em <saida>/<nome>/, a solução (solucao.json), o relatório e,
+opcionalmente, o mapa em PNG; o resumo de todos vai para <saida>/resumo.csv.
+
+Exemplo:
+    python cenarios.py cenarios/ --saida resultados/ --processos 8
+"""
+from typing import Dict, List, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from models import CentroDistribuicao, Caminhao, Entrega
+from grafo import (Grafo, construir_grafo, construir_grafo_matriz, construir_grafo_nos, CacheCaminhos, RegistroLocais,
+                   distancia_entre)
+from algoritmos import (
+    atribuir_entregas_aos_centros,
+    atribuir_entregas_aos_caminhoes,
+    calcular_rota_caminhao,
+    carregar_entregas_csv,
+    desenhar_mapa
+)
+from economias import atribuir_entregas_por_economias
+from decomposicao import LIMITE_ENTREGAS_SETOR, atribuir_entregas_por_setores, calcular_rotas_por_setores
+from grande_vizinhanca import otimizar_por_grande_vizinhanca
+from cache_distancias import CacheDistancias
+from malha_viaria import carregar_malha, construir_grafo_viario
+from hierarquia import obter_hierarquia
+from instrumentacao import coletar, etapa
+from relatorio import Relatorio, SILENCIOSO, RESUMO
+
+# Opções de resolução usadas quando o cenário não as informa
+OPCOES_PADRAO = {'economias': False, 'melhorar': False, 'grafo': 'matriz', 'k_vizinhos': 8, 'malha': None,
+                 'hierarquia': False, 'setores': False, 'nos': False, 'lns': None}
+
+# Colunas do resumo do lote
+COLUNAS_RESUMO = ('cenario', 'status', 'entregas', 'atribuidas', 'nao_atribuidas', 'caminhoes_usados',
+                  'distancia_total_km', 'segundos', 'erro')
+
+def carregar_cenario(caminho_arquivo: str) -> Tuple[str, List[CentroDistribuicao], List[Entrega], Dict]:
+    """
+    Lê um cenário em JSON.
+
+    Returns:
+        Tupla (nome, centros com seus caminhões, entregas, opções de resolução)
+    """
+    with open(caminho_arquivo, 'r', encoding='utf-8') as arquivo:
+        dados = json.load(arquivo)
+
+    nome = dados.get('nome') or os.path.splitext(os.path.basename(caminho_arquivo))[0]
+    centros = [CentroDistribuicao(c['id'], c['nome'], (float(c['latitude']), float(c['longitude'])))
+               for c in dados['centros']]
+    por_id = {centro.id: centro for centro in centros}
+    for c in dados['frota']:
+        if c['centro'] not in por_id:
+            raise ValueError(f"Caminhão {c['id']} aponta para o centro inexistente {c['centro']}")
+        por_id[c['centro']].caminhoes.append(
+            Caminhao(c['id'], float(c['capacidade_max']), float(c.get('velocidade_media', 60.0)),
+                     float(c.get('limite_de_horas', 8.0))))
+
+    caminho_entregas = os.path.join(os.path.dirname(os.path.abspath(caminho_arquivo)), dados['entregas'])
+    if not os.path.exists(caminho_entregas):
+        raise FileNotFoundError(caminho_entregas)
+    entregas = carregar_entregas_csv(caminho_entregas, Relatorio(SILENCIOSO))
+
+    opcoes = dict(OPCOES_PADRAO, **dados.get('opcoes', {}))
+    if opcoes['malha']:
+        opcoes['malha'] = os.path.join(os.path.dirname(os.path.abspath(caminho_arquivo)), opcoes['malha'])
+    if isinstance(opcoes['hierarquia'], str):
+        opcoes['hierarquia'] = os.path.join(os.path.dirname(os.path.abspath(caminho_arquivo)), opcoes['hierarquia'])
+    return nome, centros, entregas, opcoes
+
+def resolver_cenario(centros: List[CentroDistribuicao], entregas: List[Entrega], relatorio: Relatorio,
+                     economias: bool = False, melhorar: bool = False, grafo: str = 'matriz',
+                     k_vizinhos: int = 8, malha: str = None, hierarquia: Union[bool, str] = False,
+                     setores: Union[bool, int] = False, nos: bool = False, lns: float = None,
+                     cache_distancias: str = None) -> Grafo:
+    """
+    Resolve um cenário: grafo, centros mais próximos, carregamento dos caminhões
+    e rotas, na mesma sequência de main.resolver_problema.
+
+    Com grafo='viario' as rotas seguem a malha viária do arquivo malha (ver
+    malha_viaria.py). Com hierarquia (True ou o arquivo onde gravá-la e de onde
+    lê-la nas próximas execuções) as consultas de caminho dos grafos 'knn' e
+    'viario' usam uma hierarquia de contração (ver hierarquia.py); nos grafos
+    completos ela é recusada. Com
+    grafo='matriz' e cache_distancias (um diretório) a matriz é lida do cache
+    em disco quando o mesmo conjunto de pontos já foi calculado. Com setores
+    (True ou o máximo de entregas por setor) o carregamento e as rotas vêm da
+    decomposição em setores (decomposicao.py), no próprio processo do cenário.
+    Com nos=True os grafos 'completo' e 'knn' usam IDs inteiros dos locais
+    (construir_grafo_nos); não se combina com a hierarquia, que é indexada
+    pelas coordenadas. Com lns (segundos) o carregamento passa pela busca em
+    grande vizinhança (grande_vizinhanca.py), com uma única partida, já que
+    os cenários rodam um por processo.
+
+    Returns:
+        O grafo usado (para medir as rotas)
+    """
+    if hierarquia and grafo in ('completo', 'matriz'):
+        raise ValueError("A opção hierarquia é só para os grafos esparsos ('knn' e 'viario'); no grafo "
+                         f"'{grafo}' a distância direta já é a do caminho mais curto")
+    if nos and (grafo not in ('completo', 'knn') or hierarquia):
+        raise ValueError("A opção nos vale só para os grafos 'completo' e 'knn', sem hierarquia")
+    with etapa('construir_grafo'):
+        if nos:
+            grafo_cenario = construir_grafo_nos(centros, entregas, k_vizinhos=k_vizinhos if grafo == 'knn' else None,
+                                                relatorio=relatorio)
+        elif grafo == 'matriz':
+            cache_matriz = CacheDistancias(cache_distancias) if cache_distancias else None
+            grafo_cenario = construir_grafo_matriz(centros, entregas, cache=cache_matriz)
+        elif grafo == 'knn':
+            grafo_cenario = construir_grafo(centros, entregas, k_vizinhos=k_vizinhos, relatorio=relatorio)
+        elif grafo == 'viario':
+            if not malha:
+                raise ValueError("O grafo 'viario' precisa da opção malha (arquivo da malha viária)")
+            grafo_cenario = construir_grafo_viario(centros, entregas, carregar_malha(malha, relatorio=relatorio),
+                                                   relatorio)
+        else:
+            grafo_cenario = construir_grafo(centros, entregas)
+    hierarquia_cenario = None
+    if hierarquia:
+        with etapa('construir_hierarquia'):
+            hierarquia_cenario = obter_hierarquia(grafo_cenario, hierarquia if isinstance(hierarquia, str) else None)
+    cache = CacheCaminhos(grafo_cenario, hierarquia=hierarquia_cenario)
+    registro = RegistroLocais(centros, entregas, grafo_cenario)
+
+    relatorio.registrar('secao', "Atribuindo entregas aos centros mais próximos...")
+    with etapa('atribuir_centros'):
+        atribuir_entregas_aos_centros(centros, entregas, relatorio)
+
+    relatorio.registrar('secao', "Atribuindo entregas aos caminhões...")
+    with etapa('atribuir_caminhoes'):
+        if setores:
+            max_entregas = LIMITE_ENTREGAS_SETOR if setores is True else int(setores)
+            atribuir_entregas_por_setores(centros, grafo_cenario, cache, max_entregas, processos=1,
+                                          economias=economias, relatorio=relatorio)
+        elif economias:
+            atribuir_entregas_por_economias(centros, grafo_cenario, cache, relatorio=relatorio)
+        else:
+            atribuir_entregas_aos_caminhoes(centros, grafo_cenario, entregas, cache, relatorio)
+
+    if lns:
+        with etapa('busca_grande_vizinhanca'):
+            otimizar_por_grande_vizinhanca(centros, grafo_cenario, cache, lns, processos=1, economias=economias,
+                                           relatorio=relatorio)
+
+    relatorio.registrar('secao', "Calculando rotas ótimas para cada caminhão...")
+    with etapa('calcular_rotas'):
+        if setores or lns:
+            calcular_rotas_por_setores(centros, grafo_cenario, cache, registro, melhorar=melhorar, relatorio=relatorio)
+        else:
+            for centro in centros:
+                for caminhao in centro.caminhoes:
+                    if caminhao.entregas:
+                        caminhao.rota = calcular_rota_caminhao(grafo_cenario, caminhao, centro, centros, entregas,
+                                                               cache, registro, melhorar=melhorar,
+                                                               manter_ordem=economias, relatorio=relatorio)
+    return grafo_cenario
+
+def _distancia_rota(grafo: Grafo, rota: List[Tuple[float, float]]) -> float:
+    return sum(distancia_entre(grafo, a, b) for a, b in zip(rota, rota[1:]))
+
+def _solucao_em_dict(nome: str, centros: List[CentroDistribuicao], grafo: Grafo) -> Dict:
+    """Solução em estrutura serializável: caminhões, entregas, rotas e distâncias"""
+    return {
+        'cenario': nome,
+        'centros': [{
+            'id': centro.id,
+            'nome': centro.nome,
+            'caminhoes': [{
+                'id': caminhao.id,
+                'entregas': [entrega.id for entrega in caminhao.entregas],
+                'carga': sum(entrega.peso for entrega in caminhao.entregas),
+                'distancia_km': _distancia_rota(grafo, caminhao.rota),
+                'rota': [list(ponto) for ponto in caminhao.rota]
+            } for caminhao in centro.caminhoes],
+            'nao_atribuidas': [entrega.id for entrega in centro.entregas]
+        } for centro in centros]
+    }
+
+def executar_cenario(caminho_arquivo: str, pasta_saida: str, nivel: int = RESUMO, formato: str = 'texto',
+                     mapa: bool = False, cache_distancias: str = None) -> Dict:
+    """
+    Carrega, resolve e grava um cenário. Roda em um processo do pool; erros
+    são devolvidos no resumo para não interromper o lote.
+
+    Returns:
+        Linha do resumo (ver COLUNAS_RESUMO) com os tempos de cada etapa em 'tempos'
+    """
+    inicio = time.perf_counter()
+    nome = os.path.splitext(os.path.basename(caminho_arquivo))[0]
+    try:
+        with coletar() as estatisticas:
+            with etapa('carregar_cenario'):
+                nome, centros, entregas, opcoes = carregar_cenario(caminho_arquivo)
+            relatorio = Relatorio(nivel)
+            grafo = resolver_cenario(centros, entregas, relatorio, cache_distancias=cache_distancias, **opcoes)
+
+        pasta = os.path.join(pasta_saida, nome)
+        os.makedirs(pasta, exist_ok=True)
+        solucao = _solucao_em_dict(nome, centros, grafo)
+        solucao['estatisticas'] = estatisticas.como_dict()
+        with open(os.path.join(pasta, 'solucao.json'), 'w', encoding='utf-8') as arquivo:
+            json.dump(solucao, arquivo, ensure_ascii=False)
+        extensoes = {'texto': 'txt', 'jsonl': 'jsonl', 'csv': 'csv'}
+        relatorio.salvar(os.path.join(pasta, f"relatorio.{extensoes[formato]}"), formato)
+        if mapa:
+            desenhar_mapa(centros, entregas, mostrar_rotas=True, arquivo_png=os.path.join(pasta, 'mapa.png'))
+
+        caminhoes = [caminhao for centro in solucao['centros'] for caminhao in centro['caminhoes']]
+        atribuidas = sum(len(caminhao['entregas']) for caminhao in caminhoes)
+        return {
+            'cenario': nome, 'status': 'ok', 'entregas': len(entregas), 'atribuidas': atribuidas,
+            'nao_atribuidas': len(entregas) - atribuidas,
+            'caminhoes_usados': sum(1 for caminhao in caminhoes if caminhao['entregas']),
+            'distancia_total_km': round(sum(caminhao['distancia_km'] for caminhao in caminhoes), 2),
+            'segundos': round(time.perf_counter() - inicio, 4), 'erro': '',
+            'tempos': estatisticas.tempos
+        }
+    except Exception as e:
+        return {'cenario': nome, 'status': 'erro', 'entregas': '', 'atribuidas': '', 'nao_atribuidas': '',
+                'caminhoes_usados': '', 'distancia_total_km': '', 'segundos': round(time.perf_counter() - inicio, 4),
+                'erro': f"{type(e).__name__}: {e}", 'tempos': {}}
+
+def listar_cenarios(caminhos: List[str]) -> List[str]:
+    """Expande diretórios nos arquivos .json que contêm (em ordem alfabética)"""
+    arquivos = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            arquivos += sorted(os.path.join(caminho, nome) for nome in os.listdir(caminho) if nome.endswith('.json'))
+        else:
+            arquivos.append(caminho)
+    return arquivos
+
+def executar_lote(arquivos: List[str], pasta_saida: str, processos: int = None, nivel: int = RESUMO,
+                  formato: str = 'texto', mapa: bool = False, cache_distancias: str = None) -> List[Dict]:
+    """
+    Resolve os cenários em um pool de processos (um cenário por tarefa) e
+    grava o resumo do lote em <pasta_saida>/resumo.csv e resumo.json.
+
+    Returns:
+        Linhas do resumo, na ordem dos arquivos
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    resumo = [None] * len(arquivos)
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = {executor.submit(executar_cenario, arquivo, pasta_saida, nivel, formato, mapa,
+                                   cache_distancias): i
+                   for i, arquivo in enumerate(arquivos)}
+        for futuro in as_completed(futuros):
+            linha = futuro.result()
+            resumo[futuros[futuro]] = linha
+            print(f"{linha['cenario']}: {linha['status']} em {linha['segundos']:.2f} s"
+                  + (f" ({linha['erro']})" if linha['erro'] else ""))
+
+    with open(os.path.join(pasta_saida, 'resumo.csv'), 'w', encoding='utf-8', newline='') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=COLUNAS_RESUMO, extrasaction='ignore')
+        escritor.writeheader()
+        escritor.writerows(resumo)
+    with open(os.path.join(pasta_saida, 'resumo.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump(resumo, arquivo, ensure_ascii=False, indent=2)
+
+    return resumo
+
+def main(argumentos: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Resolve cenários de distribuição em lote, sem janela")
+    parser.add_argument('cenarios', nargs='+', help="Arquivos de cenário (.json) ou diretórios com eles")
+    parser.add_argument('--saida', default='resultados', help="Diretório de saída")
+    parser.add_argument('--processos', type=int, default=None, help="Processos no pool (padrão: núcleos)")
+    parser.add_argument('--verbosidade', type=int, choices=(0, 1, 2), default=RESUMO,
+                        help="Nível do relatório de cada cenário (0 silencioso, 1 resumo, 2 detalhado)")
+    parser.add_argument('--formato', choices=('texto', 'jsonl', 'csv'), default='texto', help="Formato do relatório")
+    parser.add_argument('--mapas', action='store_true', help="Salva o mapa de cada cenário em PNG")
+    parser.add_argument('--cache-distancias', default=None, metavar='PASTA',
+                        help="Diretório do cache de matrizes de distâncias reaproveitado entre execuções")
+    args = parser.parse_args(argumentos)
+
+    arquivos = listar_cenarios(args.cenarios)
+    if not arquivos:
+        print("Nenhum cenário encontrado")
+        return 1
+
+    inicio = time.perf_counter()
+    resumo = executar_lote(arquivos, args.saida, args.processos, args.verbosidade, args.formato, args.mapas,
+                           args.cache_distancias)
+    erros = sum(1 for linha in resumo if linha['status'] != 'ok')
+    print(f"{len(resumo)} cenários em {time.perf_counter() - inicio:.2f} s ({erros} com erro); "
+          f"resumo em {os.path.join(args.saida, 'resumo.csv')}")
+    return 1 if erros else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,385 @@
+"""
+Decomposição espacial (agrupar primeiro, roteirizar depois) para centros com
+muitas entregas.
+
+Em atribuir_entregas_aos_caminhoes e em calcular_rota_caminhao o trabalho de
+cada caminhão percorre a lista inteira de entregas do centro, o que cresce de
+forma quadrática quando um centro recebe dezenas de milhares de entregas.
+Aqui as entregas de cada centro são divididas em setores de varredura (por
+ângulo em torno do centro), com carga até a capacidade do maior caminhão, ida e
+volta até a entrega mais distante dentro das horas que o caminhão que mais
+anda tem no menor prazo do setor, e no máximo max_entregas_setor entregas.
+Cada setor é resolvido sozinho, com cópias de poucos caminhões de cada
+configuração da frota do centro (e não da frota inteira), em um pool de
+processos quando o grafo é um GrafoMatriz (a matriz vai para memória
+compartilhada, como em paralelo.py).
+
+As rotas dos setores são depois costuradas nos caminhões reais (as com mais
+carga primeiro, cada uma para o menor caminhão livre que pode fazê-la) e
+reparadas por inserção de menor custo com as entregas que sobraram no próprio
+setor e nos setores vizinhos. calcular_rotas_por_setores calcula os trajetos
+sem buscas sobre o grafo inteiro no GrafoMatriz. Como cada setor tem tamanho
+e número de caminhões limitados, o tempo cresce quase linearmente com o
+número de entregas.
+"""
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import math
+import os
+import numpy as np
+from models import CentroDistribuicao, Entrega, Caminhao
+from grafo import (Grafo, GrafoMatriz, CacheCaminhos, RegistroLocais, calcular_distancias_haversine, no_centro,
+                   no_entrega)
+from algoritmos import (INDEFINIDA, VIAVEL, atribuir_entregas_aos_caminhoes, calcular_rota_caminhao,
+                        pre_verificar_viabilidade, verificar_viabilidade_entrega)
+from economias import atribuir_entregas_por_economias, tabela_distancias
+from insercao import distancia_sequencia, melhor_posicao_insercao, ordem_vizinho_mais_proximo, rota_respeita_prazos
+from paralelo import matriz_compartilhada, anexar_matriz
+from relatorio import Relatorio, SILENCIOSO, DETALHADO, relatorio_padrao
+
+# Máximo de entregas por setor: limita o trabalho quadrático de cada setor
+LIMITE_ENTREGAS_SETOR = 200
+
+# Caminhões de cada configuração da frota copiados para cada setor: um setor
+# cabe no maior caminhão, então poucas rotas por configuração bastam
+COPIAS_POR_MODELO = 4
+
+# Caminhão copiado para os setores: (id, capacidade_max, velocidade_media, limite_de_horas)
+ModeloCaminhao = Tuple[int, float, float, float]
+
+# Estado de cada processo trabalhador, preenchido uma vez pelo inicializador
+_grafo_trabalhador: GrafoMatriz = None
+_cache_trabalhador: CacheCaminhos = None
+_memoria_trabalhador = None
+
+def setores_de_varredura(centro: CentroDistribuicao, entregas: List[Entrega], capacidade: float,
+                         max_entregas: int = LIMITE_ENTREGAS_SETOR, alcance_diario: float = None) -> List[List[int]]:
+    """
+    Divide as entregas em setores consecutivos por ângulo em torno do centro.
+
+    A varredura começa logo depois do maior intervalo angular sem entregas, e
+    um setor é fechado quando a próxima entrega passaria da capacidade, do
+    número máximo de entregas ou, com alcance_diario (km por dia do caminhão
+    que mais anda, velocidade_media * limite_de_horas), das horas: qualquer
+    rota do setor vai até a entrega mais distante do centro e volta, então o
+    setor fecha quando essa ida e volta passaria de alcance_diario vezes o
+    menor prazo (em dias) das suas entregas. Entregas que nem sozinhas cabem
+    no próprio prazo não entram nessa conta. Entregas no mesmo ângulo seguem
+    da mais próxima para a mais distante.
+
+    Returns:
+        Para cada setor, as posições das entregas na lista recebida
+    """
+    if not entregas:
+        return []
+    lat_centro, lon_centro = centro.localizacao
+    coordenadas = np.array([entrega.destino_localizacao for entrega in entregas], dtype=np.float64)
+    dx = (coordenadas[:, 1] - lon_centro) * np.cos(np.radians(lat_centro))
+    dy = coordenadas[:, 0] - lat_centro
+    angulos = np.arctan2(dy, dx)
+    ordem = np.lexsort((np.hypot(dx, dy), angulos))
+
+    # Gira a ordem para começar depois do maior intervalo angular
+    ordenados = angulos[ordem]
+    intervalos = np.diff(ordenados, append=ordenados[0] + 2 * np.pi)
+    inicio = (int(np.argmax(intervalos)) + 1) % len(ordem)
+    ordem = np.roll(ordem, -inicio)
+    ida_e_volta = 2 * calcular_distancias_haversine(lat_centro, lon_centro, coordenadas[:, 0], coordenadas[:, 1])
+
+    setores = []
+    atual = []
+    carga = 0.0
+    mais_longe = 0.0
+    prazo = math.inf
+    for i in ordem.tolist():
+        entrega = entregas[i]
+        # Entrega que nenhum caminhão faz no prazo nem sozinha não limita o setor
+        conta_horas = alcance_diario is not None and ida_e_volta[i] <= alcance_diario * entrega.prazo
+        excede_horas = conta_horas and max(mais_longe, ida_e_volta[i]) > alcance_diario * min(prazo, entrega.prazo)
+        if atual and (carga + entrega.peso > capacidade or len(atual) >= max_entregas or excede_horas):
+            setores.append(atual)
+            atual = []
+            carga = 0.0
+            mais_longe = 0.0
+            prazo = math.inf
+        atual.append(i)
+        carga += entrega.peso
+        if conta_horas:
+            mais_longe = max(mais_longe, ida_e_volta[i])
+            prazo = min(prazo, entrega.prazo)
+    setores.append(atual)
+    return setores
+
+def modelos_de_caminhao(caminhoes: List[Caminhao], copias: int = COPIAS_POR_MODELO) -> List[ModeloCaminhao]:
+    """
+    Os primeiros caminhões de cada configuração (capacidade, velocidade,
+    limite de horas) da frota, no máximo copias de cada, na ordem da frota.
+    Os setores são resolvidos só com esses modelos, e não com cópias da frota
+    inteira, para que o trabalho de cada setor não cresça com a frota;
+    _costurar leva depois as rotas aos caminhões reais.
+    """
+    modelos = []
+    usadas = {}
+    for caminhao in caminhoes:
+        configuracao = (caminhao.capacidade_max, caminhao.velocidade_media, caminhao.limite_de_horas)
+        if usadas.get(configuracao, 0) < copias:
+            usadas[configuracao] = usadas.get(configuracao, 0) + 1
+            modelos.append((caminhao.id,) + configuracao)
+    return modelos
+
+def resolver_setor(localizacao: Tuple[float, float], entregas: List[Entrega], caminhoes: List[ModeloCaminhao],
+                   grafo: Grafo, cache: CacheCaminhos, economias: bool = False) -> List[List[int]]:
+    """
+    Carrega cópias dos caminhões com as entregas de um setor e ordena as
+    paradas de cada cópia: pelo vizinho mais próximo sobre a tabela de
+    distâncias das suas entregas ou, com economias=True, na ordem da rota de
+    Clarke-Wright.
+
+    Returns:
+        Para cada caminhão, as posições das suas entregas na lista recebida, na ordem de visita
+    """
+    centro = CentroDistribuicao(0, '', localizacao)
+    centro.entregas = list(entregas)
+    centro.caminhoes = [Caminhao(id, capacidade, velocidade_media=velocidade, limite_de_horas=limite)
+                        for id, capacidade, velocidade, limite in caminhoes]
+    relatorio = Relatorio(SILENCIOSO)
+    if economias:
+        atribuir_entregas_por_economias([centro], grafo, cache, relatorio=relatorio)
+    else:
+        atribuir_entregas_aos_caminhoes([centro], grafo, [], cache, relatorio)
+
+    posicoes = {id(entrega): i for i, entrega in enumerate(entregas)}
+    resultado = []
+    for caminhao in centro.caminhoes:
+        nos = [posicoes[id(entrega)] for entrega in caminhao.entregas]
+        if not economias and len(nos) > 1:
+            pontos = [no_centro(grafo, centro)] + [no_entrega(grafo, entregas[i]) for i in nos]
+            nos = [nos[k - 1] for k in ordem_vizinho_mais_proximo(tabela_distancias(pontos, grafo, cache))]
+        resultado.append(nos)
+    return resultado
+
+def _inicializar_trabalhador(nome_memoria: str, forma: Tuple[int, int], dtype: str,
+                             pontos: List[Tuple[float, float]]) -> None:
+    """Monta, sem copiar, o GrafoMatriz do trabalhador sobre a matriz em memória compartilhada"""
+    global _grafo_trabalhador, _cache_trabalhador, _memoria_trabalhador
+
+    _memoria_trabalhador, _grafo_trabalhador = anexar_matriz(nome_memoria, forma, dtype, pontos)
+    _cache_trabalhador = CacheCaminhos(_grafo_trabalhador)
+
+def _resolver_setor_no_trabalhador(tarefa: Tuple[Tuple[float, float], List[Entrega], List[ModeloCaminhao], bool]) -> List[List[int]]:
+    localizacao, entregas, caminhoes, economias = tarefa
+    return resolver_setor(localizacao, entregas, caminhoes, _grafo_trabalhador, _cache_trabalhador, economias)
+
+def _entrega_viavel(estados: np.ndarray, k: int, i: int, centro: CentroDistribuicao, grafo: Grafo,
+                    cache: CacheCaminhos) -> bool:
+    """Regra de atribuir_entregas_aos_caminhoes para o caminhão k e a entrega i, a partir da pré-verificação"""
+    estado = estados[k, i]
+    return estado == VIAVEL or (estado == INDEFINIDA and verificar_viabilidade_entrega(
+        centro.caminhoes[k], centro.entregas[i], centro, grafo, [centro], [], cache))
+
+def _costurar(centro: CentroDistribuicao, setores: List[List[int]], resultados: List[List[List[int]]],
+              estados: Optional[np.ndarray], grafo: Grafo, cache: CacheCaminhos) -> Dict[int, Tuple[int, List[int]]]:
+    """
+    Escolhe as rotas dos setores que vão para os caminhões reais: das com
+    mais carga (e mais entregas) para as com menos, cada uma para o menor
+    caminhão livre que pode fazê-la. Sem economias (estados informados) o
+    caminhão precisa atender cada entrega dentro do prazo; com economias, a
+    rota inteira precisa caber no menor prazo.
+
+    Returns:
+        Posição do caminhão em centro.caminhoes -> (setor, posições das entregas no centro na ordem de visita)
+    """
+    entregas = centro.entregas
+    rotas = []
+    for s, (setor, por_caminhao) in enumerate(zip(setores, resultados)):
+        for nos in por_caminhao:
+            if nos:
+                posicoes = [setor[no] for no in nos]
+                rotas.append((sum(entregas[i].peso for i in posicoes), len(posicoes), s, posicoes))
+    rotas.sort(key=lambda r: (-r[0], -r[1]))
+
+    livres = sorted(range(len(centro.caminhoes)), key=lambda k: centro.caminhoes[k].capacidade_max)
+    escolhidas = {}
+    for carga, _, s, posicoes in rotas:
+        if not livres:
+            break
+        if estados is None:
+            pontos = [no_centro(grafo, centro)] + [no_entrega(grafo, entregas[i]) for i in posicoes]
+            distancia = distancia_sequencia(tabela_distancias(pontos, grafo, cache), 0, range(1, len(pontos)))
+            prazo = min(entregas[i].prazo for i in posicoes)
+        for k in livres:
+            caminhao = centro.caminhoes[k]
+            if carga > caminhao.capacidade_max:
+                continue
+            if estados is None:
+                if rota_respeita_prazos(distancia, caminhao, prazo):
+                    break
+            elif all(_entrega_viavel(estados, k, i, centro, grafo, cache) for i in posicoes):
+                break
+        else:
+            continue
+        livres.remove(k)
+        escolhidas[k] = (s, posicoes)
+    return escolhidas
+
+def _reparar(centro: CentroDistribuicao, k: int, ordem: List[int], candidatos: List[int], atribuida: List[bool],
+             estados: Optional[np.ndarray], grafo: Grafo, cache: CacheCaminhos) -> List[int]:
+    """
+    Insere na rota do caminhão k, na posição de menor acréscimo de distância,
+    as entregas candidatas (por prazo) que ainda cabem: pela regra de
+    atribuir_entregas_aos_caminhoes (ida e volta de cada entrega dentro do
+    prazo) ou, com economias (estados None), pela da rota inteira dentro do
+    menor prazo.
+
+    Returns:
+        A nova ordem de visita (posições no centro)
+    """
+    entregas = centro.entregas
+    caminhao = centro.caminhoes[k]
+    carga = sum(entregas[i].peso for i in ordem)
+    candidatos = [i for i in candidatos if carga + entregas[i].peso <= caminhao.capacidade_max]
+    if not candidatos:
+        return ordem
+
+    pontos = [no_centro(grafo, centro)] + [no_entrega(grafo, entregas[i]) for i in ordem + candidatos]
+    tabela = tabela_distancias(pontos, grafo, cache)
+    nos = list(range(1, len(ordem) + 1))
+    posicao_de = dict(enumerate(ordem + candidatos, start=1))
+    if estados is None:
+        distancia = distancia_sequencia(tabela, 0, nos)
+        prazo = min(entregas[i].prazo for i in ordem)
+
+    for no, i in enumerate(candidatos, start=len(ordem) + 1):
+        entrega = entregas[i]
+        if atribuida[i] or carga + entrega.peso > caminhao.capacidade_max:
+            continue
+        posicao, custo = melhor_posicao_insercao(tabela, 0, nos, no)
+        if estados is None:
+            if not rota_respeita_prazos(distancia + custo, caminhao, min(prazo, entrega.prazo)):
+                continue
+            distancia += custo
+            prazo = min(prazo, entrega.prazo)
+        elif not _entrega_viavel(estados, k, i, centro, grafo, cache):
+            continue
+        nos.insert(posicao, no)
+        carga += entrega.peso
+        atribuida[i] = True
+    return [posicao_de[no] for no in nos]
+
+def atribuir_entregas_por_setores(centros: List[CentroDistribuicao], grafo: Grafo, cache: CacheCaminhos = None,
+                                  max_entregas_setor: int = LIMITE_ENTREGAS_SETOR, processos: Optional[int] = None,
+                                  economias: bool = False, relatorio: Relatorio = None) -> None:
+    """
+    Alternativa a atribuir_entregas_aos_caminhoes para centros com muitas
+    entregas: divide as entregas de cada centro em setores de varredura,
+    resolve os setores independentemente, costura as rotas nos caminhões e
+    repara o resultado inserindo as entregas que sobraram no setor da rota e
+    nos dois vizinhos.
+
+    caminhao.entregas fica na ordem de visita (use calcular_rota_caminhao com
+    manter_ordem=True); as entregas não atendidas permanecem em centro.entregas.
+
+    Args:
+        centros: Centros com as entregas já atribuídas
+        grafo: Grafo das localizações; com GrafoMatriz e mais de um setor, os
+            setores são resolvidos em um pool de processos
+        cache: Cache de caminhos (no grafo em dicionário, de preferência com
+            hierarquia de contração, para montar as tabelas dos setores)
+        max_entregas_setor: Máximo de entregas por setor
+        processos: Número de processos (padrão: número de núcleos; 1 resolve
+            tudo no processo atual)
+        economias: Resolve cada setor com Clarke-Wright (economias.py)
+        relatorio: Relatório que recebe as atribuições (impressas na hora se não informado)
+    """
+    if cache is None:
+        cache = CacheCaminhos(grafo)
+    relatorio = relatorio_padrao(relatorio)
+    detalhar = relatorio.ativo(DETALHADO)
+
+    # Setores de todos os centros, resolvidos de uma vez
+    setores_por_centro = []
+    tarefas = []
+    for centro in centros:
+        capacidade = max((caminhao.capacidade_max for caminhao in centro.caminhoes), default=0.0)
+        alcance_diario = max((caminhao.velocidade_media * caminhao.limite_de_horas for caminhao in centro.caminhoes),
+                             default=0.0)
+        setores = setores_de_varredura(centro, centro.entregas, capacidade, max_entregas_setor, alcance_diario) \
+            if centro.caminhoes else []
+        setores_por_centro.append(setores)
+        modelos = modelos_de_caminhao(centro.caminhoes)
+        tarefas.extend((centro.localizacao, [centro.entregas[i] for i in setor], modelos, economias)
+                       for setor in setores)
+
+    if processos == 1 or len(tarefas) < 2 or not isinstance(grafo, GrafoMatriz):
+        resultados = [resolver_setor(localizacao, entregas, modelos, grafo, cache, economias)
+                      for localizacao, entregas, modelos, economias in tarefas]
+    else:
+        trabalhadores = processos or os.cpu_count() or 1
+        with matriz_compartilhada(grafo) as (nome_memoria, forma, dtype):
+            with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_trabalhador,
+                                     initargs=(nome_memoria, forma, dtype, grafo.pontos)) as executor:
+                resultados = list(executor.map(_resolver_setor_no_trabalhador, tarefas,
+                                               chunksize=max(1, len(tarefas) // (4 * trabalhadores))))
+
+    inicio = 0
+    for centro, setores in zip(centros, setores_por_centro):
+        resultados_centro = resultados[inicio:inicio + len(setores)]
+        inicio += len(setores)
+        for caminhao in centro.caminhoes:
+            caminhao.entregas = []
+        if not setores:
+            if centro.entregas:
+                relatorio.registrar('nao_atribuidas', len(centro.entregas), centro.nome)
+            continue
+
+        entregas = centro.entregas
+        estados = None if economias else pre_verificar_viabilidade(centro, entregas, grafo, cache)
+        escolhidas = _costurar(centro, setores, resultados_centro, estados, grafo, cache)
+        atribuida = [False] * len(entregas)
+        for _, ordem in escolhidas.values():
+            for i in ordem:
+                atribuida[i] = True
+
+        # Reparo: sobras do próprio setor e dos vizinhos, na ordem dos caminhões do centro
+        for k, caminhao in enumerate(centro.caminhoes):
+            if k not in escolhidas:
+                continue
+            s, ordem = escolhidas[k]
+            vizinhos = sorted({(s - 1) % len(setores), s, (s + 1) % len(setores)})
+            candidatos = sorted((i for v in vizinhos for i in setores[v] if not atribuida[i]),
+                                key=lambda i: (entregas[i].prazo, i))
+            ordem = _reparar(centro, k, ordem, candidatos, atribuida, estados, grafo, cache)
+            caminhao.entregas = [entregas[i] for i in ordem]
+            if detalhar:
+                for entrega in caminhao.entregas:
+                    relatorio.registrar('entrega_caminhao', entrega.id, caminhao.id, centro.nome)
+
+        centro.entregas = [entrega for entrega, sim in zip(entregas, atribuida) if not sim]
+        if centro.entregas:
+            relatorio.registrar('nao_atribuidas', len(centro.entregas), centro.nome)
+
+def calcular_rotas_por_setores(centros: List[CentroDistribuicao], grafo: Grafo, cache: CacheCaminhos,
+                               registro: RegistroLocais, melhorar: bool = False, relatorio: Relatorio = None) -> None:
+    """
+    Calcula as rotas dos caminhões carregados por atribuir_entregas_por_setores
+    (ou por grande_vizinhanca.otimizar_por_grande_vizinhanca), na ordem de
+    caminhao.entregas.
+
+    No GrafoMatriz cada rota é calculada sobre a submatriz do centro e das
+    paradas do caminhão (as distâncias diretas são as mesmas), para que as
+    buscas a partir de cada parada não percorram a matriz inteira; nos grafos
+    em dicionário, sobre o grafo todo pelo cache.
+    """
+    for centro in centros:
+        for caminhao in centro.caminhoes:
+            if not caminhao.entregas:
+                continue
+            grafo_rota, cache_rota = grafo, cache
+            if isinstance(grafo, GrafoMatriz):
+                pontos = list(dict.fromkeys([centro.localizacao] +
+                                            [entrega.destino_localizacao for entrega in caminhao.entregas]))
+                indices = np.fromiter((grafo.indice[ponto] for ponto in pontos), dtype=np.int64, count=len(pontos))
+                grafo_rota = GrafoMatriz(pontos, grafo.distancias[np.ix_(indices, indices)])
+                cache_rota = CacheCaminhos(grafo_rota)
+            caminhao.rota = calcular_rota_caminhao(grafo_rota, caminhao, centro, centros, [], cache_rota, registro,
+                                                   melhorar=melhorar, manter_ordem=True, relatorio=relatorio)
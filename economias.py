@@ -0,0 +1,218 @@
+from typing import List, Tuple
+import numpy as np
+from models import CentroDistribuicao, Caminhao
+from relatorio import Relatorio, DETALHADO, relatorio_padrao
+from grafo import Grafo, GrafoMatriz, CacheCaminhos, calcular_matriz_distancias, no_centro, no_entrega
+from busca_local import tabela_simetrica
+
+def tabela_distancias(pontos: List[Tuple[float, float]], grafo: Grafo, cache: CacheCaminhos) -> np.ndarray:
+    """
+    Tabela de distâncias entre os pontos (o centro na posição 0), dados pelas
+    chaves do grafo (no_centro/no_entrega: os IDs no GrafoNos).
+
+    Com GrafoMatriz a tabela é recortada da própria matriz; com o grafo em
+    dicionário usa as distâncias de caminho mais curto do cache (de uma vez,
+    se ele tiver uma hierarquia de contração); sem grafo, a distância
+    haversine direta.
+    """
+    if isinstance(grafo, GrafoMatriz):
+        indices = np.fromiter((grafo.indice[ponto] for ponto in pontos), dtype=np.int64, count=len(pontos))
+        return np.asarray(grafo.distancias[np.ix_(indices, indices)], dtype=np.float64)
+    if grafo is None:
+        return calcular_matriz_distancias(pontos)
+    if cache is None:
+        cache = CacheCaminhos(grafo)
+    return cache.tabela(pontos)
+
+def calcular_economias(distancias: np.ndarray, max_vizinhos: int = None,
+                       direcionada: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Economias de Clarke-Wright s(i, j) = d(0, i) + d(0, j) - d(i, j) para os
+    pares de entregas i < j com economia positiva, da maior para a menor.
+    Com direcionada=True (tabela assimétrica, como na malha viária com mão
+    única) a economia é a de ir de i direto para j, s(i, j) = d(i, 0) +
+    d(0, j) - d(i, j), para todos os pares ordenados i != j.
+
+    Como as economias não mudam durante a junção das rotas, ordenar todas de
+    uma vez (argsort do NumPy) equivale a retirá-las de um heap de máximo,
+    sem criar uma tupla Python por par.
+
+    Args:
+        distancias: Tabela (n+1, n+1) com o centro na posição 0
+        max_vizinhos: Se informado, só considera pares em que um dos nós está
+                      entre os max_vizinhos mais próximos do outro
+        direcionada: Economias no sentido i -> j, sem supor d(i, j) = d(j, i)
+
+    Returns:
+        Tupla (economias, i, j) com i e j numerados a partir de 1 (posição na tabela)
+    """
+    n = len(distancias) - 1
+    if n < 2:
+        vazio = np.empty(0, dtype=np.int64)
+        return np.empty(0), vazio, vazio
+
+    ida = distancias[0, 1:]
+    if direcionada:
+        economias = distancias[1:, 0][:, None] + ida[None, :] - distancias[1:, 1:]
+        candidatos = economias > 0
+        np.fill_diagonal(candidatos, False)
+    else:
+        economias = ida[:, None] + ida[None, :] - distancias[1:, 1:]
+        candidatos = np.triu(economias > 0, 1)
+
+    if max_vizinhos is not None and max_vizinhos < n - 1:
+        entre_entregas = distancias[1:, 1:].copy()
+        np.fill_diagonal(entre_entregas, np.inf)
+        vizinhos = np.argpartition(entre_entregas, max_vizinhos, axis=1)[:, :max_vizinhos]
+        proximos = np.zeros((n, n), dtype=bool)
+        proximos[np.arange(n)[:, None], vizinhos] = True
+        candidatos &= proximos | proximos.T
+
+    pares = np.flatnonzero(candidatos)
+    valores = economias.ravel()[pares]
+    ordem = np.argsort(-valores, kind='stable')
+    pares = pares[ordem]
+    return valores[ordem], pares // n + 1, pares % n + 1
+
+def _caminhao_viavel(caminhoes: List[Caminhao], carga: float, distancia: float, prazo: float) -> bool:
+    """Verifica se algum caminhão leva a carga e faz a rota inteira dentro de limite_de_horas × prazo"""
+    return any(carga <= caminhao.capacidade_max and
+               distancia / caminhao.velocidade_media <= caminhao.limite_de_horas * prazo
+               for caminhao in caminhoes)
+
+def construir_rotas_economias(distancias: np.ndarray, pesos: List[float], prazos: List[float],
+                              caminhoes: List[Caminhao], max_vizinhos: int = None) -> List[Tuple[List[int], float, float]]:
+    """
+    Junta rotas pelo algoritmo de economias de Clarke-Wright.
+
+    Cada entrega começa em uma rota própria (centro → entrega → centro). Os
+    pares são examinados da maior para a menor economia e as rotas de i e j
+    são unidas quando i e j estão nas pontas de rotas diferentes e a rota
+    resultante ainda cabe em algum caminhão do centro: carga até
+    capacidade_max e tempo total da rota até limite_de_horas × menor prazo.
+    Carga, distância e prazo de cada rota são atualizados em O(1) a cada junção.
+    Se a tabela não for simétrica (tabela_simetrica), as economias são
+    direcionadas e as rotas nunca são invertidas: i precisa ser o fim de uma
+    rota e j o começo da outra.
+
+    Args:
+        distancias: Tabela (n+1, n+1) com o centro na posição 0
+        pesos: Peso de cada entrega (posição i-1 para o nó i)
+        prazos: Prazo de cada entrega, em dias
+        caminhoes: Caminhões do centro
+        max_vizinhos: Limita os pares examinados (ver calcular_economias)
+
+    Returns:
+        Lista de (nós na ordem de visita, carga, distância) das rotas viáveis;
+        entregas que não cabem sozinhas em nenhum caminhão ficam de fora
+    """
+    n = len(distancias) - 1
+    direcionada = not tabela_simetrica(distancias)
+    rota_de = [-1] * (n + 1)
+    rotas = {}
+    cargas = {}
+    comprimentos = {}
+    prazos_rota = {}
+
+    for no in range(1, n + 1):
+        carga = pesos[no - 1]
+        distancia = float(distancias[0, no]) + float(distancias[no, 0])
+        if _caminhao_viavel(caminhoes, carga, distancia, prazos[no - 1]):
+            rota_de[no] = no
+            rotas[no] = [no]
+            cargas[no] = carga
+            comprimentos[no] = distancia
+            prazos_rota[no] = prazos[no - 1]
+
+    economias, origens, destinos = calcular_economias(distancias, max_vizinhos, direcionada)
+    for economia, i, j in zip(economias.tolist(), origens.tolist(), destinos.tolist()):
+        a = rota_de[i]
+        b = rota_de[j]
+        if a < 0 or b < 0 or a == b:
+            continue
+        rota_a = rotas[a]
+        rota_b = rotas[b]
+
+        # i e j precisam estar nas pontas para que fiquem vizinhos na rota unida
+        # (na tabela direcionada, sem inverter: i no fim de uma rota, j no começo da outra)
+        if rota_a[-1] == i:
+            esquerda = rota_a
+        elif rota_a[0] == i and not direcionada:
+            esquerda = rota_a[::-1]
+        else:
+            continue
+        if rota_b[0] == j:
+            direita = rota_b
+        elif rota_b[-1] == j and not direcionada:
+            direita = rota_b[::-1]
+        else:
+            continue
+
+        carga = cargas[a] + cargas[b]
+        distancia = comprimentos[a] + comprimentos[b] - economia
+        prazo = min(prazos_rota[a], prazos_rota[b])
+        if not _caminhao_viavel(caminhoes, carga, distancia, prazo):
+            continue
+
+        # Mantém o identificador da rota maior e renumera apenas os nós da menor
+        if len(rota_a) < len(rota_b):
+            a, b = b, a
+        for no in rotas[b]:
+            rota_de[no] = a
+        rotas[a] = esquerda + direita
+        cargas[a] = carga
+        comprimentos[a] = distancia
+        prazos_rota[a] = prazo
+        for tabela in (rotas, cargas, comprimentos, prazos_rota):
+            del tabela[b]
+
+    return [(rotas[r], cargas[r], comprimentos[r]) for r in rotas]
+
+def atribuir_entregas_por_economias(centros: List[CentroDistribuicao], grafo: Grafo, cache: CacheCaminhos = None,
+                                    max_vizinhos: int = None, relatorio: Relatorio = None) -> None:
+    """
+    Alternativa a atribuir_entregas_aos_caminhoes baseada em Clarke-Wright.
+
+    As rotas são construídas por construir_rotas_economias e depois entregues
+    aos caminhões: as rotas com mais entregas primeiro, cada uma para o menor
+    caminhão livre que a comporta. caminhao.entregas fica na ordem de visita
+    da rota; as entregas de rotas que sobram permanecem em centro.entregas.
+
+    Args:
+        centros: Centros com as entregas já atribuídas
+        grafo: Grafo das localizações (GrafoMatriz evita recalcular distâncias)
+        cache: Cache de caminhos, usado quando o grafo é um dicionário
+        max_vizinhos: Limita os pares de economias examinados por entrega
+        relatorio: Relatório que recebe as atribuições (impressas na hora se não informado)
+    """
+    relatorio = relatorio_padrao(relatorio)
+    detalhar = relatorio.ativo(DETALHADO)
+    for centro in centros:
+        entregas = centro.entregas
+        for caminhao in centro.caminhoes:
+            caminhao.entregas = []
+        if not entregas:
+            continue
+
+        pontos = [no_centro(grafo, centro)] + [no_entrega(grafo, entrega) for entrega in entregas]
+        distancias = tabela_distancias(pontos, grafo, cache)
+        rotas = construir_rotas_economias(distancias, [entrega.peso for entrega in entregas],
+                                          [entrega.prazo for entrega in entregas], centro.caminhoes, max_vizinhos)
+
+        livres = sorted(centro.caminhoes, key=lambda c: c.capacidade_max)
+        atendidas = set()
+        for nos, carga, distancia in sorted(rotas, key=lambda r: (-len(r[0]), -r[1])):
+            prazo = min(entregas[no - 1].prazo for no in nos)
+            caminhao = next((c for c in livres if _caminhao_viavel([c], carga, distancia, prazo)), None)
+            if caminhao is None:
+                continue
+            livres.remove(caminhao)
+            caminhao.entregas = [entregas[no - 1] for no in nos]
+            atendidas.update(nos)
+            if detalhar:
+                for entrega in caminhao.entregas:
+                    relatorio.registrar('entrega_caminhao', entrega.id, caminhao.id, centro.nome)
+
+        centro.entregas = [entrega for no, entrega in enumerate(entregas, start=1) if no not in atendidas]
+        if centro.entregas:
+            relatorio.registrar('nao_atribuidas', len(centro.entregas), centro.nome)
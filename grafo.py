@@ -1,7 +1,14 @@
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Iterator, Optional, Set, Union
 import math
 import heapq
+from collections import OrderedDict
+import numpy as np
 from models import CentroDistribuicao, Entrega
+from relatorio import Relatorio, relatorio_padrao
+import instrumentacao
+
+# Raio da Terra em quilômetros
+RAIO_TERRA_KM = 6371.0
 
 def calcular_distancia(ponto1: Tuple[float, float], ponto2: Tuple[float, float]) -> float:
     """
@@ -15,8 +22,11 @@ def calcular_distancia(ponto1: Tuple[float, float], ponto2: Tuple[float, float])
     Returns:
         Distância em quilômetros
     """
+    if instrumentacao.ativa is not None:
+        instrumentacao.ativa.distancias += 1
+    
     # Raio da Terra em quilômetros
-    R = 6371.0
+    R = RAIO_TERRA_KM
     
     # Converter de graus para radianos
     lat1 = math.radians(ponto1[0])
@@ -35,12 +45,499 @@ def calcular_distancia(ponto1: Tuple[float, float], ponto2: Tuple[float, float])
     
     return distancia
 
-def construir_grafo(centros: List[CentroDistribuicao], entregas: List[Entrega]) -> Dict:
-    """Constrói um grafo simples onde cada nó é conectado com todos os outros"""
+def calcular_distancias_haversine(lat1: np.ndarray, lon1: np.ndarray,
+                                  lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """
+    Versão vetorizada de calcular_distancia: aceita arrays de latitudes e
+    longitudes (em graus) e aplica a fórmula de Haversine com broadcasting.
+    
+    Returns:
+        Array de distâncias em quilômetros
+    """
+    lat1 = np.radians(lat1)
+    lon1 = np.radians(lon1)
+    lat2 = np.radians(lat2)
+    lon2 = np.radians(lon2)
+    
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    if instrumentacao.ativa is not None:
+        instrumentacao.ativa.distancias += c.size
+    return RAIO_TERRA_KM * c
+
+def calcular_matriz_distancias(pontos: List[Tuple[float, float]], dtype=np.float64,
+                               tamanho_bloco: int = 1024, saida: np.ndarray = None) -> np.ndarray:
+    """
+    Calcula a matriz densa n x n de distâncias de Haversine entre os pontos.
+    
+    O cálculo é feito em blocos de linhas para limitar a memória dos arrays
+    temporários do NumPy.
+    
+    Args:
+        pontos: Lista de tuplas (latitude, longitude)
+        dtype: Tipo de ponto flutuante da matriz (float32 economiza metade da memória)
+        tamanho_bloco: Número de linhas calculadas por vez
+        saida: Array (n, n) onde gravar a matriz (por exemplo, um arquivo
+               mapeado em memória); se None, um novo array é criado
+        
+    Returns:
+        Matriz de distâncias em quilômetros
+    """
+    coordenadas = np.asarray(pontos, dtype=np.float64).reshape(-1, 2)
+    n = len(coordenadas)
+    lat = coordenadas[:, 0]
+    lon = coordenadas[:, 1]
+    matriz = np.empty((n, n), dtype=dtype) if saida is None else saida
+    
+    for inicio in range(0, n, tamanho_bloco):
+        fim = min(inicio + tamanho_bloco, n)
+        matriz[inicio:fim] = calcular_distancias_haversine(
+            lat[inicio:fim, None], lon[inicio:fim, None], lat[None, :], lon[None, :])
+    
+    return matriz
+
+# Crescimento da área reservada de GrafoMatriz.adicionar_ponto: fator sobre o
+# número de pontos, com um mínimo de linhas novas por vez
+CRESCIMENTO_RESERVA = 1.25
+RESERVA_MINIMA = 64
+
+class GrafoMatriz:
+    """
+    Grafo completo armazenado como uma matriz densa de distâncias (km),
+    com um mapeamento ponto -> índice da linha/coluna correspondente.
+    
+    Pode ser usado no lugar do grafo em dicionário: dijkstra, estimar_tempo_rota
+    e as rotinas de algoritmos.py aceitam as duas representações.
+    """
+    def __init__(self, pontos: List[Tuple[float, float]], distancias: np.ndarray):
+        self.pontos = list(pontos)
+        self.indice: Dict[Tuple[float, float], int] = {ponto: i for i, ponto in enumerate(self.pontos)}
+        self.distancias = distancias
+        # Área reservada para crescer com adicionar_ponto (criada no primeiro uso)
+        self._reserva: np.ndarray = None
+        self._coordenadas: np.ndarray = None
+
+    def __len__(self) -> int:
+        return len(self.pontos)
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        return iter(self.pontos)
+
+    def __contains__(self, ponto) -> bool:
+        return ponto in self.indice
+
+    def __getitem__(self, ponto: Tuple[float, float]) -> Dict[Tuple[float, float], float]:
+        """Vizinhos de um ponto no mesmo formato do grafo em dicionário (custo O(n))"""
+        i = self.indice[ponto]
+        linha = self.distancias[i].tolist()
+        return {destino: linha[j] for j, destino in enumerate(self.pontos) if j != i}
+
+    def distancia(self, origem: Tuple[float, float], destino: Tuple[float, float]) -> float:
+        """Distância direta entre dois pontos do grafo"""
+        return float(self.distancias[self.indice[origem], self.indice[destino]])
+
+    def adicionar_ponto(self, ponto: Tuple[float, float]) -> int:
+        """
+        Acrescenta um ponto ao grafo, calculando só a nova linha e coluna da matriz.
+
+        A matriz passa a ser uma visão de uma área reservada que cresce 25%
+        (CRESCIMENTO_RESERVA) quando enche, então o custo amortizado continua
+        O(n) por ponto e a memória fica em até ~1,6 vez a da matriz, em vez
+        de 4 vezes como ao dobrar. Na primeira inserção a matriz é copiada
+        para a área reservada (inclusive a mapeada do cache em disco). Árvores
+        de caminhos já calculadas (CacheCaminhos) não incluem o novo ponto.
+
+        Returns:
+            Índice do ponto (o existente, se o ponto já estiver no grafo)
+        """
+        if ponto in self.indice:
+            return self.indice[ponto]
+
+        n = len(self.pontos)
+        if self._reserva is None or n >= len(self._reserva):
+            capacidade = max(int(n * CRESCIMENTO_RESERVA), n + RESERVA_MINIMA)
+            reserva = np.empty((capacidade, capacidade), dtype=self.distancias.dtype)
+            reserva[:n, :n] = self.distancias
+            coordenadas = np.empty((capacidade, 2), dtype=np.float64)
+            coordenadas[:n] = np.asarray(self.pontos, dtype=np.float64).reshape(-1, 2)
+            self._reserva = reserva
+            self._coordenadas = coordenadas
+
+        self._coordenadas[n] = ponto
+        linha = calcular_distancias_haversine(ponto[0], ponto[1], self._coordenadas[:n, 0], self._coordenadas[:n, 1])
+        self._reserva[n, :n] = linha
+        self._reserva[:n, n] = linha
+        self._reserva[n, n] = 0.0
+
+        self.pontos.append(ponto)
+        self.indice[ponto] = n
+        self.distancias = self._reserva[:n + 1, :n + 1]
+        return n
+
+class TabelaNos:
+    """
+    Tabela de nós: um ID inteiro denso para cada centro (0..C-1, na ordem da
+    lista) e cada entrega (C..C+E-1, na ordem da lista), mesmo quando dois
+    locais têm as mesmas coordenadas. Coordenadas, nomes e tipos dos locais
+    são consultados pelo ID.
+    """
+    def __init__(self, centros: List[CentroDistribuicao], entregas: List[Entrega]):
+        self.num_centros = len(centros)
+        self.locais: List[Union[CentroDistribuicao, Entrega]] = list(centros) + list(entregas)
+        self.pontos: List[Tuple[float, float]] = ([centro.localizacao for centro in centros] +
+                                                  [entrega.destino_localizacao for entrega in entregas])
+        self.coordenadas = np.asarray(self.pontos, dtype=np.float64).reshape(-1, 2)
+        self._ids: Dict[int, int] = {id(local): no for no, local in enumerate(self.locais)}
+        self._por_ponto: Dict[Tuple[float, float], List[int]] = {}
+        for no, ponto in enumerate(self.pontos):
+            self._por_ponto.setdefault(ponto, []).append(no)
+
+    def __len__(self) -> int:
+        return len(self.locais)
+
+    def no(self, local: Union[CentroDistribuicao, Entrega]) -> int:
+        """
+        ID de um centro ou entrega da tabela. Cópias (objetos que não estão na
+        tabela, como o centro montado por decomposicao.resolver_setor) são
+        localizadas pelas coordenadas, entre os locais do mesmo tipo.
+        """
+        no = self._ids.get(id(local))
+        if no is not None:
+            return no
+        centro = isinstance(local, CentroDistribuicao)
+        ponto = local.localizacao if centro else local.destino_localizacao
+        for no in self._por_ponto.get(ponto, ()):
+            if (no < self.num_centros) == centro:
+                return no
+        raise KeyError(f"Local fora da tabela de nós: {ponto}")
+
+    def nome(self, no: int) -> str:
+        local = self.locais[no]
+        return local.nome if no < self.num_centros else local.destino_nome
+
+    def tipo(self, no: int) -> str:
+        return RegistroLocais.CENTRO if no < self.num_centros else RegistroLocais.ENTREGA
+
+class GrafoNos:
+    """
+    Grafo sobre os IDs de uma TabelaNos, em listas de adjacência indexadas
+    pelo ID (vizinhos[i] e pesos[i], na mesma ordem).
+    
+    As buscas percorrem listas e arrays em vez de dicionários com chaves de
+    coordenadas, e locais com as mesmas coordenadas continuam nós distintos
+    (ligados com peso 0). Rotas e caminhos sobre este grafo são listas de IDs;
+    as coordenadas ficam em tabela.pontos.
+    """
+    def __init__(self, tabela: TabelaNos):
+        self.tabela = tabela
+        self.vizinhos: List[List[int]] = [[] for _ in range(len(tabela))]
+        self.pesos: List[List[float]] = [[] for _ in range(len(tabela))]
+
+    def __len__(self) -> int:
+        return len(self.vizinhos)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self.vizinhos)))
+
+    def __contains__(self, no) -> bool:
+        return isinstance(no, (int, np.integer)) and 0 <= no < len(self.vizinhos)
+
+    def __getitem__(self, no: int) -> List[int]:
+        """Vizinhos de um nó"""
+        return self.vizinhos[no]
+
+    @property
+    def pontos(self) -> List[Tuple[float, float]]:
+        return self.tabela.pontos
+
+    def adicionar_aresta(self, origem: int, destino: int, peso: float) -> None:
+        """Aresta origem -> destino (chame também no sentido inverso para uma via de mão dupla)"""
+        self.vizinhos[origem].append(destino)
+        self.pesos[origem].append(peso)
+
+    def peso(self, origem: int, destino: int) -> Optional[float]:
+        """Peso da aresta origem -> destino (None se não houver)"""
+        try:
+            return self.pesos[origem][self.vizinhos[origem].index(destino)]
+        except ValueError:
+            return None
+
+    def num_arestas(self) -> int:
+        return sum(len(vizinhos) for vizinhos in self.vizinhos)
+
+Grafo = Union[Dict, GrafoMatriz, GrafoNos]
+
+def distancia_entre(grafo: Grafo, origem: Tuple[float, float], destino: Tuple[float, float]) -> float:
+    """
+    Distância de um trecho, lida da matriz quando o grafo for um GrafoMatriz e
+    do peso da aresta quando houver uma (na malha viária o comprimento da via
+    não é a linha reta); sem grafo ou sem aresta, calculada com Haversine. No
+    GrafoNos origem e destino são IDs de nós.
+    """
+    if isinstance(grafo, GrafoMatriz):
+        return grafo.distancia(origem, destino)
+    if isinstance(grafo, GrafoNos):
+        # Rotas já convertidas em coordenadas (caminhao.rota) também são aceitas
+        if isinstance(origem, tuple):
+            return calcular_distancia(origem, destino)
+        peso = grafo.peso(origem, destino)
+        return peso if peso is not None else calcular_distancia(grafo.pontos[origem], grafo.pontos[destino])
+    if grafo is not None:
+        peso = grafo.get(origem, {}).get(destino)
+        if peso is not None:
+            return peso
+    return calcular_distancia(origem, destino)
+
+def coordenadas_esfera(pontos: List[Tuple[float, float]]) -> np.ndarray:
+    """
+    Converte pontos (latitude, longitude) em coordenadas cartesianas sobre a
+    esfera unitária. A distância euclidiana (corda) entre esses vetores cresce
+    com a distância de Haversine, então um índice espacial comum encontra os
+    mesmos vizinhos mais próximos.
+    """
+    coordenadas = np.radians(np.asarray(pontos, dtype=np.float64).reshape(-1, 2))
+    lat = coordenadas[:, 0]
+    lon = coordenadas[:, 1]
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+def km_para_corda(distancia_km: float) -> float:
+    """Converte uma distância na superfície (km) em comprimento de corda na esfera unitária"""
+    return 2 * math.sin(min(distancia_km / (2 * RAIO_TERRA_KM), math.pi / 2))
+
+def componentes_conexas(grafo: Dict) -> List[List[Tuple[float, float]]]:
+    """Retorna as componentes conexas de um grafo em dicionário (busca em largura)"""
+    componentes = []
+    visitados = set()
+    
+    for inicio in grafo:
+        if inicio in visitados:
+            continue
+        
+        componente = [inicio]
+        visitados.add(inicio)
+        for ponto in componente:  # A lista cresce durante a iteração
+            for vizinho in grafo[ponto]:
+                if vizinho not in visitados:
+                    visitados.add(vizinho)
+                    componente.append(vizinho)
+        componentes.append(componente)
+    
+    return componentes
+
+# Vizinhos consultados de uma vez por ponto ao procurar o ponto mais próximo
+# fora da própria componente; o número dobra enquanto não basta, até o máximo
+VIZINHOS_INICIAIS = 16
+VIZINHOS_MAXIMO = 256
+
+def _mais_proximos_fora(arvore, xyz: np.ndarray, rotulos: np.ndarray,
+                        n_componentes: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Para cada componente, o par (ponto dela, ponto de outra componente) mais
+    próximo. Uma única consulta k-NN na KD-tree de todos os pontos resolve a
+    maioria; só os pontos sem vizinho de fora entre os k primeiros, e cujo
+    k-ésimo vizinho ainda está mais perto que o melhor par da componente, são
+    consultados de novo com o dobro de vizinhos. Acima de VIZINHOS_MAXIMO, ou
+    quando a componente tem pendentes demais para isso valer a pena, ela é
+    tratada com uma KD-tree dos pontos de fora dela.
+    
+    Returns:
+        Arrays (distancia em corda, origem, destino) indexados pela componente
+    """
+    from scipy.spatial import cKDTree
+    
+    n = len(xyz)
+    melhor_distancia = np.full(n_componentes, np.inf)
+    melhor_origem = np.full(n_componentes, -1, dtype=np.int64)
+    melhor_destino = np.full(n_componentes, -1, dtype=np.int64)
+    
+    def atualizar(componentes, distancias, origens, destinos):
+        np.minimum.at(melhor_distancia, componentes, distancias)
+        vence = distancias == melhor_distancia[componentes]
+        melhor_origem[componentes[vence]] = origens[vence]
+        melhor_destino[componentes[vence]] = destinos[vence]
+    
+    pendentes = np.arange(n)
+    isoladas = []
+    k = min(VIZINHOS_INICIAIS, n)
+    while len(pendentes) and k <= VIZINHOS_MAXIMO:
+        distancias, vizinhos = arvore.query(xyz[pendentes], k=k)
+        proprios = rotulos[pendentes]
+        fora = rotulos[vizinhos] != proprios[:, None]
+        achou = fora.any(axis=1)
+        coluna = fora.argmax(axis=1)  # Primeiro vizinho de outra componente
+        linhas = np.flatnonzero(achou)
+        atualizar(proprios[linhas], distancias[linhas, coluna[linhas]],
+                  pendentes[linhas], vizinhos[linhas, coluna[linhas]])
+        
+        # Sem vizinho de fora, o mais próximo de fora está além do k-ésimo vizinho
+        restantes = ~achou
+        pendentes = pendentes[restantes][distancias[restantes, -1] < melhor_distancia[proprios[restantes]]]
+        if k == n:
+            break
+        k = min(2 * k, n)
+        
+        # Componente com tantos pendentes que a nova consulta custaria mais
+        # que uma KD-tree dos pontos de fora dela: vai direto para essa árvore
+        contagem = np.bincount(rotulos[pendentes], minlength=n_componentes)
+        grandes = np.flatnonzero(contagem * k >= n)
+        if len(grandes):
+            isoladas.extend(grandes.tolist())
+            pendentes = pendentes[contagem[rotulos[pendentes]] * k < n]
+    
+    isoladas.extend(np.unique(rotulos[pendentes]).tolist())
+    for componente in isoladas:
+        # Componentes grandes e isoladas: KD-tree só dos pontos de fora
+        fora = np.flatnonzero(rotulos != componente)
+        origens = np.flatnonzero(rotulos == componente)
+        distancias, vizinhos = cKDTree(xyz[fora]).query(xyz[origens], k=1)
+        atualizar(np.full(len(origens), componente), distancias, origens, fora[vizinhos])
+    
+    return melhor_distancia, melhor_origem, melhor_destino
+
+def _conectar_componentes(grafo: Grafo, pontos: List, xyz: np.ndarray) -> int:
+    """
+    Liga as componentes de um grafo esparso até que reste uma única componente,
+    em rodadas no estilo de Borůvka: a cada rodada, cada componente ganha a
+    aresta mais curta até outra componente (ver _mais_proximos_fora) e as
+    ligadas são fundidas com union-find. Cada rodada ao menos divide pela
+    metade o número de componentes, e cada rodada custa perto de O(n log n).
+    pontos são as chaves dos nós do grafo (os IDs, no GrafoNos), na ordem de xyz.
+    
+    Returns:
+        Número de arestas adicionadas
+    """
+    from scipy.spatial import cKDTree
+    
+    indice = {ponto: i for i, ponto in enumerate(pontos)}
+    componentes = componentes_conexas(grafo)
+    if len(componentes) < 2:
+        return 0
+    rotulos = np.empty(len(pontos), dtype=np.int64)
+    for c, componente in enumerate(componentes):
+        rotulos[[indice[ponto] for ponto in componente]] = c
+    
+    arvore = cKDTree(xyz)
+    n_componentes = len(componentes)
+    arestas_adicionadas = 0
+    
+    while n_componentes > 1:
+        distancias, origens, destinos = _mais_proximos_fora(arvore, xyz, rotulos, n_componentes)
+        
+        raiz = list(range(n_componentes))
+        def encontrar(c):
+            while raiz[c] != c:
+                raiz[c] = raiz[raiz[c]]
+                c = raiz[c]
+            return c
+        
+        for c in np.argsort(distancias, kind='stable').tolist():
+            i_origem, i_destino = int(origens[c]), int(destinos[c])
+            a, b = encontrar(c), encontrar(int(rotulos[i_destino]))
+            if a == b:
+                continue  # Já ligadas nesta rodada pela aresta de outra componente
+            raiz[a] = b
+            
+            origem, destino = pontos[i_origem], pontos[i_destino]
+            if isinstance(grafo, GrafoNos):
+                peso = calcular_distancia(grafo.pontos[origem], grafo.pontos[destino])
+                grafo.adicionar_aresta(origem, destino, peso)
+                grafo.adicionar_aresta(destino, origem, peso)
+            else:
+                peso = calcular_distancia(origem, destino)
+                grafo[origem][destino] = peso
+                grafo[destino][origem] = peso
+            arestas_adicionadas += 1
+        
+        # Renumera as componentes fundidas como 0..n_componentes-1
+        raizes = np.array([encontrar(c) for c in range(n_componentes)], dtype=np.int64)
+        _, rotulos_componentes = np.unique(raizes, return_inverse=True)
+        rotulos = rotulos_componentes[rotulos]
+        n_componentes = int(rotulos_componentes.max()) + 1
+    
+    return arestas_adicionadas
+
+def _avisar_arestas_adicionadas(arestas_adicionadas: int, relatorio: Relatorio = None):
+    """Registra no relatório quantas arestas _conectar_componentes precisou adicionar"""
+    if arestas_adicionadas:
+        relatorio_padrao(relatorio).registrar(
+            'mensagem', f"Grafo esparso desconexo: {arestas_adicionadas} arestas adicionadas para manter a conectividade")
+
+def _pares_proximos(xyz: np.ndarray, k_vizinhos: int = None, raio_km: float = None) -> Set[Tuple[int, int]]:
+    """Pares (i < j) de pontos vizinhos: os k mais próximos de cada um e/ou os dentro do raio"""
+    from scipy.spatial import cKDTree
+    
+    arvore = cKDTree(xyz)
+    pares = set()
+    
+    if k_vizinhos is not None:
+        k = min(k_vizinhos + 1, len(xyz))  # +1 porque o próprio ponto é retornado
+        _, vizinhos = arvore.query(xyz, k=k)
+        for i, linha in enumerate(vizinhos.reshape(len(xyz), -1).tolist()):
+            for j in linha:
+                if i != j:
+                    pares.add((min(i, j), max(i, j)))
+    
+    if raio_km is not None:
+        for i, j in arvore.query_pairs(km_para_corda(raio_km)):
+            pares.add((min(i, j), max(i, j)))
+    
+    return pares
+
+def construir_grafo_esparso(pontos: List[Tuple[float, float]], k_vizinhos: int = None, raio_km: float = None,
+                            relatorio: Relatorio = None) -> Dict:
+    """
+    Constrói um grafo esparso em dicionário ligando cada ponto apenas aos seus
+    k vizinhos mais próximos e/ou aos vizinhos dentro de um raio.
+    
+    Os vizinhos vêm de uma KD-tree sobre as coordenadas na esfera unitária,
+    então a construção custa O(n log n). As arestas são simétricas e, se o
+    grafo resultante ficar desconexo, as componentes são ligadas pelas
+    arestas mais curtas entre elas para que todo par de pontos tenha rota.
+    
+    Args:
+        pontos: Lista de tuplas (latitude, longitude) sem repetição
+        k_vizinhos: Número de vizinhos mais próximos de cada ponto
+        raio_km: Raio (km) dentro do qual os pontos são ligados
+        relatorio: Relatório que recebe o aviso das arestas adicionadas
+            (padrão: imprime na hora)
+        
+    Returns:
+        Grafo em dicionário no mesmo formato de construir_grafo
+    """
+    if k_vizinhos is None and raio_km is None:
+        raise ValueError("Informe k_vizinhos e/ou raio_km para o grafo esparso")
+    
+    grafo = {ponto: {} for ponto in pontos}
+    if len(pontos) < 2:
+        return grafo
+    
+    xyz = coordenadas_esfera(pontos)
+    for i, j in _pares_proximos(xyz, k_vizinhos, raio_km):
+        origem, destino = pontos[i], pontos[j]
+        peso = calcular_distancia(origem, destino)
+        grafo[origem][destino] = peso
+        grafo[destino][origem] = peso
+    
+    _avisar_arestas_adicionadas(_conectar_componentes(grafo, pontos, xyz), relatorio)
+    
+    return grafo
+
+def construir_grafo(centros: List[CentroDistribuicao], entregas: List[Entrega],
+                    k_vizinhos: int = None, raio_km: float = None, relatorio: Relatorio = None) -> Dict:
+    """
+    Constrói um grafo simples onde cada nó é conectado com todos os outros.
+    
+    Se k_vizinhos ou raio_km forem informados, constrói um grafo esparso em que
+    cada nó é ligado apenas aos vizinhos mais próximos (ver construir_grafo_esparso);
+    o aviso de arestas adicionadas para a conectividade vai para o relatorio.
+    """
     grafo = {}
     # Coleta todos os pontos (centros e destinos)
     pontos = [centro.localizacao for centro in centros] + [entrega.destino_localizacao for entrega in entregas]
     
+    if k_vizinhos is not None or raio_km is not None:
+        return construir_grafo_esparso(list(dict.fromkeys(pontos)), k_vizinhos, raio_km, relatorio)
+    
     # Inicializa o grafo
     for ponto in pontos:
         grafo[ponto] = {}
@@ -53,18 +550,116 @@ def construir_grafo(centros: List[CentroDistribuicao], entregas: List[Entrega])
     
     return grafo
 
-def dijkstra(grafo: Dict, origem: Tuple[float, float], destino: Tuple[float, float]) -> List[Tuple[float, float]]:
-    """Implementação do algoritmo de Dijkstra para encontrar o caminho mais curto"""
+def construir_grafo_matriz(centros: List[CentroDistribuicao], entregas: List[Entrega], dtype=np.float64,
+                           cache=None) -> GrafoMatriz:
+    """
+    Constrói o mesmo grafo completo de construir_grafo, mas como uma matriz
+    densa calculada com Haversine vetorizado (NumPy).
+    
+    Com um cache (cache_distancias.CacheDistancias) a matriz é lida do disco,
+    mapeada em memória, quando o mesmo conjunto de pontos já foi calculado;
+    nesse caso a ordem dos pontos no grafo é a do arquivo em cache.
+    """
+    # Coleta os pontos sem repetição, na mesma ordem de construir_grafo
+    pontos = list(dict.fromkeys([centro.localizacao for centro in centros] +
+                                [entrega.destino_localizacao for entrega in entregas]))
+    if cache is not None:
+        return cache.grafo(pontos)
+    return GrafoMatriz(pontos, calcular_matriz_distancias(pontos, dtype=dtype))
+
+def construir_grafo_nos(centros: List[CentroDistribuicao], entregas: List[Entrega],
+                        k_vizinhos: int = None, raio_km: float = None, relatorio: Relatorio = None) -> GrafoNos:
+    """
+    Constrói o grafo de construir_grafo sobre os IDs de uma TabelaNos: um nó
+    por centro e por entrega, sem juntar locais com as mesmas coordenadas.
+    
+    Sem k_vizinhos e raio_km o grafo é completo, com os pesos calculados uma
+    linha por vez pelo Haversine vetorizado; com eles, é o grafo esparso de
+    construir_grafo_esparso, ligado da mesma forma se ficar desconexo (o aviso
+    vai para o relatorio).
+    """
+    tabela = TabelaNos(centros, entregas)
+    grafo = GrafoNos(tabela)
+    n = len(tabela)
+    lat = tabela.coordenadas[:, 0]
+    lon = tabela.coordenadas[:, 1]
+    
+    if k_vizinhos is None and raio_km is None:
+        todos = list(range(n))
+        for i in range(n):
+            linha = calcular_distancias_haversine(lat[i], lon[i], lat, lon).tolist()
+            grafo.vizinhos[i] = todos[:i] + todos[i + 1:]
+            grafo.pesos[i] = linha[:i] + linha[i + 1:]
+        return grafo
+    
+    if n < 2:
+        return grafo
+    xyz = coordenadas_esfera(tabela.pontos)
+    for i, j in _pares_proximos(xyz, k_vizinhos, raio_km):
+        peso = calcular_distancia(tabela.pontos[i], tabela.pontos[j])
+        grafo.adicionar_aresta(i, j, peso)
+        grafo.adicionar_aresta(j, i, peso)
+    
+    _avisar_arestas_adicionadas(_conectar_componentes(grafo, list(range(n)), xyz), relatorio)
+    
+    return grafo
+
+def _dijkstra_matriz(grafo: GrafoMatriz, i_origem: int, i_destino: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Dijkstra denso sobre a matriz: cada iteração relaxa uma linha inteira de uma vez.
+    Para no destino, se informado; senão calcula as distâncias para todos os pontos.
+    
+    Returns:
+        Arrays (distancias, anterior) indexados pelos índices do grafo (-1 = sem anterior)
+    """
+    n = len(grafo)
+    
+    distancias = np.full(n, np.inf)
+    distancias[i_origem] = 0.0
+    anterior = np.full(n, -1, dtype=np.int64)
+    visitados = np.zeros(n, dtype=bool)
+    pendentes = distancias.copy()  # Distâncias dos vértices ainda não visitados
+    
+    while True:
+        atual = int(np.argmin(pendentes))
+        if pendentes[atual] == np.inf or atual == i_destino:
+            break
+        
+        visitados[atual] = True
+        pendentes[atual] = np.inf
+        
+        candidatas = distancias[atual] + grafo.distancias[atual]
+        melhora = (candidatas < distancias) & ~visitados
+        distancias[melhora] = candidatas[melhora]
+        pendentes[melhora] = candidatas[melhora]
+        anterior[melhora] = atual
+    
+    if instrumentacao.ativa is not None:
+        instrumentacao.ativa.dijkstras += 1
+        instrumentacao.ativa.nos_fixados += int(visitados.sum())
+    return distancias, anterior
+
+def _dijkstra_dict(grafo: Dict, origem: Tuple[float, float], destino: Tuple[float, float] = None) -> Tuple[Dict, Dict]:
+    """
+    Dijkstra com fila de prioridade sobre o grafo em dicionário. Para no destino,
+    se informado; senão calcula as distâncias para todos os pontos.
+    
+    Returns:
+        Dicionários (distancias, anterior) indexados pelos pontos do grafo
+    """
     # Inicialização
     distancias = {ponto: float('infinity') for ponto in grafo}
     distancias[origem] = 0
     fila_prioridade = [(0, origem)]
     anterior = {ponto: None for ponto in grafo}
     visitados = set()
+    insercoes = 1
+    remocoes = 0
     
     while fila_prioridade:
         # Pega o vértice com menor distância
         dist_atual, atual = heapq.heappop(fila_prioridade)
+        remocoes += 1
         
         # Se já processamos este vértice, pula
         if atual in visitados:
@@ -88,17 +683,434 @@ def dijkstra(grafo: Dict, origem: Tuple[float, float], destino: Tuple[float, flo
                 distancias[vizinho] = distancia
                 anterior[vizinho] = atual
                 heapq.heappush(fila_prioridade, (distancia, vizinho))
+                insercoes += 1
     
-    # Reconstrói o caminho
+    if instrumentacao.ativa is not None:
+        estatisticas = instrumentacao.ativa
+        estatisticas.dijkstras += 1
+        estatisticas.insercoes_heap += insercoes
+        estatisticas.remocoes_heap += remocoes
+        estatisticas.nos_fixados += len(visitados)
+    return distancias, anterior
+
+def _dijkstra_nos(grafo: GrafoNos, origem: int, destino: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Dijkstra com fila de prioridade sobre as listas de adjacência do GrafoNos:
+    distâncias, predecessores e nós fixados ficam em listas indexadas pelo ID.
+    Para no destino, se informado; senão calcula as distâncias para todos os nós.
+    
+    Returns:
+        Arrays (distancias, anterior) indexados pelo ID (-1 = sem anterior)
+    """
+    n = len(grafo)
+    distancias = [math.inf] * n
+    distancias[origem] = 0.0
+    anterior = [-1] * n
+    fixados = [False] * n
+    vizinhos = grafo.vizinhos
+    pesos = grafo.pesos
+    fila_prioridade = [(0.0, origem)]
+    insercoes = 1
+    remocoes = 0
+    num_fixados = 0
+    
+    while fila_prioridade:
+        dist_atual, atual = heapq.heappop(fila_prioridade)
+        remocoes += 1
+        if fixados[atual]:
+            continue
+        if atual == destino:
+            break
+        
+        fixados[atual] = True
+        num_fixados += 1
+        
+        for vizinho, peso in zip(vizinhos[atual], pesos[atual]):
+            if fixados[vizinho]:
+                continue
+            distancia = dist_atual + peso
+            if distancia < distancias[vizinho]:
+                distancias[vizinho] = distancia
+                anterior[vizinho] = atual
+                heapq.heappush(fila_prioridade, (distancia, vizinho))
+                insercoes += 1
+    
+    if instrumentacao.ativa is not None:
+        estatisticas = instrumentacao.ativa
+        estatisticas.dijkstras += 1
+        estatisticas.insercoes_heap += insercoes
+        estatisticas.remocoes_heap += remocoes
+        estatisticas.nos_fixados += num_fixados
+    return np.array(distancias), np.array(anterior, dtype=np.int64)
+
+def _astar_dict(grafo: Dict, origem: Tuple[float, float], destino: Tuple[float, float]) -> Tuple[Dict, Dict]:
+    """
+    A* sobre o grafo em dicionário, com a distância de Haversine até o destino
+    como heurística. Só os pontos alcançados entram nos dicionários, então o
+    custo não depende do tamanho do grafo, só da região explorada.
+
+    A heurística é multiplicada por grafo.fator_heuristica, se existir (ver
+    malha_viaria.MalhaViaria), para continuar admissível quando alguma aresta
+    for mais curta que a linha reta entre as suas pontas.
+
+    Returns:
+        Dicionários (distancias, anterior) dos pontos alcançados
+    """
+    fator = getattr(grafo, 'fator_heuristica', 1.0)
+    distancias = {origem: 0.0}
+    anterior = {origem: None}
+    estimativas = {}
+    fila_prioridade = [(fator * calcular_distancia(origem, destino), 0.0, origem)]
+    fixados = set()
+    insercoes = 1
+    remocoes = 0
+
+    while fila_prioridade:
+        _, dist_atual, atual = heapq.heappop(fila_prioridade)
+        remocoes += 1
+
+        if atual in fixados:
+            continue
+        if atual == destino:
+            break
+
+        fixados.add(atual)
+
+        for vizinho, peso in grafo[atual].items():
+            if vizinho in fixados:
+                continue
+
+            distancia = dist_atual + peso
+            if distancia < distancias.get(vizinho, math.inf):
+                distancias[vizinho] = distancia
+                anterior[vizinho] = atual
+                estimativa = estimativas.get(vizinho)
+                if estimativa is None:
+                    estimativa = estimativas[vizinho] = fator * calcular_distancia(vizinho, destino)
+                heapq.heappush(fila_prioridade, (distancia + estimativa, distancia, vizinho))
+                insercoes += 1
+
+    # Destino inalcançável: o caminho fica só com o destino, como em _dijkstra_dict
+    anterior.setdefault(destino, None)
+
+    if instrumentacao.ativa is not None:
+        estatisticas = instrumentacao.ativa
+        estatisticas.dijkstras += 1
+        estatisticas.insercoes_heap += insercoes
+        estatisticas.remocoes_heap += remocoes
+        estatisticas.nos_fixados += len(fixados)
+    return distancias, anterior
+
+def _dijkstra_bidirecional_dict(grafo: Dict, origem: Tuple[float, float],
+                                destino: Tuple[float, float]) -> Tuple[float, List[Tuple[float, float]]]:
+    """
+    Dijkstra bidirecional: uma busca a partir da origem e outra, nas arestas
+    invertidas, a partir do destino, expandindo sempre o lado com a menor
+    distância na fila. Termina quando a soma dos topos das duas filas alcança
+    o melhor caminho já encontrado pelo encontro das buscas.
+
+    As arestas invertidas vêm de grafo.reverso, se existir (grafos com mão
+    única, ver malha_viaria.MalhaViaria); senão o grafo é tratado como simétrico.
+
+    Returns:
+        Tupla (distância, caminho origem -> destino); (inf, [destino]) se inalcançável
+    """
+    if origem == destino:
+        return 0.0, [origem]
+
+    grafos = (grafo, getattr(grafo, 'reverso', grafo))
+    distancias = ({origem: 0.0}, {destino: 0.0})
+    anteriores = ({origem: None}, {destino: None})
+    filas = ([(0.0, origem)], [(0.0, destino)])
+    fixados = (set(), set())
+    melhor = math.inf
+    encontro = None
+    insercoes = 2
+    remocoes = 0
+
+    while filas[0] and filas[1]:
+        if filas[0][0][0] + filas[1][0][0] >= melhor:
+            break
+
+        lado = 0 if filas[0][0][0] <= filas[1][0][0] else 1
+        outro = 1 - lado
+        dist_atual, atual = heapq.heappop(filas[lado])
+        remocoes += 1
+        if atual in fixados[lado]:
+            continue
+        fixados[lado].add(atual)
+
+        distancias_lado = distancias[lado]
+        distancias_outro = distancias[outro]
+        for vizinho, peso in grafos[lado].get(atual, {}).items():
+            distancia = dist_atual + peso
+            if distancia < distancias_lado.get(vizinho, math.inf):
+                distancias_lado[vizinho] = distancia
+                anteriores[lado][vizinho] = atual
+                heapq.heappush(filas[lado], (distancia, vizinho))
+                insercoes += 1
+
+            # Caminho que passa pela aresta atual -> vizinho e segue pela outra busca
+            if vizinho in distancias_outro and distancia + distancias_outro[vizinho] < melhor:
+                melhor = distancia + distancias_outro[vizinho]
+                encontro = vizinho
+
+    if instrumentacao.ativa is not None:
+        estatisticas = instrumentacao.ativa
+        estatisticas.dijkstras += 1
+        estatisticas.insercoes_heap += insercoes
+        estatisticas.remocoes_heap += remocoes
+        estatisticas.nos_fixados += len(fixados[0]) + len(fixados[1])
+
+    if encontro is None:
+        return math.inf, [destino]
+
+    # Metade da origem até o encontro, depois do encontro até o destino
     caminho = []
-    atual = destino
-    while atual:
+    atual = encontro
+    while atual is not None:
         caminho.append(atual)
-        atual = anterior[atual]
+        atual = anteriores[0][atual]
+    caminho.reverse()
+    atual = anteriores[1][encontro]
+    while atual is not None:
+        caminho.append(atual)
+        atual = anteriores[1][atual]
+    return melhor, caminho
+
+def _reconstruir_caminho(grafo: Grafo, anterior, destino: Tuple[float, float]) -> List[Tuple[float, float]]:
+    """Reconstrói o caminho origem -> destino a partir dos predecessores do Dijkstra"""
+    caminho = []
+    
+    if isinstance(grafo, GrafoMatriz):
+        atual = grafo.indice[destino]
+        while atual != -1:
+            caminho.append(grafo.pontos[atual])
+            atual = anterior[atual]
+    elif isinstance(grafo, GrafoNos):
+        atual = destino
+        while atual != -1:
+            caminho.append(atual)
+            atual = int(anterior[atual])
+    else:
+        atual = destino
+        while atual is not None:
+            caminho.append(atual)
+            atual = anterior[atual]
     
     # Inverte o caminho para ter origem -> destino
     return list(reversed(caminho))
 
+class ArvoreCaminhos:
+    """
+    Resultado de um Dijkstra de uma origem para todos os pontos do grafo:
+    responde a distância e o caminho até qualquer destino sem nova busca.
+    """
+    def __init__(self, grafo: Grafo, origem: Tuple[float, float]):
+        self.grafo = grafo
+        self.origem = origem
+        if isinstance(grafo, GrafoMatriz):
+            self.distancias, self.anterior = _dijkstra_matriz(grafo, grafo.indice[origem])
+        elif isinstance(grafo, GrafoNos):
+            self.distancias, self.anterior = _dijkstra_nos(grafo, origem)
+        else:
+            self.distancias, self.anterior = _dijkstra_dict(grafo, origem)
+
+    def distancia(self, destino: Tuple[float, float]) -> float:
+        """Distância do caminho mais curto da origem até o destino"""
+        if isinstance(self.grafo, GrafoMatriz):
+            return float(self.distancias[self.grafo.indice[destino]])
+        if isinstance(self.grafo, GrafoNos):
+            return float(self.distancias[destino])
+        return self.distancias[destino]
+
+    def distancias_para(self, destinos: List) -> np.ndarray:
+        """Distâncias até vários destinos de uma vez (indexação do array no GrafoMatriz e no GrafoNos)"""
+        if isinstance(self.grafo, GrafoMatriz):
+            indices = np.fromiter((self.grafo.indice[destino] for destino in destinos), dtype=np.int64,
+                                  count=len(destinos))
+            return np.asarray(self.distancias[indices], dtype=np.float64)
+        if isinstance(self.grafo, GrafoNos):
+            return self.distancias[np.asarray(destinos, dtype=np.int64)]
+        return np.fromiter((self.distancias[destino] for destino in destinos), dtype=np.float64, count=len(destinos))
+
+    def caminho(self, destino: Tuple[float, float]) -> List[Tuple[float, float]]:
+        """Caminho mais curto da origem até o destino (origem -> destino)"""
+        return _reconstruir_caminho(self.grafo, self.anterior, destino)
+
+class CacheCaminhos:
+    """
+    Cache de caminhos mais curtos sobre um grafo fixo.
+    
+    Para cada origem consultada roda um único Dijkstra para todos os pontos
+    (ArvoreCaminhos) e responde as consultas seguintes a qualquer destino a
+    partir dele. As árvores são descartadas na ordem LRU quando o número de
+    entradas armazenadas (origens x pontos do grafo) passa do limite.
+
+    Com uma hierarquia de contração (hierarquia.HierarquiaContracao) do mesmo
+    grafo, as árvores são substituídas pelas buscas de subida da hierarquia,
+    que só guardam algumas centenas de nós por origem.
+    """
+    def __init__(self, grafo: Grafo, max_origens: int = None, max_entradas: int = 2_000_000,
+                 hierarquia=None):
+        self.grafo = grafo
+        self.hierarquia = hierarquia
+        if max_origens is None:
+            max_origens = max_entradas // (1000 if hierarquia is not None else max(len(grafo), 1))
+        self.max_origens = max(1, max_origens)
+        self._arvores: 'OrderedDict[Tuple[float, float], ArvoreCaminhos]' = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+
+    def __len__(self) -> int:
+        return len(self._arvores)
+
+    def arvore(self, origem: Tuple[float, float]) -> ArvoreCaminhos:
+        """Árvore de caminhos mais curtos a partir da origem (calculada na primeira consulta)"""
+        arvore = self._arvores.get(origem)
+        if arvore is not None:
+            self.acertos += 1
+            self._arvores.move_to_end(origem)
+            return arvore
+        
+        self.falhas += 1
+        if self.hierarquia is not None:
+            arvore = self.hierarquia.arvore(origem)
+        else:
+            arvore = ArvoreCaminhos(self.grafo, origem)
+        self._arvores[origem] = arvore
+        if len(self._arvores) > self.max_origens:
+            self._arvores.popitem(last=False)
+        return arvore
+
+    def distancia(self, origem: Tuple[float, float], destino: Tuple[float, float]) -> float:
+        """Distância do caminho mais curto entre origem e destino"""
+        return self.arvore(origem).distancia(destino)
+
+    def caminho(self, origem: Tuple[float, float], destino: Tuple[float, float]) -> List[Tuple[float, float]]:
+        """Mesmo caminho retornado por dijkstra(grafo, origem, destino)"""
+        return self.arvore(origem).caminho(destino)
+
+    def tabela(self, pontos: List[Tuple[float, float]]) -> np.ndarray:
+        """
+        Tabela (n x n) das distâncias de caminho mais curto entre os pontos,
+        de uma vez pela hierarquia, se houver, ou linha a linha pelas árvores.
+        """
+        if self.hierarquia is not None:
+            return self.hierarquia.tabela(pontos)
+        tabela = np.empty((len(pontos), len(pontos)))
+        for i, origem in enumerate(pontos):
+            arvore = self.arvore(origem)
+            tabela[i] = [arvore.distancia(destino) for destino in pontos]
+        return tabela
+
+    def limpar(self) -> None:
+        """Descarta todas as árvores e zera os contadores"""
+        self._arvores.clear()
+        self.acertos = 0
+        self.falhas = 0
+
+ALGORITMOS_CAMINHO = ('dijkstra', 'astar', 'bidirecional')
+
+def dijkstra(grafo: Grafo, origem: Tuple[float, float], destino: Tuple[float, float],
+             algoritmo: str = 'dijkstra') -> List[Tuple[float, float]]:
+    """
+    Implementação do algoritmo de Dijkstra para encontrar o caminho mais curto
+
+    Em grafos esparsos grandes (como a malha viária de malha_viaria.py) a busca
+    ponto a ponto pode usar algoritmo='astar' (heurística de Haversine) ou
+    'bidirecional', que fixam bem menos nós que o Dijkstra comum. No
+    GrafoMatriz o Dijkstra denso é usado sempre e, no GrafoNos, o Dijkstra
+    sobre listas (origem, destino e o caminho são IDs de nós).
+    """
+    if algoritmo not in ALGORITMOS_CAMINHO:
+        raise ValueError(f"Algoritmo de caminho desconhecido: {algoritmo}")
+
+    if isinstance(grafo, GrafoMatriz):
+        _, anterior = _dijkstra_matriz(grafo, grafo.indice[origem], grafo.indice[destino])
+    elif isinstance(grafo, GrafoNos):
+        _, anterior = _dijkstra_nos(grafo, origem, destino)
+    elif algoritmo == 'astar':
+        _, anterior = _astar_dict(grafo, origem, destino)
+    elif algoritmo == 'bidirecional':
+        return _dijkstra_bidirecional_dict(grafo, origem, destino)[1]
+    else:
+        _, anterior = _dijkstra_dict(grafo, origem, destino)
+    
+    # Reconstrói o caminho
+    return _reconstruir_caminho(grafo, anterior, destino)
+
+class RegistroLocais:
+    """
+    Índice construído uma vez por problema que associa cada ponto (ou índice de
+    nó de um GrafoMatriz) aos locais que estão nele, com nome e tipo, em O(1).
+    
+    Um mesmo ponto pode ter vários locais, por exemplo uma entrega com as mesmas
+    coordenadas de um centro; todos ficam registrados, com os centros primeiro.
+    """
+    CENTRO = 'centro'
+    ENTREGA = 'entrega'
+
+    def __init__(self, centros: List[CentroDistribuicao], entregas: List[Entrega], grafo: Grafo = None):
+        self._locais: Dict[Tuple[float, float], List[Tuple[str, str]]] = {}
+        self._pontos = grafo.pontos if isinstance(grafo, (GrafoMatriz, GrafoNos)) else None
+        # No GrafoNos cada ID é um único local, sem ambiguidade
+        self._tabela = grafo.tabela if isinstance(grafo, GrafoNos) else None
+        
+        for centro in centros:
+            self.registrar(centro.localizacao, centro.nome, self.CENTRO)
+        for entrega in entregas:
+            self.registrar(entrega.destino_localizacao, entrega.destino_nome, self.ENTREGA)
+
+    def _ponto(self, chave) -> Tuple[float, float]:
+        if isinstance(chave, (int, np.integer)) and self._pontos is not None:
+            return self._pontos[chave]
+        return chave
+
+    def registrar(self, ponto: Tuple[float, float], nome: str, tipo: str) -> None:
+        """Adiciona um local em um ponto"""
+        self._locais.setdefault(ponto, []).append((nome, tipo))
+
+    def locais(self, chave) -> List[Tuple[str, str]]:
+        """Todos os locais (nome, tipo) registrados em um ponto ou índice de nó"""
+        if self._tabela is not None and isinstance(chave, (int, np.integer)):
+            return [(self._tabela.nome(chave), self._tabela.tipo(chave))]
+        return self._locais.get(self._ponto(chave), [])
+
+    def nome(self, chave, tipo: str = None) -> str:
+        """
+        Nome do local em um ponto ou índice de nó. Se o tipo for informado,
+        prefere um local desse tipo quando houver mais de um no mesmo ponto.
+        """
+        locais = self.locais(chave)
+        if not locais:
+            # Se não encontrar, retorna as coordenadas
+            ponto = self._ponto(chave)
+            return f"Ponto ({ponto[0]:.2f}, {ponto[1]:.2f})"
+        
+        if tipo is not None:
+            for nome, tipo_local in locais:
+                if tipo_local == tipo:
+                    return nome
+        return locais[0][0]
+
+    def tipo(self, chave) -> str:
+        """Tipo do primeiro local registrado no ponto (None se não houver)"""
+        locais = self.locais(chave)
+        return locais[0][1] if locais else None
+
+def no_centro(grafo: Grafo, centro: CentroDistribuicao):
+    """Chave do centro no grafo: o ID da TabelaNos no GrafoNos; as coordenadas nos demais"""
+    if isinstance(grafo, GrafoNos):
+        return grafo.tabela.no(centro)
+    return centro.localizacao
+
+def no_entrega(grafo: Grafo, entrega: Entrega):
+    """Chave do destino da entrega no grafo: o ID da TabelaNos no GrafoNos; as coordenadas nos demais"""
+    if isinstance(grafo, GrafoNos):
+        return grafo.tabela.no(entrega)
+    return entrega.destino_localizacao
+
 def encontrar_nome_local(localizacao: Tuple[float, float], centros: List[CentroDistribuicao], entregas: List[Entrega]) -> str:
     """Encontra o nome de um local com base nas coordenadas"""
     # Primeiro verifica se é um centro de distribuição
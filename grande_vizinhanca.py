@@ -0,0 +1,428 @@
+"""
+Busca em grande vizinhança (LNS) com prazo de relógio e partidas múltiplas.
+
+Parte da solução do pipeline (caminhões carregados por
+atribuir_entregas_aos_caminhoes ou, com economias=True, pelo algoritmo de
+economias) e, até o tempo limite, repete: remove algumas entregas das rotas
+dos caminhões de um centro (sorteadas, as de maior custo na rota ou um grupo
+de entregas próximas entre si) e as reinsere, junto com entregas ainda não
+atribuídas, na posição de menor acréscimo de distância de um caminhão do
+mesmo centro que ainda as comporta (a mais barata, a de maior
+arrependimento ou a mais leve primeiro). As rotas alteradas passam por
+2-opt/Or-opt (busca_local.py). A nova solução é aceita por recozimento
+simulado, e a melhor encontrada em cada centro (menos entregas não
+atribuídas e, depois, menos km) é sempre guardada: a busca pode parar no
+prazo com a melhor solução até ali.
+
+As regras são as do carregamento de origem: capacidade_max e, para cada
+entrega, a ida e volta dentro do prazo (a mesma decisão de
+verificar_viabilidade_entrega) ou, com economias, a rota inteira dentro do
+menor prazo das suas entregas.
+
+As tabelas de distâncias (uma por centro, do centro e das suas entregas) e as
+regras são montadas uma vez no processo principal; a busca não usa o grafo.
+Com processos > 1, partidas independentes (sementes diferentes) rodam em um
+pool de processos e fica, para cada centro, a melhor solução entre elas.
+"""
+from typing import List, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import math
+import os
+import time
+import numpy as np
+from models import CentroDistribuicao, Entrega
+from grafo import Grafo, CacheCaminhos, no_centro, no_entrega
+from algoritmos import INDEFINIDA, VIAVEL, pre_verificar_viabilidade, verificar_viabilidade_entrega
+from economias import tabela_distancias
+from busca_local import EPSILON_MELHORIA, melhorar_rota, tabela_simetrica
+from insercao import distancia_sequencia, ordem_vizinho_mais_proximo
+from relatorio import Relatorio, relatorio_padrao
+
+# Entregas removidas por iteração: entre MIN_REMOCAO e MAX_REMOCAO, e no
+# máximo FRACAO_REMOCAO das atribuídas no centro
+MIN_REMOCAO = 2
+MAX_REMOCAO = 30
+FRACAO_REMOCAO = 0.3
+
+# Entregas não atribuídas sorteadas a cada reparo, além das removidas
+MAX_CANDIDATAS_LIVRES = 100
+
+# Quanto maior, mais a remoção das piores e das relacionadas segue a ordem
+# (1 = sorteio uniforme)
+EXPOENTE_SORTEIO = 3
+
+# Piora relativa da distância do centro aceita com probabilidade 1/2 no início;
+# a temperatura cai linearmente até zero no prazo
+TEMPERATURA_INICIAL = 0.01
+
+OPERADORES_REMOCAO = ('aleatoria', 'pior', 'relacionada')
+CRITERIOS_REINSERCAO = ('barata', 'arrependimento', 'leve')
+
+# Objetivo de um centro: (entregas não atribuídas, km)
+Objetivo = Tuple[int, float]
+
+class _ProblemaCentro:
+    """
+    Dados fixos de um centro: tabela de distâncias com o centro no nó 0 e a
+    entrega i no nó i + 1, pesos e prazos por nó, os caminhões e, por
+    caminhão, os nós cuja ida e volta cabe no prazo.
+    """
+    __slots__ = ('tabela', 'pesos', 'prazos', 'capacidades', 'velocidades', 'limites', 'viaveis',
+                 'regra_rota', 'simetrica', 'penalidade')
+
+    def __init__(self, tabela: np.ndarray, entregas: List[Entrega], centro: CentroDistribuicao,
+                 viaveis: np.ndarray, regra_rota: bool):
+        self.tabela = tabela
+        self.pesos = np.array([0.0] + [entrega.peso for entrega in entregas], dtype=np.float64)
+        self.prazos = np.array([np.inf] + [entrega.prazo for entrega in entregas], dtype=np.float64)
+        self.capacidades = np.array([caminhao.capacidade_max for caminhao in centro.caminhoes], dtype=np.float64)
+        self.velocidades = np.array([caminhao.velocidade_media for caminhao in centro.caminhoes], dtype=np.float64)
+        self.limites = np.array([caminhao.limite_de_horas for caminhao in centro.caminhoes], dtype=np.float64)
+        self.viaveis = np.hstack((np.zeros((len(viaveis), 1), dtype=bool), viaveis))
+        self.regra_rota = regra_rota
+        # 2-opt inverte trechos: só vale se a tabela for simétrica (sem mão única)
+        self.simetrica = tabela_simetrica(tabela)
+        # Uma entrega não atribuída custa mais que qualquer acréscimo de distância
+        # (a inserção mais barata nunca passa da ida e volta ao centro)
+        ida_e_volta = tabela[0, 1:] + tabela[1:, 0]
+        finitas = ida_e_volta[np.isfinite(ida_e_volta)]
+        self.penalidade = 2.0 * float(finitas.max()) + 1.0 if len(finitas) else 1.0
+
+    @property
+    def num_entregas(self) -> int:
+        return len(self.pesos) - 1
+
+class _Solucao:
+    """Rotas (nós na ordem de visita) dos caminhões de um centro e as entregas não atribuídas"""
+    __slots__ = ('rotas', 'cargas', 'distancias', 'livres')
+
+    def __init__(self, rotas: List[List[int]], cargas: List[float], distancias: List[float], livres: Set[int]):
+        self.rotas = rotas
+        self.cargas = cargas
+        self.distancias = distancias
+        self.livres = livres
+
+    @classmethod
+    def de_rotas(cls, problema: _ProblemaCentro, rotas: List[List[int]]) -> '_Solucao':
+        atribuidos = {no for rota in rotas for no in rota}
+        return cls([list(rota) for rota in rotas],
+                   [float(problema.pesos[rota].sum()) for rota in rotas],
+                   [distancia_sequencia(problema.tabela, 0, rota) for rota in rotas],
+                   set(range(1, problema.num_entregas + 1)) - atribuidos)
+
+    def copiar(self) -> '_Solucao':
+        return _Solucao([list(rota) for rota in self.rotas], list(self.cargas), list(self.distancias),
+                        set(self.livres))
+
+    def objetivo(self) -> Objetivo:
+        return len(self.livres), sum(self.distancias)
+
+    def custo(self, problema: _ProblemaCentro) -> float:
+        """Objetivo em um único número, para o critério de aceitação"""
+        return sum(self.distancias) + problema.penalidade * len(self.livres)
+
+def _melhor(a: Objetivo, b: Objetivo) -> bool:
+    """a é melhor que b: menos entregas não atribuídas ou, empatado, menos km"""
+    return a[0] < b[0] or (a[0] == b[0] and a[1] < b[1] - EPSILON_MELHORIA)
+
+def _sortear_em_ordem(ordenados: List[int], quantidade: int, rng: np.random.Generator) -> List[int]:
+    """Sorteia sem repetição favorecendo o começo da lista (EXPOENTE_SORTEIO)"""
+    restantes = list(ordenados)
+    escolhidos = []
+    while restantes and len(escolhidos) < quantidade:
+        escolhidos.append(restantes.pop(int(len(restantes) * rng.random() ** EXPOENTE_SORTEIO)))
+    return escolhidos
+
+def _remover(problema: _ProblemaCentro, solucao: _Solucao, quantidade: int, operador: str,
+             rng: np.random.Generator) -> Tuple[List[int], Set[int]]:
+    """
+    Tira entregas das rotas e as marca como livres: sorteadas ('aleatoria'),
+    as que mais encurtam a rota ao sair ('pior') ou as mais próximas de uma
+    entrega sorteada ('relacionada').
+
+    Returns:
+        Tupla (nós removidos, caminhões alterados)
+    """
+    tabela = problema.tabela
+    atribuidos = [no for rota in solucao.rotas for no in rota]
+    if not atribuidos:
+        return [], set()
+    quantidade = min(quantidade, len(atribuidos))
+
+    if operador == 'aleatoria':
+        removidos = [atribuidos[i] for i in rng.choice(len(atribuidos), quantidade, replace=False)]
+    elif operador == 'pior':
+        economias = []
+        for rota in solucao.rotas:
+            if rota:
+                sequencia = np.array([0] + rota + [0], dtype=np.int64)
+                anteriores, nos, seguintes = sequencia[:-2], sequencia[1:-1], sequencia[2:]
+                economias.append(tabela[anteriores, nos] + tabela[nos, seguintes] - tabela[anteriores, seguintes])
+        ordem = np.argsort(-np.concatenate(economias), kind='stable')
+        removidos = _sortear_em_ordem([atribuidos[i] for i in ordem], quantidade, rng)
+    else:
+        semente = atribuidos[int(rng.integers(len(atribuidos)))]
+        nos = np.array(atribuidos, dtype=np.int64)
+        proximidade = tabela[semente, nos] + tabela[nos, semente]
+        outros = [atribuidos[i] for i in np.argsort(proximidade, kind='stable') if atribuidos[i] != semente]
+        removidos = [semente] + _sortear_em_ordem(outros, quantidade - 1, rng)
+
+    conjunto = set(removidos)
+    alterados = set()
+    for k, rota in enumerate(solucao.rotas):
+        if conjunto.isdisjoint(rota):
+            continue
+        solucao.rotas[k] = [no for no in rota if no not in conjunto]
+        solucao.cargas[k] = float(problema.pesos[solucao.rotas[k]].sum())
+        solucao.distancias[k] = distancia_sequencia(tabela, 0, solucao.rotas[k])
+        alterados.add(k)
+    solucao.livres.update(removidos)
+    return removidos, alterados
+
+def _custos_caminhao(problema: _ProblemaCentro, solucao: _Solucao, k: int,
+                     candidatas: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Menor acréscimo de distância de cada candidata na rota do caminhão k (inf
+    se ela não couber) e a posição correspondente.
+    """
+    tabela = problema.tabela
+    rota = solucao.rotas[k]
+    sequencia = np.array([0] + rota + [0], dtype=np.int64)
+    anteriores, seguintes = sequencia[:-1], sequencia[1:]
+    with np.errstate(invalid='ignore'):
+        acrescimos = (tabela[np.ix_(anteriores, candidatas)] + tabela[np.ix_(candidatas, seguintes)].T -
+                      tabela[anteriores, seguintes][:, None])
+    acrescimos[np.isnan(acrescimos)] = np.inf
+    posicoes = np.argmin(acrescimos, axis=0)
+    custos = acrescimos[posicoes, np.arange(len(candidatas))]
+
+    cabem = (problema.viaveis[k, candidatas] & np.isfinite(custos) &
+             (solucao.cargas[k] + problema.pesos[candidatas] <= problema.capacidades[k]))
+    if problema.regra_rota:
+        # Mesma conta de rota_respeita_prazos: a rota inteira dentro do menor prazo
+        prazo_rota = problema.prazos[rota].min() if rota else np.inf
+        dias = (solucao.distancias[k] + custos) / problema.velocidades[k] / problema.limites[k]
+        cabem &= dias <= np.minimum(prazo_rota, problema.prazos[candidatas])
+    return np.where(cabem, custos, np.inf), posicoes
+
+def _reinserir(problema: _ProblemaCentro, solucao: _Solucao, candidatas: List[int], criterio: str) -> Set[int]:
+    """
+    Insere as candidatas, uma por vez, na posição mais barata do caminhão que
+    as comporta, até nenhuma caber. A próxima é a de menor acréscimo
+    ('barata'), a que mais perde se não for para o seu melhor caminhão
+    ('arrependimento') ou a mais leve ('leve'). As que sobram ficam livres.
+
+    Returns:
+        Caminhões alterados
+    """
+    if not candidatas:
+        return set()
+    nos = np.array(candidatas, dtype=np.int64)
+    num_caminhoes = len(solucao.rotas)
+    custos = np.empty((num_caminhoes, len(nos)))
+    posicoes = np.empty((num_caminhoes, len(nos)), dtype=np.int64)
+    for k in range(num_caminhoes):
+        custos[k], posicoes[k] = _custos_caminhao(problema, solucao, k, nos)
+
+    alterados = set()
+    pendentes = np.ones(len(nos), dtype=bool)
+    while True:
+        custos[:, ~pendentes] = np.inf
+        melhores = custos.min(axis=0)
+        cabem = np.isfinite(melhores)
+        if not cabem.any():
+            break
+        if criterio == 'arrependimento' and num_caminhoes > 1:
+            ordenados = np.sort(custos, axis=0)
+            with np.errstate(invalid='ignore'):
+                arrependimento = ordenados[1] - ordenados[0]
+            j = int(np.argmax(np.where(cabem, arrependimento, -np.inf)))
+        elif criterio == 'leve':
+            j = int(np.lexsort((melhores, np.where(cabem, problema.pesos[nos], np.inf)))[0])
+        else:
+            j = int(np.argmin(melhores))
+
+        k = int(np.argmin(custos[:, j]))
+        no = int(nos[j])
+        solucao.rotas[k].insert(int(posicoes[k, j]), no)
+        solucao.cargas[k] += float(problema.pesos[no])
+        solucao.distancias[k] += float(custos[k, j])
+        solucao.livres.discard(no)
+        pendentes[j] = False
+        alterados.add(k)
+        custos[k], posicoes[k] = _custos_caminhao(problema, solucao, k, nos)
+    return alterados
+
+def _melhorar_rotas(problema: _ProblemaCentro, solucao: _Solucao, caminhoes: Set[int]) -> None:
+    """Aplica 2-opt/Or-opt às rotas alteradas e recalcula suas distâncias"""
+    for k in caminhoes:
+        rota = solucao.rotas[k]
+        if problema.simetrica and len(rota) >= 3:
+            nos = [0] + rota
+            ordem, _, _ = melhorar_rota(problema.tabela[np.ix_(nos, nos)])
+            solucao.rotas[k] = [nos[i] for i in ordem]
+        solucao.distancias[k] = distancia_sequencia(problema.tabela, 0, solucao.rotas[k])
+
+def _iteracao(problema: _ProblemaCentro, atual: _Solucao, rng: np.random.Generator) -> _Solucao:
+    """Uma remoção seguida de reinserção sobre uma cópia da solução atual"""
+    candidata = atual.copiar()
+    atribuidas = problema.num_entregas - len(candidata.livres)
+    maximo = max(MIN_REMOCAO, min(MAX_REMOCAO, int(FRACAO_REMOCAO * atribuidas)))
+    quantidade = int(rng.integers(MIN_REMOCAO, maximo + 1))
+    livres = sorted(candidata.livres)
+    removidos, alterados = _remover(problema, candidata, quantidade,
+                                    OPERADORES_REMOCAO[int(rng.integers(len(OPERADORES_REMOCAO)))], rng)
+
+    # As não atribuídas que ainda cabem em algum caminhão também concorrem
+    folga = max(capacidade - carga for capacidade, carga in zip(problema.capacidades, candidata.cargas))
+    livres = [no for no in livres if problema.pesos[no] <= folga]
+    if len(livres) > MAX_CANDIDATAS_LIVRES:
+        livres = [livres[i] for i in rng.choice(len(livres), MAX_CANDIDATAS_LIVRES, replace=False)]
+    criterio = CRITERIOS_REINSERCAO[int(rng.integers(len(CRITERIOS_REINSERCAO)))]
+    alterados |= _reinserir(problema, candidata, removidos + livres, criterio)
+    _melhorar_rotas(problema, candidata, alterados)
+    return candidata
+
+def _buscar(problemas: List[_ProblemaCentro], iniciais: List[_Solucao], fim: float,
+            rng: np.random.Generator) -> Tuple[List[_Solucao], int]:
+    """
+    LNS sobre todos os centros até o instante fim (time.time()). A cada
+    iteração um centro é sorteado, com probabilidade proporcional ao seu
+    número de entregas.
+
+    Returns:
+        Tupla (melhor solução de cada centro, iterações feitas)
+    """
+    atuais = list(iniciais)
+    melhores = list(iniciais)
+    indices = [c for c, problema in enumerate(problemas) if problema.num_entregas and len(problema.capacidades)]
+    if not indices:
+        return melhores, 0
+    tamanhos = np.array([problemas[c].num_entregas for c in indices], dtype=np.float64)
+    probabilidades = tamanhos / tamanhos.sum()
+    temperaturas = [TEMPERATURA_INICIAL * max(sum(solucao.distancias), 1.0) / math.log(2) for solucao in iniciais]
+
+    inicio = time.time()
+    iteracoes = 0
+    while (agora := time.time()) < fim:
+        c = indices[int(rng.choice(len(indices), p=probabilidades))]
+        problema = problemas[c]
+        candidata = _iteracao(problema, atuais[c], rng)
+        iteracoes += 1
+
+        piora = candidata.custo(problema) - atuais[c].custo(problema)
+        temperatura = temperaturas[c] * max(0.0, 1.0 - (agora - inicio) / max(fim - inicio, 1e-9))
+        if piora <= 0 or (temperatura > 0 and rng.random() < math.exp(-piora / temperatura)):
+            atuais[c] = candidata
+        if _melhor(candidata.objetivo(), melhores[c].objetivo()):
+            melhores[c] = candidata
+    return melhores, iteracoes
+
+# Estado de cada processo trabalhador, preenchido uma vez pelo inicializador
+_problemas_trabalhador: List[_ProblemaCentro] = None
+_iniciais_trabalhador: List[_Solucao] = None
+
+def _inicializar_trabalhador(problemas: List[_ProblemaCentro], iniciais: List[_Solucao]) -> None:
+    global _problemas_trabalhador, _iniciais_trabalhador
+
+    _problemas_trabalhador = problemas
+    _iniciais_trabalhador = iniciais
+
+def _partida(tarefa: Tuple[np.random.SeedSequence, float]) -> Tuple[List[List[List[int]]], int]:
+    """Uma partida da busca no trabalhador; devolve só as rotas de cada centro e as iterações"""
+    semente, fim = tarefa
+    melhores, iteracoes = _buscar(_problemas_trabalhador, _iniciais_trabalhador, fim, np.random.default_rng(semente))
+    return [solucao.rotas for solucao in melhores], iteracoes
+
+def _montar_problema(centro: CentroDistribuicao, entregas: List[Entrega], grafo: Grafo, cache: CacheCaminhos,
+                     economias: bool) -> _ProblemaCentro:
+    """Tabela de distâncias e viabilidade caminhão x entrega de um centro, pela regra do carregamento"""
+    pontos = [no_centro(grafo, centro)] + [no_entrega(grafo, entrega) for entrega in entregas]
+    tabela = np.ascontiguousarray(tabela_distancias(pontos, grafo, cache), dtype=np.float64)
+    estados = pre_verificar_viabilidade(centro, entregas, grafo, cache)
+    viaveis = estados == VIAVEL
+    for k, i in np.argwhere(estados == INDEFINIDA):
+        viaveis[k, i] = verificar_viabilidade_entrega(centro.caminhoes[k], entregas[i], centro, grafo, [], [], cache)
+    return _ProblemaCentro(tabela, entregas, centro, viaveis, economias)
+
+def otimizar_por_grande_vizinhanca(centros: List[CentroDistribuicao], grafo: Grafo, cache: CacheCaminhos = None,
+                                   tempo_limite: float = 2.0, processos: int = None, semente: int = None,
+                                   economias: bool = False,
+                                   relatorio: Relatorio = None) -> Tuple[Objetivo, Objetivo]:
+    """
+    Melhora, dentro do tempo limite, o carregamento já feito dos caminhões.
+
+    A solução de partida é a de caminhao.entregas (na ordem do vizinho mais
+    próximo ou, com economias=True, na ordem recebida) e centro.entregas (as
+    não atribuídas). O tempo limite conta desde a chamada, incluindo a
+    montagem das tabelas de distâncias; se ele acabar antes da busca, a
+    solução de partida é mantida. No fim, caminhao.entregas fica na ordem de
+    visita (para calcular_rota_caminhao com manter_ordem=True, como em
+    decomposicao.calcular_rotas_por_setores) e centro.entregas com as que
+    continuam sem caminhão.
+
+    Args:
+        centros: Centros com os caminhões já carregados
+        grafo: Grafo das localizações (GrafoMatriz evita buscas para montar as tabelas)
+        cache: Cache de caminhos, usado quando o grafo não é um GrafoMatriz
+        tempo_limite: Tempo de relógio em segundos
+        processos: Partidas independentes, uma por processo (padrão: número de núcleos)
+        semente: Semente das partidas (None = aleatória)
+        economias: Regra de prazo da rota inteira, como em atribuir_entregas_por_economias
+        relatorio: Relatório que recebe o resumo da busca (impresso na hora se não informado)
+
+    Returns:
+        Tupla (objetivo antes, objetivo depois), cada um como (entregas não atribuídas, km)
+    """
+    fim = time.time() + tempo_limite
+    relatorio = relatorio_padrao(relatorio)
+    if cache is None:
+        cache = CacheCaminhos(grafo)
+
+    problemas = []
+    iniciais = []
+    entregas_por_centro = []
+    for centro in centros:
+        entregas = [entrega for caminhao in centro.caminhoes for entrega in caminhao.entregas] + list(centro.entregas)
+        problema = _montar_problema(centro, entregas, grafo, cache, economias)
+        rotas = []
+        inicio = 1
+        for caminhao in centro.caminhoes:
+            nos = list(range(inicio, inicio + len(caminhao.entregas)))
+            inicio += len(caminhao.entregas)
+            rotas.append(nos if economias else ordem_vizinho_mais_proximo(problema.tabela, 0, nos))
+        problemas.append(problema)
+        iniciais.append(_Solucao.de_rotas(problema, rotas))
+        entregas_por_centro.append(entregas)
+
+    processos = processos or os.cpu_count() or 1
+    sementes = np.random.SeedSequence(semente).spawn(processos)
+    if processos == 1:
+        melhores, iteracoes = _buscar(problemas, iniciais, fim, np.random.default_rng(sementes[0]))
+        partidas = [[solucao.rotas for solucao in melhores]]
+    else:
+        with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_trabalhador,
+                                 initargs=(problemas, iniciais)) as executor:
+            resultados = list(executor.map(_partida, [(s, fim) for s in sementes]))
+        partidas = [rotas for rotas, _ in resultados]
+        iteracoes = sum(n for _, n in resultados)
+
+    # Os centros são independentes: fica a melhor partida de cada um
+    antes = (0, 0.0)
+    depois = (0, 0.0)
+    for c, (centro, problema, entregas) in enumerate(zip(centros, problemas, entregas_por_centro)):
+        melhor = iniciais[c]
+        for rotas in partidas:
+            solucao = _Solucao.de_rotas(problema, rotas[c])
+            if _melhor(solucao.objetivo(), melhor.objetivo()):
+                melhor = solucao
+        for caminhao, rota in zip(centro.caminhoes, melhor.rotas):
+            caminhao.entregas = [entregas[no - 1] for no in rota]
+        centro.entregas = [entregas[no - 1] for no in sorted(melhor.livres)]
+        antes = (antes[0] + iniciais[c].objetivo()[0], antes[1] + iniciais[c].objetivo()[1])
+        depois = (depois[0] + melhor.objetivo()[0], depois[1] + melhor.objetivo()[1])
+
+    relatorio.registrar('mensagem', f"Busca em grande vizinhança ({iteracoes} iterações, {processos} partidas): "
+                                    f"{antes[0]} → {depois[0]} entregas não atribuídas, "
+                                    f"{antes[1]:.2f} km → {depois[1]:.2f} km")
+    return antes, depois
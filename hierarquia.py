@@ -0,0 +1,416 @@
+"""
+Hierarquia de contração para consultas repetidas de caminho mais curto.
+
+O pré-processamento contrai os nós do grafo um a um, do menos ao mais
+importante, acrescentando atalhos (u -> w passando pelo nó contraído v)
+sempre que o caminho u -> v -> w for o único mais curto entre u e w. Depois
+disso, o caminho mais curto entre dois pontos é achado por duas buscas que
+só sobem na hierarquia (da origem pelas arestas de saída, do destino pelas de
+entrada) e se encontram no nó mais alto do caminho; cada busca visita poucas
+centenas de nós mesmo em malhas grandes.
+
+A hierarquia vale para o grafo em dicionário (inclusive a malha viária, com
+mão única) e pode ser gravada em disco (salvar / carregar) para não refazer
+o pré-processamento. Com CacheCaminhos(grafo, hierarquia=...) as rotinas de
+algoritmos.py e economias.py passam a consultá-la no lugar do Dijkstra.
+
+As distâncias são as mesmas do dijkstra, a menos do arredondamento de ponto
+flutuante (as parcelas são somadas em outra ordem).
+"""
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+import heapq
+import math
+import os
+import numpy as np
+from grafo import Grafo, GrafoMatriz
+import instrumentacao
+
+Ponto = Tuple[float, float]
+
+# Limite de nós fixados por busca de testemunha; ao atingi-lo o atalho é
+# criado mesmo que pudesse ser dispensado (mais atalhos, mesmo resultado)
+MAX_FIXADOS_TESTEMUNHA = 500
+
+# Acima desta fração das n(n-1) arestas possíveis o grafo é tratado como
+# denso: nenhum nó dispensa atalhos, a contração cresce muito mais que
+# quadraticamente e as buscas na hierarquia não são mais curtas que o Dijkstra
+DENSIDADE_MAXIMA = 0.5
+
+def grafo_denso(grafo: Grafo) -> bool:
+    """O grafo é um GrafoMatriz ou tem mais de DENSIDADE_MAXIMA das arestas possíveis (como o completo)"""
+    if isinstance(grafo, GrafoMatriz):
+        return True
+    n = len(grafo)
+    arestas = sum(len(vizinhos) for vizinhos in grafo.values())
+    return n > 2 and arestas > DENSIDADE_MAXIMA * n * (n - 1)
+
+def _busca_testemunha(saida: List[Dict[int, float]], contraido: List[bool], origem: int, ignorado: int,
+                      limite: float, alvos: set) -> Dict[int, float]:
+    """
+    Dijkstra a partir de origem sem passar por ignorado nem por nós já
+    contraídos, até a distância limite, MAX_FIXADOS_TESTEMUNHA nós ou todos
+    os alvos fixados.
+
+    Returns:
+        Distâncias (provisórias ou definitivas) dos nós alcançados
+    """
+    distancias = {origem: 0.0}
+    fila = [(0.0, origem)]
+    fixados = 0
+    restantes = len(alvos)
+    while fila and restantes:
+        dist_atual, atual = heapq.heappop(fila)
+        if dist_atual > limite or fixados >= MAX_FIXADOS_TESTEMUNHA:
+            break
+        if dist_atual > distancias[atual]:
+            continue
+        fixados += 1
+        if atual in alvos:
+            restantes -= 1
+        for vizinho, peso in saida[atual].items():
+            if vizinho == ignorado or contraido[vizinho]:
+                continue
+            distancia = dist_atual + peso
+            if distancia < distancias.get(vizinho, math.inf):
+                distancias[vizinho] = distancia
+                heapq.heappush(fila, (distancia, vizinho))
+    return distancias
+
+def _atalhos_necessarios(saida: List[Dict[int, float]], entrada: List[Dict[int, float]], contraido: List[bool],
+                         v: int) -> Tuple[List[Tuple[int, int, float]], int]:
+    """
+    Atalhos que a contração de v exige, com as buscas de testemunha.
+
+    Returns:
+        Tupla (atalhos (u, w, peso), número de arestas de v ainda ativas)
+    """
+    entradas = [(u, peso) for u, peso in entrada[v].items() if not contraido[u]]
+    saidas = [(w, peso) for w, peso in saida[v].items() if not contraido[w]]
+    atalhos = []
+    if entradas and saidas:
+        max_saida = max(peso for _, peso in saidas)
+        for u, peso_entrada in entradas:
+            candidatos = {w: peso_entrada + peso_saida for w, peso_saida in saidas if w != u}
+            if not candidatos:
+                continue
+            testemunhas = _busca_testemunha(saida, contraido, u, v, peso_entrada + max_saida, set(candidatos))
+            for w, peso in candidatos.items():
+                if testemunhas.get(w, math.inf) > peso:
+                    atalhos.append((u, w, peso))
+    return atalhos, len(entradas) + len(saidas)
+
+def _busca_subida(subida: List[List[Tuple[int, float]]], origem: int) -> Tuple[Dict[int, float], Dict[int, int]]:
+    """
+    Dijkstra completo só pelas arestas que sobem na hierarquia.
+
+    Returns:
+        Dicionários (distancias, anterior) dos nós do espaço de busca
+    """
+    distancias = {origem: 0.0}
+    anterior = {origem: -1}
+    fila = [(0.0, origem)]
+    insercoes = 1
+    remocoes = 0
+    while fila:
+        dist_atual, atual = heapq.heappop(fila)
+        remocoes += 1
+        if dist_atual > distancias[atual]:
+            continue
+        for vizinho, peso in subida[atual]:
+            distancia = dist_atual + peso
+            if distancia < distancias.get(vizinho, math.inf):
+                distancias[vizinho] = distancia
+                anterior[vizinho] = atual
+                heapq.heappush(fila, (distancia, vizinho))
+                insercoes += 1
+
+    if instrumentacao.ativa is not None:
+        estatisticas = instrumentacao.ativa
+        estatisticas.dijkstras += 1
+        estatisticas.insercoes_heap += insercoes
+        estatisticas.remocoes_heap += remocoes
+        estatisticas.nos_fixados += len(distancias)
+    return distancias, anterior
+
+class EspacoBusca:
+    """Resultado de uma busca de subida a partir de um nó (origem ou destino)"""
+    __slots__ = ('no', 'distancias', 'anterior')
+
+    def __init__(self, no: int, distancias: Dict[int, float], anterior: Dict[int, int]):
+        self.no = no
+        self.distancias = distancias
+        self.anterior = anterior
+
+class HierarquiaContracao:
+    """
+    Hierarquia de contração de um grafo em dicionário.
+
+    Use HierarquiaContracao.construir(grafo) para o pré-processamento e
+    salvar / carregar para reaproveitá-lo. As consultas recebem pontos
+    (latitude, longitude) do grafo original.
+    """
+    def __init__(self, pontos: List[Ponto], subida_saida: List[List[Tuple[int, float]]],
+                 subida_entrada: List[List[Tuple[int, float]]], meio: Dict[Tuple[int, int], int],
+                 max_espacos: int = 10_000):
+        self.pontos = list(pontos)
+        self.indice: Dict[Ponto, int] = {ponto: i for i, ponto in enumerate(self.pontos)}
+        self.subida_saida = subida_saida
+        self.subida_entrada = subida_entrada
+        self.meio = meio
+        self.max_espacos = max_espacos
+        self._espacos_destino: 'OrderedDict[int, EspacoBusca]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.pontos)
+
+    def num_atalhos(self) -> int:
+        return len(self.meio)
+
+    @classmethod
+    def construir(cls, grafo: Grafo) -> 'HierarquiaContracao':
+        """
+        Contrai todos os nós do grafo. A ordem é escolhida pela diferença de
+        arestas (atalhos criados menos arestas removidas) mais o número de
+        vizinhos já contraídos, com atualização preguiçosa das prioridades.
+        Grafos densos (grafo_denso) são recusados.
+        """
+        if isinstance(grafo, GrafoMatriz):
+            raise ValueError("A hierarquia de contração é para grafos esparsos em dicionário; "
+                             "no GrafoMatriz a distância direta já é a do caminho mais curto")
+        if grafo_denso(grafo):
+            raise ValueError("A hierarquia de contração é para grafos esparsos; o grafo tem mais de "
+                             f"{DENSIDADE_MAXIMA:.0%} das arestas possíveis (use o GrafoMatriz)")
+
+        pontos = list(grafo)
+        indice = {ponto: i for i, ponto in enumerate(pontos)}
+        n = len(pontos)
+        saida: List[Dict[int, float]] = [{} for _ in range(n)]
+        entrada: List[Dict[int, float]] = [{} for _ in range(n)]
+        for origem, vizinhos in grafo.items():
+            i = indice[origem]
+            for destino, peso in vizinhos.items():
+                j = indice[destino]
+                if i != j and peso < saida[i].get(j, math.inf):
+                    saida[i][j] = peso
+                    entrada[j][i] = peso
+
+        contraido = [False] * n
+        vizinhos_contraidos = [0] * n
+        nivel = [0] * n
+        meio: Dict[Tuple[int, int], int] = {}
+
+        def prioridade(v: int) -> Tuple[int, List[Tuple[int, int, float]]]:
+            atalhos, arestas = _atalhos_necessarios(saida, entrada, contraido, v)
+            return len(atalhos) - arestas + vizinhos_contraidos[v], atalhos
+
+        fila = [(prioridade(v)[0], v) for v in range(n)]
+        heapq.heapify(fila)
+        ordem = 0
+        while fila:
+            _, v = heapq.heappop(fila)
+            if contraido[v]:
+                continue
+            # Atualização preguiçosa: se a prioridade piorou, volta para a fila
+            atual, atalhos = prioridade(v)
+            if fila and atual > fila[0][0]:
+                heapq.heappush(fila, (atual, v))
+                continue
+
+            for u, w, peso in atalhos:
+                if peso < saida[u].get(w, math.inf):
+                    saida[u][w] = peso
+                    entrada[w][u] = peso
+                    meio[(u, w)] = v
+            contraido[v] = True
+            nivel[v] = ordem
+            ordem += 1
+            for vizinho in set(saida[v]) | set(entrada[v]):
+                vizinhos_contraidos[vizinho] += 1
+
+        subida_saida = [[(w, peso) for w, peso in saida[v].items() if nivel[w] > nivel[v]] for v in range(n)]
+        subida_entrada = [[(u, peso) for u, peso in entrada[v].items() if nivel[u] > nivel[v]] for v in range(n)]
+        return cls(pontos, subida_saida, subida_entrada, meio)
+
+    def salvar(self, caminho_arquivo: str) -> None:
+        """Grava a hierarquia em um arquivo .npz (listas de adjacência em formato CSR)"""
+        def csr(listas):
+            inicio = np.zeros(len(listas) + 1, dtype=np.int64)
+            np.cumsum([len(lista) for lista in listas], out=inicio[1:])
+            destinos = np.fromiter((w for lista in listas for w, _ in lista), dtype=np.int64, count=inicio[-1])
+            pesos = np.fromiter((peso for lista in listas for _, peso in lista), dtype=np.float64, count=inicio[-1])
+            return inicio, destinos, pesos
+
+        saida_inicio, saida_destinos, saida_pesos = csr(self.subida_saida)
+        entrada_inicio, entrada_destinos, entrada_pesos = csr(self.subida_entrada)
+        atalhos = np.array([(u, w, v) for (u, w), v in self.meio.items()], dtype=np.int64).reshape(-1, 3)
+        with open(caminho_arquivo, 'wb') as arquivo:
+            np.savez(arquivo, pontos=np.asarray(self.pontos, dtype=np.float64).reshape(-1, 2),
+                     saida_inicio=saida_inicio, saida_destinos=saida_destinos, saida_pesos=saida_pesos,
+                     entrada_inicio=entrada_inicio, entrada_destinos=entrada_destinos, entrada_pesos=entrada_pesos,
+                     atalhos=atalhos)
+
+    @classmethod
+    def carregar(cls, caminho_arquivo: str) -> 'HierarquiaContracao':
+        """Lê uma hierarquia gravada com salvar"""
+        with np.load(caminho_arquivo) as dados:
+            def listas(prefixo):
+                inicio = dados[prefixo + '_inicio'].tolist()
+                destinos = dados[prefixo + '_destinos'].tolist()
+                pesos = dados[prefixo + '_pesos'].tolist()
+                return [list(zip(destinos[inicio[v]:inicio[v + 1]], pesos[inicio[v]:inicio[v + 1]]))
+                        for v in range(len(inicio) - 1)]
+
+            pontos = [tuple(ponto) for ponto in dados['pontos'].tolist()]
+            meio = {(u, w): v for u, w, v in dados['atalhos'].tolist()}
+            return cls(pontos, listas('saida'), listas('entrada'), meio)
+
+    def espaco_origem(self, origem: Ponto) -> EspacoBusca:
+        """Busca de subida a partir da origem (arestas de saída)"""
+        i = self.indice[origem]
+        return EspacoBusca(i, *_busca_subida(self.subida_saida, i))
+
+    def espaco_destino(self, destino: Ponto) -> EspacoBusca:
+        """Busca de subida a partir do destino (arestas de entrada), guardada em LRU"""
+        j = self.indice[destino]
+        espaco = self._espacos_destino.get(j)
+        if espaco is not None:
+            self._espacos_destino.move_to_end(j)
+            return espaco
+        espaco = EspacoBusca(j, *_busca_subida(self.subida_entrada, j))
+        self._espacos_destino[j] = espaco
+        if len(self._espacos_destino) > self.max_espacos:
+            self._espacos_destino.popitem(last=False)
+        return espaco
+
+    def _encontro(self, ida: EspacoBusca, volta: EspacoBusca) -> Tuple[float, int]:
+        """Menor distância pelos nós comuns aos dois espaços de busca"""
+        if len(ida.distancias) > len(volta.distancias):
+            menor, maior = volta.distancias, ida.distancias
+        else:
+            menor, maior = ida.distancias, volta.distancias
+        melhor = math.inf
+        encontro = -1
+        for no, distancia in menor.items():
+            outra = maior.get(no)
+            if outra is not None and distancia + outra < melhor:
+                melhor = distancia + outra
+                encontro = no
+        return melhor, encontro
+
+    def _desempacotar(self, u: int, w: int, caminho: List[int]) -> None:
+        """Acrescenta ao caminho os nós originais da aresta u -> w (sem u)"""
+        pilha = [(u, w)]
+        while pilha:
+            a, b = pilha.pop()
+            v = self.meio.get((a, b))
+            if v is None:
+                caminho.append(b)
+            else:
+                pilha.append((v, b))
+                pilha.append((a, v))
+
+    def _caminho(self, ida: EspacoBusca, volta: EspacoBusca, encontro: int) -> List[Ponto]:
+        if encontro == -1:
+            return [self.pontos[volta.no]]
+        subida = []
+        no = encontro
+        while no != -1:
+            subida.append(no)
+            no = ida.anterior[no]
+        subida.reverse()
+        no = volta.anterior[encontro]
+        while no != -1:
+            subida.append(no)
+            no = volta.anterior[no]
+
+        caminho = [subida[0]]
+        for u, w in zip(subida, subida[1:]):
+            self._desempacotar(u, w, caminho)
+        return [self.pontos[no] for no in caminho]
+
+    def distancia(self, origem: Ponto, destino: Ponto) -> float:
+        """Distância do caminho mais curto (inf se inalcançável)"""
+        return self._encontro(self.espaco_origem(origem), self.espaco_destino(destino))[0]
+
+    def caminho(self, origem: Ponto, destino: Ponto) -> List[Ponto]:
+        """Caminho mais curto com os nós do grafo original, como o de dijkstra"""
+        ida = self.espaco_origem(origem)
+        volta = self.espaco_destino(destino)
+        return self._caminho(ida, volta, self._encontro(ida, volta)[1])
+
+    def arvore(self, origem: Ponto) -> 'ArvoreHierarquia':
+        """Consultas a partir de uma origem fixa, com a busca da origem feita uma vez"""
+        return ArvoreHierarquia(self, origem)
+
+    def tabela(self, origens: List[Ponto], destinos: List[Ponto] = None) -> np.ndarray:
+        """
+        Tabela de distâncias de todas as origens para todos os destinos.
+
+        Cada destino faz uma busca de subida e deixa a sua distância em um
+        balde em cada nó alcançado; cada origem faz a sua busca e combina as
+        distâncias com os baldes dos nós que alcançou. O custo é uma busca por
+        ponto em vez de uma por par.
+
+        Returns:
+            Array (len(origens), len(destinos)); inf onde não há caminho
+        """
+        if destinos is None:
+            destinos = origens
+        baldes: Dict[int, List[Tuple[int, float]]] = {}
+        for j, destino in enumerate(destinos):
+            for no, distancia in self.espaco_destino(destino).distancias.items():
+                baldes.setdefault(no, []).append((j, distancia))
+
+        tabela = np.full((len(origens), len(destinos)), np.inf)
+        for i, origem in enumerate(origens):
+            linha = [math.inf] * len(destinos)
+            for no, distancia in self.espaco_origem(origem).distancias.items():
+                for j, restante in baldes.get(no, ()):
+                    if distancia + restante < linha[j]:
+                        linha[j] = distancia + restante
+            tabela[i] = linha
+        return tabela
+
+class ArvoreHierarquia:
+    """
+    Mesma interface de grafo.ArvoreCaminhos (distancia / caminho a partir de
+    uma origem), respondida pela hierarquia de contração.
+    """
+    def __init__(self, hierarquia: HierarquiaContracao, origem: Ponto):
+        self.hierarquia = hierarquia
+        self.origem = origem
+        self._ida = hierarquia.espaco_origem(origem)
+
+    def distancia(self, destino: Ponto) -> float:
+        return self.hierarquia._encontro(self._ida, self.hierarquia.espaco_destino(destino))[0]
+
+    def distancias_para(self, destinos: List[Ponto]) -> np.ndarray:
+        return np.fromiter((self.distancia(destino) for destino in destinos), dtype=np.float64,
+                           count=len(destinos))
+
+    def caminho(self, destino: Ponto) -> List[Ponto]:
+        volta = self.hierarquia.espaco_destino(destino)
+        return self.hierarquia._caminho(self._ida, volta, self.hierarquia._encontro(self._ida, volta)[1])
+
+def obter_hierarquia(grafo: Grafo, caminho_arquivo: str = None) -> Optional[HierarquiaContracao]:
+    """
+    Lê a hierarquia de caminho_arquivo, se existir e for dos mesmos pontos do
+    grafo; senão a constrói e, com caminho_arquivo, grava para as próximas
+    execuções. Os pesos das arestas não são conferidos: o arquivo deve ser
+    apagado se a malha mudar sem mudar os nós.
+
+    Em grafos densos (grafo_denso) devolve None: a hierarquia não acelera as
+    consultas e a contração não termina em tempo útil, então o CacheCaminhos
+    segue com o Dijkstra.
+    """
+    if grafo_denso(grafo):
+        return None
+    if caminho_arquivo and os.path.exists(caminho_arquivo):
+        hierarquia = HierarquiaContracao.carregar(caminho_arquivo)
+        if len(hierarquia) == len(grafo) and all(ponto in hierarquia.indice for ponto in grafo):
+            return hierarquia
+    hierarquia = HierarquiaContracao.construir(grafo)
+    if caminho_arquivo:
+        hierarquia.salvar(caminho_arquivo)
+    return hierarquia
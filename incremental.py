@@ -0,0 +1,151 @@
+from typing import Dict, List, Optional, Tuple
+from models import CentroDistribuicao, Entrega, Caminhao
+from grafo import GrafoMatriz, construir_grafo_matriz
+from algoritmos import encontrar_centro_mais_proximo
+from insercao import distancia_sequencia, melhor_posicao_insercao, rota_respeita_prazos
+
+class _EstadoCaminhao:
+    """Rota atual de um caminhão como sequência de entregas e seus índices na matriz"""
+    __slots__ = ('caminhao', 'centro', 'entregas', 'nos', 'carga', 'distancia')
+
+    def __init__(self, caminhao: Caminhao, centro: CentroDistribuicao, entregas: List[Entrega], nos: List[int],
+                 distancia: float):
+        self.caminhao = caminhao
+        self.centro = centro
+        self.entregas = entregas
+        self.nos = nos
+        self.carga = sum(entrega.peso for entrega in entregas)
+        self.distancia = distancia
+
+    def prazo_minimo(self) -> float:
+        return min((entrega.prazo for entrega in self.entregas), default=float('inf'))
+
+class PlanoIncremental:
+    """
+    Plano já resolvido que aceita novas entregas (e cancelamentos) sem refazer tudo.
+
+    Cada nova entrega acrescenta uma linha e uma coluna à matriz de distâncias
+    (GrafoMatriz.adicionar_ponto), é atribuída ao centro mais próximo e inserida
+    na posição mais barata entre as rotas atuais dos caminhões desse centro,
+    respeitando capacidade_max e o limite de horas (a rota inteira, em dias de
+    limite_de_horas, deve caber no menor prazo das suas entregas). Apenas a rota
+    do caminhão escolhido é recalculada.
+    """
+
+    def __init__(self, centros: List[CentroDistribuicao], entregas: List[Entrega], grafo: GrafoMatriz = None):
+        """
+        Args:
+            centros: Centros com caminhões já carregados (caminhao.entregas) e,
+                     de preferência, com rotas calculadas (caminhao.rota)
+            entregas: Todas as entregas do plano
+            grafo: Grafo em matriz com os pontos do plano (construído se não informado)
+        """
+        self.centros = centros
+        self._entregas: Dict[int, Entrega] = {id(entrega): entrega for entrega in entregas}
+        self.grafo = grafo if grafo is not None else construir_grafo_matriz(centros, entregas)
+        self._estados: Dict[int, _EstadoCaminhao] = {}
+        self._caminhao_da_entrega: Dict[int, _EstadoCaminhao] = {}
+        self._centro_da_entrega: Dict[int, CentroDistribuicao] = {}
+
+        for centro in centros:
+            deposito = self.grafo.adicionar_ponto(centro.localizacao)
+            for entrega in centro.entregas:
+                self._centro_da_entrega[id(entrega)] = centro
+            for caminhao in centro.caminhoes:
+                ordem = self._ordem_de_visita(caminhao)
+                nos = [self.grafo.adicionar_ponto(entrega.destino_localizacao) for entrega in ordem]
+                estado = _EstadoCaminhao(caminhao, centro, ordem, nos,
+                                         distancia_sequencia(self.grafo.distancias, deposito, nos))
+                self._estados[id(caminhao)] = estado
+                for entrega in ordem:
+                    self._caminhao_da_entrega[id(entrega)] = estado
+                    self._centro_da_entrega[id(entrega)] = centro
+
+    @property
+    def entregas(self) -> List[Entrega]:
+        """Todas as entregas do plano, na ordem em que foram adicionadas"""
+        return list(self._entregas.values())
+
+    @staticmethod
+    def _ordem_de_visita(caminhao: Caminhao) -> List[Entrega]:
+        """Entregas do caminhão na ordem em que aparecem na rota (ou na ordem de carregamento)"""
+        if not caminhao.rota:
+            return list(caminhao.entregas)
+        posicao = {}
+        for i, ponto in enumerate(caminhao.rota[1:], start=1):
+            posicao.setdefault(ponto, i)
+        return sorted(caminhao.entregas, key=lambda e: posicao.get(e.destino_localizacao, len(caminhao.rota)))
+
+    def _atualizar_rota(self, estado: _EstadoCaminhao) -> None:
+        """Recalcula apenas a rota do caminhão alterado (grafo completo: trechos diretos)"""
+        caminhao = estado.caminhao
+        caminhao.entregas = list(estado.entregas)
+        if estado.entregas:
+            caminhao.rota = ([estado.centro.localizacao] +
+                             [entrega.destino_localizacao for entrega in estado.entregas] +
+                             [estado.centro.localizacao])
+        else:
+            caminhao.rota = []
+
+    def adicionar_entrega(self, entrega: Entrega) -> Optional[Caminhao]:
+        """
+        Adiciona uma entrega ao plano pela inserção viável de menor custo.
+
+        Returns:
+            O caminhão que recebeu a entrega, ou None se nenhum caminhão do
+            centro mais próximo puder atendê-la (a entrega fica em centro.entregas)
+        """
+        no = self.grafo.adicionar_ponto(entrega.destino_localizacao)
+        centro = encontrar_centro_mais_proximo(self.centros, entrega)
+        deposito = self.grafo.indice[centro.localizacao]
+        self._entregas[id(entrega)] = entrega
+        self._centro_da_entrega[id(entrega)] = centro
+
+        melhor: Tuple[float, _EstadoCaminhao, int] = None
+        for caminhao in centro.caminhoes:
+            estado = self._estados[id(caminhao)]
+            if estado.carga + entrega.peso > caminhao.capacidade_max:
+                continue
+
+            posicao, acrescimo = melhor_posicao_insercao(self.grafo.distancias, deposito, estado.nos, no)
+            prazo = min(estado.prazo_minimo(), entrega.prazo)
+            if not rota_respeita_prazos(estado.distancia + acrescimo, caminhao, prazo):
+                continue
+            if melhor is None or acrescimo < melhor[0]:
+                melhor = (acrescimo, estado, posicao)
+
+        if melhor is None:
+            centro.entregas.append(entrega)
+            return None
+
+        acrescimo, estado, posicao = melhor
+        estado.entregas.insert(posicao, entrega)
+        estado.nos.insert(posicao, no)
+        estado.carga += entrega.peso
+        estado.distancia += acrescimo
+        self._caminhao_da_entrega[id(entrega)] = estado
+        self._atualizar_rota(estado)
+        return estado.caminhao
+
+    def cancelar_entrega(self, entrega: Entrega) -> None:
+        """Remove uma entrega do plano, refazendo apenas a rota do caminhão que a atendia"""
+        estado = self._caminhao_da_entrega.pop(id(entrega), None)
+        centro = self._centro_da_entrega.pop(id(entrega), None)
+        if centro is None:
+            raise ValueError(f"Entrega {entrega.id} não pertence ao plano")
+
+        del self._entregas[id(entrega)]
+        if estado is None:
+            centro.entregas = [e for e in centro.entregas if e is not entrega]
+            return
+
+        posicao = next(i for i, e in enumerate(estado.entregas) if e is entrega)
+        del estado.entregas[posicao]
+        del estado.nos[posicao]
+        estado.carga -= entrega.peso
+        estado.distancia = distancia_sequencia(self.grafo.distancias, self.grafo.indice[centro.localizacao], estado.nos)
+        self._atualizar_rota(estado)
+
+    def distancia_caminhao(self, caminhao: Caminhao) -> float:
+        """Distância atual da rota de um caminhão (km)"""
+        return self._estados[id(caminhao)].distancia
@@ -0,0 +1,50 @@
+from typing import List, Sequence, Tuple
+import numpy as np
+from models import Caminhao
+
+def dias_necessarios(distancia_km: float, caminhao: Caminhao) -> float:
+    """Dias que o caminhão leva para percorrer a distância, dado seu limite de horas por dia"""
+    return distancia_km / caminhao.velocidade_media / caminhao.limite_de_horas
+
+def rota_respeita_prazos(distancia_km: float, caminhao: Caminhao, prazo_minimo: float) -> bool:
+    """
+    Verifica se uma rota fechada (saindo e voltando ao centro) cabe no menor
+    prazo das suas entregas: tempo total / limite_de_horas <= prazo.
+    """
+    return dias_necessarios(distancia_km, caminhao) <= prazo_minimo
+
+def distancia_sequencia(distancias: np.ndarray, deposito: int, nos: Sequence[int]) -> float:
+    """Distância de uma rota fechada deposito -> nos... -> deposito sobre a tabela de distâncias"""
+    if len(nos) == 0:
+        return 0.0
+    sequencia = np.concatenate(([deposito], np.asarray(nos, dtype=np.int64), [deposito]))
+    return float(distancias[sequencia[:-1], sequencia[1:]].sum())
+
+def ordem_vizinho_mais_proximo(distancias: np.ndarray, deposito: int = 0, nos: Sequence[int] = None) -> List[int]:
+    """
+    Ordem de visita dos nós pelo vizinho mais próximo, saindo do depósito
+    (padrão: todos os nós da tabela, exceto o depósito).
+    """
+    restantes = [no for no in range(len(distancias)) if no != deposito] if nos is None else list(nos)
+    ordem = []
+    atual = deposito
+    while restantes:
+        atual = restantes.pop(int(np.argmin(distancias[atual, restantes])))
+        ordem.append(atual)
+    return ordem
+
+def custos_insercao(distancias: np.ndarray, deposito: int, nos: Sequence[int], novo: int) -> np.ndarray:
+    """
+    Acréscimo de distância ao inserir o nó novo em cada posição da rota
+    fechada (posição p = antes de nos[p]; a última posição é antes do retorno).
+    """
+    sequencia = np.concatenate(([deposito], np.asarray(nos, dtype=np.int64), [deposito]))
+    anteriores = sequencia[:-1]
+    seguintes = sequencia[1:]
+    return distancias[anteriores, novo] + distancias[novo, seguintes] - distancias[anteriores, seguintes]
+
+def melhor_posicao_insercao(distancias: np.ndarray, deposito: int, nos: Sequence[int], novo: int) -> Tuple[int, float]:
+    """Posição de menor custo para inserir o nó novo na rota e o acréscimo de distância correspondente"""
+    custos = custos_insercao(distancias, deposito, nos, novo)
+    posicao = int(np.argmin(custos))
+    return posicao, float(custos[posicao])
@@ -0,0 +1,78 @@
+from typing import Dict, Iterator
+from contextlib import contextmanager
+import time
+
+class Estatisticas:
+    """
+    Contadores dos pontos quentes do resolvedor e tempos de cada etapa.
+
+    Os contadores só são incrementados enquanto há uma coleta ativa (ver
+    coletar); fora dela o custo nos pontos quentes é um teste de None.
+    """
+    __slots__ = ('distancias', 'dijkstras', 'insercoes_heap', 'remocoes_heap', 'nos_fixados', 'tempos')
+
+    CONTADORES = ('distancias', 'dijkstras', 'insercoes_heap', 'remocoes_heap', 'nos_fixados')
+
+    def __init__(self):
+        self.distancias = 0       # avaliações de Haversine (escalares ou elementos de arrays)
+        self.dijkstras = 0        # execuções de Dijkstra (ponto a ponto ou para todos os pontos)
+        self.insercoes_heap = 0   # heappush na fila de prioridade
+        self.remocoes_heap = 0    # heappop na fila de prioridade
+        self.nos_fixados = 0      # vértices com distância definitiva
+        self.tempos: Dict[str, float] = {}  # segundos acumulados por etapa
+
+    def somar(self, outra: 'Estatisticas') -> None:
+        """Acumula os contadores e tempos de outra coleta (por exemplo, de outro processo)"""
+        for contador in self.CONTADORES:
+            setattr(self, contador, getattr(self, contador) + getattr(outra, contador))
+        for etapa, segundos in outra.tempos.items():
+            self.tempos[etapa] = self.tempos.get(etapa, 0.0) + segundos
+
+    def como_dict(self) -> Dict:
+        """Contadores e tempos em um dicionário (serializável em JSON)"""
+        dados = {contador: getattr(self, contador) for contador in self.CONTADORES}
+        dados['tempos'] = dict(self.tempos)
+        return dados
+
+    def resumo(self) -> str:
+        """Texto com os contadores e os tempos de cada etapa"""
+        linhas = [f"Distâncias calculadas: {self.distancias}",
+                  f"Execuções de Dijkstra: {self.dijkstras}",
+                  f"Operações no heap: {self.insercoes_heap} inserções, {self.remocoes_heap} remoções",
+                  f"Nós fixados: {self.nos_fixados}"]
+        linhas += [f"Etapa {etapa}: {segundos:.4f} s" for etapa, segundos in self.tempos.items()]
+        return "\n".join(linhas)
+
+# Coleta em andamento (None quando a instrumentação está desligada)
+ativa: Estatisticas = None
+
+@contextmanager
+def coletar(estatisticas: Estatisticas = None) -> Iterator[Estatisticas]:
+    """
+    Ativa a instrumentação dentro do bloco with e devolve as estatísticas coletadas.
+
+    Exemplo:
+        with coletar() as estatisticas:
+            atribuir_entregas_aos_caminhoes(...)
+        print(estatisticas.resumo())
+    """
+    global ativa
+    anterior = ativa
+    ativa = estatisticas if estatisticas is not None else Estatisticas()
+    try:
+        yield ativa
+    finally:
+        ativa = anterior
+
+@contextmanager
+def etapa(nome: str) -> Iterator[None]:
+    """Cronometra o bloco with como a etapa nome, se houver coleta ativa"""
+    estatisticas = ativa
+    if estatisticas is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        estatisticas.tempos[nome] = estatisticas.tempos.get(nome, 0.0) + time.perf_counter() - inicio
@@ -1,5 +1,5 @@
 from models import CentroDistribuicao, Entrega, Caminhao
-from grafo import construir_grafo
+from grafo import construir_grafo, construir_grafo_matriz, construir_grafo_nos, CacheCaminhos, RegistroLocais
 from algoritmos import (
     atribuir_entregas_aos_centros,
     atribuir_entregas_aos_caminhoes,
@@ -7,11 +7,20 @@ from algoritmos import (
     desenhar_mapa,
     carregar_entregas_csv
 )
+from economias import atribuir_entregas_por_economias
+from decomposicao import atribuir_entregas_por_setores, calcular_rotas_por_setores
+from grande_vizinhanca import otimizar_por_grande_vizinhanca
+from cache_distancias import CacheDistancias
+from paralelo import resolver_centros_em_paralelo
+from relatorio import Relatorio, SILENCIOSO, DETALHADO, relatorio_padrao
+from instrumentacao import coletar, etapa
+import contextlib
 import datetime
-from memory_profiler import profile
+import os
 
-def criar_dados_teste():
+def criar_dados_teste(relatorio: Relatorio = None):
     """Criar dados para testar o sistema"""
+    relatorio = relatorio_padrao(relatorio)
     # 1. Criar os centros de distribuição
     centros = [
         CentroDistribuicao(1, "Belém", (-1.45, -48.48)),
@@ -22,12 +31,12 @@ def criar_dados_teste():
     ]
 
     # 2. Criar entregas
-    entregas = carregar_entregas_csv("entregas.csv")
+    entregas = carregar_entregas_csv("entregas.csv", relatorio)
     
     # Se não houver entregas carregadas (arquivo não encontrado ou vazio), 
     # use dados de exemplo pré-definidos como fallback
     if not entregas:
-        print("Usando dados de entrega de exemplo pré-definidos...")
+        relatorio.registrar('mensagem', "Usando dados de entrega de exemplo pré-definidos...")
         entregas = [
             # Região Norte (Manaus e proximidades)
             Entrega(1, (-3.10, -60.02), "Manaus", 800.0, 5),
@@ -49,43 +58,155 @@ def criar_dados_teste():
     
     return centros, entregas
 
-@profile
-def resolver_problema():
+def resolver_problema(melhorar_rotas: bool = False, paralelo: bool = False, processos: int = None,
+                      economias: bool = False, verbosidade: int = DETALHADO, arquivo_relatorio: str = None,
+                      formato_relatorio: str = 'texto', arquivo_mapa: str = None, instrumentar: bool = False,
+                      cache_distancias: str = None, setores: bool = False, grafo_nos: bool = False,
+                      tempo_lns: float = None):
+    """
+    Função principal que resolve o problema de distribuição.
+    
+    Com paralelo=True cada centro é resolvido em um processo separado, lendo a
+    matriz de distâncias em memória compartilhada (ver paralelo.py).
+    Com economias=True os caminhões são carregados pelo algoritmo de economias
+    de Clarke-Wright (ver economias.py) em vez do guloso por prazo.
+    
+    O relatório (relatorio.py) é acumulado durante a solução e escrito de uma
+    vez no final: na saída padrão ou, se arquivo_relatorio for informado, no
+    arquivo, em formato 'texto', 'jsonl' ou 'csv'. verbosidade vai de
+    SILENCIOSO a DETALHADO. Com arquivo_mapa o mapa é salvo em PNG em vez de
+    aberto em uma janela.
+    
+    Com instrumentar=True são contadas as distâncias calculadas, as execuções
+    de Dijkstra, as operações no heap e os nós fixados, e cada etapa é
+    cronometrada (ver instrumentacao.py).
+    
+    Com cache_distancias (um diretório) o grafo é a matriz densa, gravada em
+    disco na primeira execução e mapeada em memória nas seguintes (ver
+    cache_distancias.py).
+    
+    Com setores=True as entregas de cada centro são divididas em setores de
+    varredura resolvidos independentemente (ver decomposicao.py), para centros
+    com muitas entregas; com paralelo=True são os setores, e não os centros,
+    que vão para o pool de processos.
+    
+    Com grafo_nos=True (sem paralelo nem cache_distancias, que usam a matriz)
+    o grafo completo é montado sobre IDs inteiros dos centros e entregas, em
+    listas de adjacência, em vez de dicionários com chaves de coordenadas
+    (ver grafo.GrafoNos).
+    
+    Com tempo_lns (segundos) o carregamento é melhorado por busca em grande
+    vizinhança até esse tempo de relógio (ver grande_vizinhanca.py); com
+    paralelo=True as partidas independentes da busca, e não os centros, vão
+    para o pool de processos.
+    
+    Returns:
+        Tupla (centros com caminhões e rotas, Estatisticas ou None se instrumentar=False)
+    """
     inicio = datetime.datetime.now()
-    """Função principal que resolve o problema de distribuição"""
-    print("Iniciando solução do problema de distribuição...")
+    if verbosidade > SILENCIOSO:
+        print("Iniciando solução do problema de distribuição...")
+    relatorio = Relatorio(verbosidade)
     
-    # Criar os dados de teste
-    centros, entregas = criar_dados_teste()
+    with (coletar() if instrumentar else contextlib.nullcontext()) as estatisticas:
+        # Criar os dados de teste
+        with etapa('carregar_dados'):
+            centros, entregas = criar_dados_teste(relatorio)
+
+        # 4. Construir o grafo
+        relatorio.registrar('secao', "Construindo grafo com todas as localizações...")
+        with etapa('construir_grafo'):
+            if cache_distancias:
+                grafo = construir_grafo_matriz(centros, entregas, cache=CacheDistancias(cache_distancias))
+            elif paralelo:
+                grafo = construir_grafo_matriz(centros, entregas)
+            elif grafo_nos:
+                grafo = construir_grafo_nos(centros, entregas)
+            else:
+                grafo = construir_grafo(centros, entregas)
+        cache = CacheCaminhos(grafo)
+        registro = RegistroLocais(centros, entregas, grafo)
 
-    # 4. Construir o grafo
-    print("\nConstruindo grafo com todas as localizações...")
-    grafo = construir_grafo(centros, entregas)
+        # 5. Atribuir entregas aos centros mais próximos
+        relatorio.registrar('secao', "Atribuindo entregas aos centros mais próximos...")
+        with etapa('atribuir_centros'):
+            atribuir_entregas_aos_centros(centros, entregas, relatorio)
 
-    # 5. Atribuir entregas aos centros mais próximos
-    print("\nAtribuindo entregas aos centros mais próximos...")
-    atribuir_entregas_aos_centros(centros, entregas)
+        if paralelo and not setores and not tempo_lns:
+            # 6 e 7. Carregamento e rotas de cada centro em um processo separado
+            with etapa('resolver_centros_em_paralelo'):
+                eventos_atribuicao, eventos_rotas = resolver_centros_em_paralelo(
+                    centros, grafo, entregas, processos, melhorar=melhorar_rotas, economias=economias,
+                    nivel=verbosidade, estatisticas=estatisticas)
+            relatorio.registrar('secao', "Atribuindo entregas aos caminhões...")
+            relatorio.estender(eventos_atribuicao)
+            relatorio.registrar('secao', "Calculando rotas ótimas para cada caminhão...")
+            relatorio.estender(eventos_rotas)
+        else:
+            # 6. Atribuir entregas aos caminhões considerando prazo e limite de horas
+            relatorio.registrar('secao', "Atribuindo entregas aos caminhões...")
+            with etapa('atribuir_caminhoes'):
+                if setores:
+                    atribuir_entregas_por_setores(centros, grafo, cache, processos=processos if paralelo else 1,
+                                                  economias=economias, relatorio=relatorio)
+                elif economias:
+                    atribuir_entregas_por_economias(centros, grafo, cache, relatorio=relatorio)
+                else:
+                    atribuir_entregas_aos_caminhoes(centros, grafo, entregas, cache, relatorio)
 
-    # 6. Atribuir entregas aos caminhões considerando prazo e limite de horas
-    print("\nAtribuindo entregas aos caminhões...")
-    atribuir_entregas_aos_caminhoes(centros, grafo, entregas)
+            if tempo_lns:
+                with etapa('busca_grande_vizinhanca'):
+                    otimizar_por_grande_vizinhanca(centros, grafo, cache, tempo_lns,
+                                                   processos=processos if paralelo else 1,
+                                                   economias=economias, relatorio=relatorio)
 
-    # 7. Calcular rotas para cada caminhão com exibição detalhada
-    print("\nCalculando rotas ótimas para cada caminhão...")
-    for centro in centros:
-        for caminhao in centro.caminhoes:
-            if hasattr(caminhao, 'entregas') and caminhao.entregas:
-                caminhao.rota = calcular_rota_caminhao(grafo, caminhao, centro, centros, entregas)
+            # 7. Calcular rotas para cada caminhão com exibição detalhada
+            relatorio.registrar('secao', "Calculando rotas ótimas para cada caminhão...")
+            with etapa('calcular_rotas'):
+                if setores or tempo_lns:
+                    calcular_rotas_por_setores(centros, grafo, cache, registro, melhorar=melhorar_rotas,
+                                               relatorio=relatorio)
+                else:
+                    for centro in centros:
+                        for caminhao in centro.caminhoes:
+                            if hasattr(caminhao, 'entregas') and caminhao.entregas:
+                                caminhao.rota = calcular_rota_caminhao(grafo, caminhao, centro, centros, entregas,
+                                                                       cache, registro, melhorar=melhorar_rotas,
+                                                                       manter_ordem=economias, relatorio=relatorio)
 
-    print("\nOtimização de rotas concluída!")
+    relatorio.registrar('secao', "Otimização de rotas concluída!")
     fim = datetime.datetime.now()
     diferenca = fim - inicio
 
-    print(f"Tempo de execução: {diferenca.total_seconds()} segundos")
+    relatorio.registrar('mensagem', f"Tempo de execução: {diferenca.total_seconds()} segundos")
+    if not paralelo or setores or tempo_lns:
+        relatorio.registrar('mensagem', f"Cache de caminhos: {cache.acertos} acertos, {cache.falhas} falhas")
+    if estatisticas is not None:
+        relatorio.registrar('mensagem', estatisticas.resumo())
+
+    if arquivo_relatorio:
+        relatorio.salvar(arquivo_relatorio, formato_relatorio)
+    else:
+        relatorio.escrever_texto()
 
     # 8. Mostrar visualização com pygame
-    print("\nExibindo visualização gráfica...")
-    desenhar_mapa(centros, entregas, mostrar_rotas=True)
+    if verbosidade > SILENCIOSO:
+        print("\nExibindo visualização gráfica...")
+    desenhar_mapa(centros, entregas, mostrar_rotas=True, arquivo_png=arquivo_mapa)
+    
+    return centros, estatisticas
+
+def perfil_de_memoria(funcao):
+    """
+    Envolve a função com o profile do memory_profiler. O módulo só é importado
+    aqui, quando o perfil de memória é pedido, e não a cada execução.
+    """
+    from memory_profiler import profile
+    return profile(funcao)
 
 if __name__ == "__main__":
-    resolver_problema()
\ No newline at end of file
+    # PERFIL_MEMORIA=1 python main.py (ou mprof run main.py) ativa o perfil de memória
+    if os.environ.get("PERFIL_MEMORIA"):
+        perfil_de_memoria(resolver_problema)()
+    else:
+        resolver_problema()
@@ -0,0 +1,346 @@
+"""
+Malha viária real para o cálculo das rotas.
+
+No grafo completo de Haversine o caminho mais curto é sempre a aresta direta;
+com a malha viária os caminhões seguem as vias. A malha é lida de:
+
+- um CSV de arestas com as colunas lat_origem, lon_origem, lat_destino e
+  lon_destino e, opcionalmente, comprimento_km (padrão: linha reta entre as
+  pontas), velocidade_kmh e mao_unica (1 = só no sentido origem -> destino);
+- um extrato do OpenStreetMap em XML (.osm), do qual são usadas as vias
+  (ways) com a tag highway transitáveis por caminhão, com as tags oneway e
+  maxspeed. Arquivos .pbf podem ser convertidos antes com osmium cat.
+
+Os nós da malha são tuplas (latitude, longitude), como no resto do projeto,
+então a MalhaViaria é um grafo em dicionário comum: dijkstra (inclusive com
+algoritmo='astar' ou 'bidirecional'), CacheCaminhos e as rotinas de
+algoritmos.py a aceitam sem mudanças. Os centros e as entregas são ligados ao
+nó da malha mais próximo por um trecho em linha reta (construir_grafo_viario).
+
+Exemplo:
+    malha = carregar_malha('malha_sp.osm')
+    grafo = construir_grafo_viario(centros, entregas, malha)
+    caminho = dijkstra(grafo, centro.localizacao, entrega.destino_localizacao, algoritmo='astar')
+"""
+from typing import Dict, List, Tuple
+import csv
+import math
+import re
+import xml.etree.ElementTree as ET
+import numpy as np
+from models import CentroDistribuicao, Entrega
+from grafo import calcular_distancia, coordenadas_esfera
+from relatorio import Relatorio, relatorio_padrao
+
+# Colunas obrigatórias do CSV de arestas
+COLUNAS_MALHA = ('lat_origem', 'lon_origem', 'lat_destino', 'lon_destino')
+
+# Velocidade (km/h) por tipo de via do OpenStreetMap quando a via não tem maxspeed
+VELOCIDADES_OSM = {
+    'motorway': 100.0, 'motorway_link': 60.0, 'trunk': 80.0, 'trunk_link': 50.0,
+    'primary': 60.0, 'primary_link': 40.0, 'secondary': 50.0, 'secondary_link': 40.0,
+    'tertiary': 40.0, 'tertiary_link': 30.0, 'unclassified': 30.0, 'residential': 30.0,
+    'living_street': 10.0, 'service': 20.0, 'road': 30.0,
+}
+
+Ponto = Tuple[float, float]
+
+class MalhaViaria(dict):
+    """
+    Grafo em dicionário {nó: {vizinho: comprimento_km}} de uma malha viária,
+    com os dados que as buscas de grafo.py usam quando existem:
+
+    - reverso: arestas invertidas, usadas pelo Dijkstra bidirecional (é a
+      própria malha enquanto não houver vias de mão única);
+    - fator_heuristica: menor razão comprimento / linha reta entre as vias,
+      que mantém a heurística do A* admissível se o arquivo tiver vias mais
+      curtas que a distância de Haversine entre as pontas;
+    - velocidades: velocidade máxima (km/h) de cada aresta (origem, destino),
+      quando informada no arquivo.
+    """
+    def __init__(self):
+        super().__init__()
+        self.reverso: Dict[Ponto, Dict[Ponto, float]] = self
+        self.fator_heuristica = 1.0
+        self.velocidades: Dict[Tuple[Ponto, Ponto], float] = {}
+        self.vias_mao_unica = 0
+
+    def num_arestas(self) -> int:
+        """Número de arestas dirigidas"""
+        return sum(len(vizinhos) for vizinhos in self.values())
+
+    def _ligar(self, origem: Ponto, destino: Ponto, comprimento_km: float, velocidade_kmh: float) -> None:
+        self.setdefault(origem, {})
+        self.setdefault(destino, {})
+        # Vias paralelas entre os mesmos nós: fica a mais curta
+        if comprimento_km >= self[origem].get(destino, math.inf):
+            return
+        self[origem][destino] = comprimento_km
+        if self.reverso is not self:
+            self.reverso.setdefault(origem, {})
+            self.reverso.setdefault(destino, {})[origem] = comprimento_km
+        if velocidade_kmh:
+            self.velocidades[(origem, destino)] = velocidade_kmh
+
+    def adicionar_via(self, origem: Ponto, destino: Ponto, comprimento_km: float = None,
+                      velocidade_kmh: float = None, mao_unica: bool = False) -> None:
+        """
+        Adiciona uma via entre dois nós (nos dois sentidos, salvo mao_unica).
+
+        Args:
+            origem: Nó (latitude, longitude) de origem
+            destino: Nó (latitude, longitude) de destino
+            comprimento_km: Comprimento da via; se None, a linha reta entre os nós
+            velocidade_kmh: Velocidade máxima da via, se conhecida
+            mao_unica: Se True, só o sentido origem -> destino é transitável
+        """
+        if origem == destino:
+            return
+        linha_reta = calcular_distancia(origem, destino)
+        if comprimento_km is None:
+            comprimento_km = linha_reta
+        elif linha_reta > 0:
+            self.fator_heuristica = min(self.fator_heuristica, comprimento_km / linha_reta)
+
+        self._ligar(origem, destino, comprimento_km, velocidade_kmh)
+        if mao_unica:
+            self.vias_mao_unica += 1
+        else:
+            self._ligar(destino, origem, comprimento_km, velocidade_kmh)
+
+    def construir_reverso(self) -> None:
+        """Cria o dicionário de arestas invertidas se houver vias de mão única"""
+        if self.vias_mao_unica == 0 or self.reverso is not self:
+            return
+        reverso = {no: {} for no in self}
+        for origem, vizinhos in self.items():
+            for destino, comprimento in vizinhos.items():
+                reverso[destino][origem] = comprimento
+        self.reverso = reverso
+
+    def restringir_maior_componente(self) -> int:
+        """
+        Mantém só a maior componente fortemente conexa, para que todo nó
+        alcance todos os outros (vias de mão única podem deixar becos sem saída
+        e trechos isolados no recorte do arquivo).
+
+        Returns:
+            Número de nós removidos
+        """
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        nos = list(self)
+        if not nos:
+            return 0
+        indice = {no: i for i, no in enumerate(nos)}
+        linhas = [indice[origem] for origem, vizinhos in self.items() for _ in vizinhos]
+        colunas = [indice[destino] for vizinhos in self.values() for destino in vizinhos]
+        adjacencia = csr_matrix((np.ones(len(linhas), dtype=np.int8), (linhas, colunas)), shape=(len(nos), len(nos)))
+        _, rotulos = connected_components(adjacencia, directed=True, connection='strong')
+        maior = np.bincount(rotulos).argmax()
+
+        removidos = [nos[i] for i in np.flatnonzero(rotulos != maior).tolist()]
+        fora = set(removidos)
+        for no in removidos:
+            del self[no]
+            if self.reverso is not self:
+                del self.reverso[no]
+        for grafo in ([self] if self.reverso is self else [self, self.reverso]):
+            for vizinhos in grafo.values():
+                for vizinho in [vizinho for vizinho in vizinhos if vizinho in fora]:
+                    del vizinhos[vizinho]
+        if self.velocidades:
+            self.velocidades = {aresta: velocidade for aresta, velocidade in self.velocidades.items()
+                                if aresta[0] not in fora and aresta[1] not in fora}
+        return len(removidos)
+
+    def tempo_caminho(self, caminho: List[Ponto], velocidade_maxima: float) -> float:
+        """
+        Tempo (horas) para percorrer um caminho da malha a velocidade_maxima,
+        respeitando a velocidade de cada via quando ela for menor. Trechos que
+        não são vias da malha (um ponto repetido, por exemplo) contam a linha
+        reta a velocidade_maxima, como em algoritmos.estimar_tempo_rota.
+        """
+        horas = 0.0
+        for origem, destino in zip(caminho, caminho[1:]):
+            comprimento = self.get(origem, {}).get(destino)
+            if comprimento is None:
+                horas += calcular_distancia(origem, destino) / velocidade_maxima
+                continue
+            velocidade = min(self.velocidades.get((origem, destino), velocidade_maxima), velocidade_maxima)
+            horas += comprimento / velocidade
+        return horas
+
+def _numero(texto: str) -> float:
+    """Converte um campo opcional do CSV (vazio = None)"""
+    texto = texto.strip()
+    return float(texto) if texto else None
+
+def carregar_malha_csv(caminho_arquivo: str, erros: List[Tuple[int, str]] = None) -> MalhaViaria:
+    """
+    Lê a malha de um CSV de arestas (ver COLUNAS_MALHA e a descrição do módulo).
+
+    Linhas mal formadas são ignoradas e, se a lista erros for informada,
+    registradas nela como (número da linha, motivo), como em carregamento.py.
+
+    Returns:
+        MalhaViaria com as vias do arquivo
+    """
+    malha = MalhaViaria()
+    with open(caminho_arquivo, 'r', encoding='utf-8', newline='') as arquivo:
+        leitor = csv.reader(arquivo)
+        cabecalho = [nome.strip() for nome in next(leitor, [])]
+        posicoes = {nome: i for i, nome in enumerate(cabecalho) if nome}
+        for coluna in COLUNAS_MALHA:
+            if coluna not in posicoes:
+                raise KeyError(coluna)
+        i_comprimento = posicoes.get('comprimento_km')
+        i_velocidade = posicoes.get('velocidade_kmh')
+        i_mao_unica = posicoes.get('mao_unica')
+
+        for campos in leitor:
+            if not campos:
+                continue
+            try:
+                origem = (float(campos[posicoes['lat_origem']]), float(campos[posicoes['lon_origem']]))
+                destino = (float(campos[posicoes['lat_destino']]), float(campos[posicoes['lon_destino']]))
+                comprimento = _numero(campos[i_comprimento]) if i_comprimento is not None else None
+                velocidade = _numero(campos[i_velocidade]) if i_velocidade is not None else None
+                mao_unica = i_mao_unica is not None and campos[i_mao_unica].strip() in ('1', 'sim', 'true')
+                if comprimento is not None and comprimento < 0:
+                    raise ValueError(f"comprimento negativo: {comprimento}")
+            except (ValueError, IndexError) as e:
+                if erros is not None:
+                    erros.append((leitor.line_num, str(e)))
+                continue
+            malha.adicionar_via(origem, destino, comprimento, velocidade, mao_unica)
+
+    malha.construir_reverso()
+    return malha
+
+def _velocidade_osm(maxspeed: str, tipo_via: str) -> float:
+    """Velocidade da tag maxspeed ('60', '40 mph'); se ausente ou simbólica, a do tipo de via"""
+    if maxspeed:
+        numero = re.match(r'\s*(\d+(?:\.\d+)?)\s*(mph)?', maxspeed)
+        if numero:
+            velocidade = float(numero.group(1))
+            return velocidade * 1.609344 if numero.group(2) else velocidade
+    return VELOCIDADES_OSM[tipo_via]
+
+def carregar_malha_osm(caminho_arquivo: str) -> MalhaViaria:
+    """
+    Lê a malha de um extrato do OpenStreetMap em XML, em fluxo (iterparse),
+    descartando cada elemento depois de lido; só as coordenadas dos nós ficam
+    na memória até o fim da leitura.
+
+    Cada par de nós consecutivos de uma via vira uma aresta com o comprimento
+    em linha reta entre eles. oneway=yes/1/true (e rotatórias) dá mão única no
+    sentido da via; oneway=-1, no sentido contrário.
+
+    Returns:
+        MalhaViaria com as vias transitáveis do arquivo
+    """
+    malha = MalhaViaria()
+    coordenadas: Dict[str, Ponto] = {}
+
+    raiz = None
+    for evento, elemento in ET.iterparse(caminho_arquivo, events=('start', 'end')):
+        if evento == 'start':
+            if raiz is None:
+                raiz = elemento
+            continue
+        if elemento.tag == 'node':
+            coordenadas[elemento.get('id')] = (float(elemento.get('lat')), float(elemento.get('lon')))
+            raiz.clear()
+        elif elemento.tag == 'way':
+            tags = {tag.get('k'): tag.get('v') for tag in elemento.iter('tag')}
+            tipo_via = tags.get('highway')
+            if tipo_via in VELOCIDADES_OSM:
+                nos = [coordenadas[nd.get('ref')] for nd in elemento.iter('nd') if nd.get('ref') in coordenadas]
+                sentido = tags.get('oneway', '')
+                mao_unica = sentido in ('yes', '1', 'true', '-1') or tags.get('junction') == 'roundabout'
+                if sentido == '-1':
+                    nos.reverse()
+                velocidade = _velocidade_osm(tags.get('maxspeed'), tipo_via)
+                for origem, destino in zip(nos, nos[1:]):
+                    malha.adicionar_via(origem, destino, velocidade_kmh=velocidade, mao_unica=mao_unica)
+            raiz.clear()
+        elif elemento.tag == 'relation':
+            raiz.clear()
+
+    malha.construir_reverso()
+    return malha
+
+def carregar_malha(caminho_arquivo: str, maior_componente: bool = True, relatorio: Relatorio = None) -> MalhaViaria:
+    """
+    Lê a malha viária de um CSV de arestas (.csv) ou de um extrato OSM (.osm/.xml).
+
+    Args:
+        caminho_arquivo: Caminho do arquivo
+        maior_componente: Se True, descarta os nós fora da maior componente
+            fortemente conexa (ver MalhaViaria.restringir_maior_componente)
+        relatorio: Relatório que recebe o resumo da malha carregada (padrão: imprime na hora)
+
+    Returns:
+        MalhaViaria
+    """
+    extensao = caminho_arquivo.lower().rsplit('.', 1)[-1]
+    if extensao == 'csv':
+        malha = carregar_malha_csv(caminho_arquivo)
+    elif extensao in ('osm', 'xml'):
+        malha = carregar_malha_osm(caminho_arquivo)
+    else:
+        raise ValueError(f"Formato de malha viária não suportado: {caminho_arquivo}")
+
+    removidos = malha.restringir_maior_componente() if maior_componente else 0
+    relatorio_padrao(relatorio).registrar(
+        'mensagem', f"Malha viária carregada: {len(malha)} nós, {malha.num_arestas()} arestas"
+        + (f" ({removidos} nós fora da maior componente descartados)" if removidos else ""))
+    return malha
+
+def ligar_locais(malha: MalhaViaria, pontos: List[Ponto]) -> Dict[Ponto, Tuple[Ponto, float]]:
+    """
+    Liga cada ponto ao nó da malha mais próximo (KD-tree sobre as coordenadas
+    na esfera) por um trecho em linha reta nos dois sentidos. Pontos que já
+    são nós da malha ficam como estão.
+
+    Returns:
+        Dicionário ponto -> (nó da malha, distância da ligação em km)
+    """
+    from scipy.spatial import cKDTree
+
+    nos = list(malha)
+    if not nos:
+        raise ValueError("A malha viária está vazia")
+    arvore = cKDTree(coordenadas_esfera(nos))
+
+    novos = [ponto for ponto in dict.fromkeys(pontos) if ponto not in malha]
+    ligacoes = {ponto: (ponto, 0.0) for ponto in pontos if ponto in malha}
+    if novos:
+        _, vizinhos = arvore.query(coordenadas_esfera(novos), k=1)
+        for ponto, i in zip(novos, np.atleast_1d(vizinhos).tolist()):
+            no = nos[i]
+            malha.adicionar_via(ponto, no)
+            ligacoes[ponto] = (no, malha[ponto][no])
+    return ligacoes
+
+def construir_grafo_viario(centros: List[CentroDistribuicao], entregas: List[Entrega],
+                           malha: MalhaViaria, relatorio: Relatorio = None) -> MalhaViaria:
+    """
+    Prepara a malha viária para o problema, no lugar de construir_grafo:
+    liga os centros e os destinos das entregas aos nós mais próximos da malha.
+    O resumo das ligações vai para o relatorio (padrão: impresso na hora).
+
+    Returns:
+        A própria malha, com os locais incluídos como nós
+    """
+    pontos = [centro.localizacao for centro in centros] + [entrega.destino_localizacao for entrega in entregas]
+    ligacoes = ligar_locais(malha, pontos)
+    if not ligacoes:
+        return malha
+    distancias = [distancia for _, distancia in ligacoes.values()]
+    relatorio_padrao(relatorio).registrar(
+        'mensagem', f"Locais ligados à malha viária: {len(ligacoes)} "
+        f"(ligação média {sum(distancias) / len(distancias):.2f} km, máxima {max(distancias):.2f} km)")
+    return malha
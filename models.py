@@ -1,6 +1,9 @@
-from typing import Tuple, List
+from typing import Tuple, List, Dict, Sequence
+import numpy as np
 
 class CentroDistribuicao:
+    __slots__ = ('id', 'nome', 'localizacao', 'entregas', 'caminhoes')
+
     def __init__(self, id: int, nome: str, localizacao: Tuple[float, float]):
         self.id = id
         self.nome = nome
@@ -9,6 +12,8 @@ class CentroDistribuicao:
         self.caminhoes: List['Caminhao'] = []
 
 class Entrega:
+    __slots__ = ('id', 'destino_localizacao', 'destino_nome', 'peso', 'prazo')
+
     def __init__(self, id: int, destino_localizacao: Tuple[float, float], destino_nome: str, peso: float, prazo: int):
         self.id = id
         self.destino_localizacao = destino_localizacao
@@ -17,10 +22,109 @@ class Entrega:
         self.prazo = prazo  # Em dias
 
 class Caminhao:
+    __slots__ = ('id', 'capacidade_max', 'velocidade_media', 'limite_de_horas', 'rota', 'entregas')
+
     def __init__(self, id: int, capacidade_max: float, velocidade_media: float = 60.0, limite_de_horas: float = 8.0):
         self.id = id
         self.capacidade_max = capacidade_max
         self.velocidade_media = velocidade_media  # km/h
         self.limite_de_horas = limite_de_horas    # horas por dia
         self.rota: List[Tuple[float, float]] = []
-        self.entregas = []
\ No newline at end of file
+        self.entregas = []
+
+class EntregaBatch:
+    """
+    Conjunto de entregas em colunas (struct-of-arrays): um array tipado por
+    atributo em vez de um objeto Entrega por linha. Os algoritmos podem
+    trabalhar com arrays de índices sobre o lote e só criar objetos Entrega
+    quando precisarem deles.
+    """
+    __slots__ = ('id', 'latitude', 'longitude', 'destino_nome', 'peso', 'prazo')
+
+    def __init__(self, id, latitude, longitude, destino_nome, peso, prazo):
+        self.id = np.asarray(id, dtype=np.int64)
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self.destino_nome = np.asarray(destino_nome, dtype=object)
+        self.peso = np.asarray(peso, dtype=np.float64)
+        self.prazo = np.asarray(prazo, dtype=np.int64)  # Em dias (int64, o tipo do carregador colunar)
+
+    @classmethod
+    def de_entregas(cls, entregas: Sequence[Entrega]) -> 'EntregaBatch':
+        """Cria o lote a partir de uma lista de objetos Entrega"""
+        return cls(
+            id=[e.id for e in entregas],
+            latitude=[e.destino_localizacao[0] for e in entregas],
+            longitude=[e.destino_localizacao[1] for e in entregas],
+            destino_nome=[e.destino_nome for e in entregas],
+            peso=[e.peso for e in entregas],
+            prazo=[e.prazo for e in entregas]
+        )
+
+    @classmethod
+    def de_colunas(cls, colunas: Dict[str, Sequence]) -> 'EntregaBatch':
+        """Cria o lote a partir de um dicionário coluna -> valores"""
+        return cls(colunas['id'], colunas['latitude'], colunas['longitude'],
+                   colunas['destino_nome'], colunas['peso'], colunas['prazo'])
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    @property
+    def localizacoes(self) -> np.ndarray:
+        """Array (n, 2) com (latitude, longitude) de cada entrega"""
+        return np.column_stack((self.latitude, self.longitude))
+
+    def subconjunto(self, indices) -> 'EntregaBatch':
+        """Novo lote com as entregas nas posições (ou máscara) indicadas"""
+        return EntregaBatch(self.id[indices], self.latitude[indices], self.longitude[indices],
+                            self.destino_nome[indices], self.peso[indices], self.prazo[indices])
+
+    def entrega(self, i: int) -> Entrega:
+        """Cria o objeto Entrega da posição i"""
+        return Entrega(int(self.id[i]), (float(self.latitude[i]), float(self.longitude[i])),
+                       self.destino_nome[i], float(self.peso[i]), int(self.prazo[i]))
+
+    def para_entregas(self, indices=None) -> List[Entrega]:
+        """Cria objetos Entrega para as posições indicadas (todas, se None)"""
+        if indices is None:
+            indices = range(len(self))
+        return [self.entrega(i) for i in indices]
+
+class Frota:
+    """
+    Caminhões de todos os centros em colunas: capacidade, velocidade, limite
+    de horas e o índice do centro ao qual cada caminhão pertence.
+    """
+    __slots__ = ('id', 'capacidade_max', 'velocidade_media', 'limite_de_horas', 'centro')
+
+    def __init__(self, id, capacidade_max, velocidade_media, limite_de_horas, centro):
+        self.id = np.asarray(id, dtype=np.int64)
+        self.capacidade_max = np.asarray(capacidade_max, dtype=np.float64)
+        self.velocidade_media = np.asarray(velocidade_media, dtype=np.float64)  # km/h
+        self.limite_de_horas = np.asarray(limite_de_horas, dtype=np.float64)    # horas por dia
+        self.centro = np.asarray(centro, dtype=np.int64)
+
+    @classmethod
+    def de_centros(cls, centros: Sequence[CentroDistribuicao]) -> 'Frota':
+        """Cria a frota a partir dos caminhões dos centros (na ordem dos centros)"""
+        caminhoes = [(c, i) for i, centro in enumerate(centros) for c in centro.caminhoes]
+        return cls(
+            id=[c.id for c, _ in caminhoes],
+            capacidade_max=[c.capacidade_max for c, _ in caminhoes],
+            velocidade_media=[c.velocidade_media for c, _ in caminhoes],
+            limite_de_horas=[c.limite_de_horas for c, _ in caminhoes],
+            centro=[i for _, i in caminhoes]
+        )
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def do_centro(self, indice_centro: int) -> np.ndarray:
+        """Índices dos caminhões de um centro"""
+        return np.flatnonzero(self.centro == indice_centro)
+
+    def caminhao(self, i: int) -> Caminhao:
+        """Cria o objeto Caminhao da posição i"""
+        return Caminhao(int(self.id[i]), float(self.capacidade_max[i]),
+                        float(self.velocidade_media[i]), float(self.limite_de_horas[i]))
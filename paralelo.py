@@ -0,0 +1,146 @@
+from typing import Iterator, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+from multiprocessing import shared_memory
+import numpy as np
+from models import CentroDistribuicao, Entrega
+from grafo import GrafoMatriz, CacheCaminhos, RegistroLocais
+from relatorio import Relatorio, Evento, DETALHADO
+from instrumentacao import Estatisticas, coletar
+from algoritmos import atribuir_entregas_aos_caminhoes, calcular_rota_caminhao
+from economias import atribuir_entregas_por_economias
+
+# Estado de cada processo trabalhador, preenchido uma vez pelo inicializador
+_grafo_trabalhador: GrafoMatriz = None
+_cache_trabalhador: CacheCaminhos = None
+_registro_trabalhador: RegistroLocais = None
+_memoria_trabalhador: shared_memory.SharedMemory = None
+
+@contextlib.contextmanager
+def matriz_compartilhada(grafo: GrafoMatriz) -> Iterator[Tuple[str, Tuple[int, int], str]]:
+    """
+    Copia a matriz de distâncias do grafo uma vez para um bloco de memória
+    compartilhada, removido ao sair do bloco with.
+
+    Returns:
+        Tupla (nome do bloco, forma, dtype) para anexar_matriz nos trabalhadores
+    """
+    distancias = np.ascontiguousarray(grafo.distancias)
+    memoria = shared_memory.SharedMemory(create=True, size=max(distancias.nbytes, 1))
+    try:
+        np.ndarray(distancias.shape, dtype=distancias.dtype, buffer=memoria.buf)[:] = distancias
+        yield memoria.name, distancias.shape, distancias.dtype.str
+    finally:
+        memoria.close()
+        memoria.unlink()
+
+def anexar_matriz(nome_memoria: str, forma: Tuple[int, int], dtype: str,
+                  pontos: List[Tuple[float, float]]) -> Tuple[shared_memory.SharedMemory, GrafoMatriz]:
+    """
+    Monta, sem copiar, um GrafoMatriz sobre a matriz em memória compartilhada.
+    O bloco deve ser mantido referenciado enquanto o grafo for usado.
+    """
+    # O bloco é removido pelo processo principal; o trabalhador só o lê
+    memoria = shared_memory.SharedMemory(name=nome_memoria)
+    distancias = np.ndarray(forma, dtype=np.dtype(dtype), buffer=memoria.buf)
+    return memoria, GrafoMatriz(pontos, distancias)
+
+def _inicializar_trabalhador(nome_memoria: str, forma: Tuple[int, int], dtype: str,
+                             pontos: List[Tuple[float, float]], registro: RegistroLocais) -> None:
+    """Monta, sem copiar, o GrafoMatriz do trabalhador sobre a matriz em memória compartilhada"""
+    global _grafo_trabalhador, _cache_trabalhador, _registro_trabalhador, _memoria_trabalhador
+
+    _memoria_trabalhador, _grafo_trabalhador = anexar_matriz(nome_memoria, forma, dtype, pontos)
+    _cache_trabalhador = CacheCaminhos(_grafo_trabalhador)
+    _registro_trabalhador = registro
+
+def _resolver_centro(tarefa: Tuple[int, CentroDistribuicao, bool, bool, int, bool]) -> Tuple[int, List[List[int]], List[List[Tuple[float, float]]], List[int], List[Evento], List[Evento], Estatisticas]:
+    """
+    Resolve um centro no trabalhador: carregamento dos caminhões e cálculo das rotas.
+
+    As entregas são devolvidas como posições na lista centro.entregas recebida,
+    para que o processo principal possa associá-las aos seus próprios objetos.
+    Os eventos do relatório voltam como dados, sem formatação, e as
+    estatísticas do trabalhador (ou None) para serem somadas no processo principal.
+    """
+    indice_centro, centro, melhorar, economias, nivel, instrumentar = tarefa
+    posicoes = {id(entrega): i for i, entrega in enumerate(centro.entregas)}
+
+    estatisticas = Estatisticas() if instrumentar else None
+    with (coletar(estatisticas) if instrumentar else contextlib.nullcontext()):
+        relatorio_atribuicao = Relatorio(nivel)
+        if economias:
+            atribuir_entregas_por_economias([centro], _grafo_trabalhador, _cache_trabalhador,
+                                            relatorio=relatorio_atribuicao)
+        else:
+            atribuir_entregas_aos_caminhoes([centro], _grafo_trabalhador, [], _cache_trabalhador, relatorio_atribuicao)
+
+        relatorio_rotas = Relatorio(nivel)
+        for caminhao in centro.caminhoes:
+            if caminhao.entregas:
+                caminhao.rota = calcular_rota_caminhao(_grafo_trabalhador, caminhao, centro, [], [],
+                                                       _cache_trabalhador, _registro_trabalhador, melhorar=melhorar,
+                                                       manter_ordem=economias, relatorio=relatorio_rotas)
+
+    entregas_por_caminhao = [[posicoes[id(entrega)] for entrega in caminhao.entregas] for caminhao in centro.caminhoes]
+    rotas = [caminhao.rota for caminhao in centro.caminhoes]
+    restantes = [posicoes[id(entrega)] for entrega in centro.entregas]
+    return (indice_centro, entregas_por_caminhao, rotas, restantes,
+            relatorio_atribuicao.eventos, relatorio_rotas.eventos, estatisticas)
+
+def resolver_centros_em_paralelo(centros: List[CentroDistribuicao], grafo: GrafoMatriz, todas_entregas: List[Entrega],
+                                 processos: int = None, melhorar: bool = False,
+                                 economias: bool = False, nivel: int = DETALHADO,
+                                 estatisticas: Estatisticas = None) -> Tuple[List[Evento], List[Evento]]:
+    """
+    Resolve cada centro de distribuição em um processo separado.
+
+    Depois de atribuir_entregas_aos_centros os centros são independentes, então
+    o carregamento dos caminhões e o cálculo das rotas de cada um são enviados a
+    um pool de processos. A matriz de distâncias é colocada uma única vez em
+    memória compartilhada e lida pelos trabalhadores sem cópia (o grafo não é
+    serializado). Os resultados (caminhao.entregas, caminhao.rota e as entregas
+    não atribuídas) são aplicados de volta na ordem dos centros, e os eventos
+    do relatório de cada centro são concatenados nessa mesma ordem, como na
+    versão sequencial.
+
+    Args:
+        centros: Centros com as entregas já atribuídas
+        grafo: Grafo em matriz (construir_grafo_matriz)
+        todas_entregas: Todas as entregas (usadas para nomear os locais)
+        processos: Número de processos (padrão: número de núcleos)
+        melhorar: Aplica 2-opt/Or-opt às rotas
+        economias: Carrega os caminhões com Clarke-Wright (economias.py)
+        nivel: Nível de detalhe dos eventos do relatório (relatorio.py)
+        estatisticas: Se informado, recebe a soma dos contadores dos trabalhadores
+        
+    Returns:
+        Tupla (eventos do carregamento dos caminhões, eventos do cálculo das rotas)
+    """
+    if not isinstance(grafo, GrafoMatriz):
+        raise TypeError("O modo paralelo requer um GrafoMatriz (construir_grafo_matriz)")
+
+    registro = RegistroLocais(centros, todas_entregas, grafo)
+    tarefas = [(i, centro, melhorar, economias, nivel, estatisticas is not None) for i, centro in enumerate(centros)]
+    with matriz_compartilhada(grafo) as (nome_memoria, forma, dtype):
+        with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_trabalhador,
+                                 initargs=(nome_memoria, forma, dtype, grafo.pontos, registro)) as executor:
+            resultados = list(executor.map(_resolver_centro, tarefas))
+
+    # Aplica os resultados na ordem dos centros
+    eventos_atribuicao = []
+    eventos_rotas = []
+    for indice_centro, entregas_por_caminhao, rotas, restantes, atribuicao, rotas_centro, parcial in resultados:
+        centro = centros[indice_centro]
+        entregas_centro = centro.entregas
+        for caminhao, posicoes, rota in zip(centro.caminhoes, entregas_por_caminhao, rotas):
+            caminhao.entregas = [entregas_centro[i] for i in posicoes]
+            caminhao.rota = rota
+        centro.entregas = [entregas_centro[i] for i in restantes]
+
+        if parcial is not None:
+            estatisticas.somar(parcial)
+        eventos_atribuicao.extend(atribuicao)
+        eventos_rotas.extend(rotas_centro)
+
+    return eventos_atribuicao, eventos_rotas
@@ -0,0 +1,133 @@
+from typing import Dict, Iterable, List, TextIO, Tuple
+import csv
+import json
+import sys
+
+# Níveis de detalhe do relatório
+SILENCIOSO = 0
+RESUMO = 1      # seções, avisos e totais de cada rota
+DETALHADO = 2   # uma linha por entrega atribuída e por trecho percorrido
+
+# Tipo de evento -> (nível, campos, modelo do texto)
+TIPOS: Dict[str, Tuple[int, Tuple[str, ...], str]] = {
+    'secao': (RESUMO, ('titulo',), "\n{titulo}"),
+    'mensagem': (RESUMO, ('texto',), "{texto}"),
+    'entrega_centro': (DETALHADO, ('entrega', 'destino', 'centro'),
+                       "Entrega {entrega} para {destino} atribuída ao centro {centro}"),
+    'entrega_caminhao': (DETALHADO, ('entrega', 'caminhao', 'centro'),
+                         "Entrega {entrega} atribuída ao caminhão {caminhao} do centro {centro}"),
+    'excede_capacidade': (DETALHADO, ('entrega', 'caminhao'),
+                          "Entrega {entrega} excede capacidade do caminhão {caminhao}"),
+    'fora_do_prazo': (DETALHADO, ('entrega', 'caminhao'),
+                      "Entrega {entrega} não pode ser entregue a tempo pelo caminhão {caminhao}"),
+    'nao_atribuidas': (RESUMO, ('quantidade', 'centro'),
+                       "AVISO: {quantidade} entregas não puderam ser atribuídas do centro {centro}"),
+    'rota_inicio': (RESUMO, ('caminhao', 'centro', 'velocidade_media', 'limite_de_horas'),
+                    "\n=== DETALHAMENTO DA ROTA PARA O CAMINHÃO {caminhao} DO CENTRO {centro} ===\n"
+                    "Velocidade média: {velocidade_media} km/h, Limite de horas por dia: {limite_de_horas} horas"),
+    'melhoria': (RESUMO, ('caminhao', 'antes_km', 'depois_km'),
+                 "Melhoria 2-opt/Or-opt: {antes_km:.2f} km → {depois_km:.2f} km"),
+    'partida': (DETALHADO, ('caminhao', 'centro', 'ponto'), "Partida: {centro} {ponto}"),
+    'trajeto_entrega': (DETALHADO, ('caminhao', 'entrega', 'destino'), "\nTrajeto para entrega {entrega} ({destino}):"),
+    'trajeto_retorno': (DETALHADO, ('caminhao', 'centro'), "\nRetorno para o centro {centro}:"),
+    'trecho': (DETALHADO, ('caminhao', 'centro', 'origem', 'destino', 'distancia_km'),
+               "  {origem} → {destino} ({distancia_km:.2f} km)"),
+    'rota_fim': (RESUMO, ('caminhao', 'distancia_km', 'tempo_horas', 'dias', 'limite_de_horas', 'entregas'),
+                 "\nDistância total percorrida: {distancia_km:.2f} km\n"
+                 "Tempo estimado: {tempo_horas:.2f} horas\n"
+                 "Dias necessários: {dias:.2f} dias (considerando {limite_de_horas} horas/dia)\n"
+                 "Total de entregas realizadas: {entregas}\n" + "=" * 70),
+}
+
+# Evento registrado: (tipo, valores dos campos na ordem de TIPOS)
+Evento = Tuple[str, tuple]
+
+def formatar_evento(tipo: str, dados: tuple) -> str:
+    """Texto de um evento, como era impresso pelo resolvedor"""
+    _, campos, modelo = TIPOS[tipo]
+    return modelo.format(**dict(zip(campos, dados)))
+
+class Relatorio:
+    """
+    Relatório do resolvedor guardado como eventos estruturados.
+
+    O resolvedor só registra tuplas (tipo, valores); nada é formatado durante
+    o cálculo. O texto, JSON Lines ou CSV é gerado quando pedido, de uma vez.
+    Eventos acima do nível de detalhe são descartados no registro e, nos laços
+    internos, o resolvedor consulta ativo() uma vez para nem montar os valores,
+    de modo que o nível SILENCIOSO não tem custo.
+
+    Com imediato=True cada evento é escrito em sys.stdout assim que registrado
+    (comportamento original, com print), útil quando as funções do resolvedor
+    são chamadas sem relatório.
+    """
+
+    def __init__(self, nivel: int = DETALHADO, imediato: bool = False):
+        self.nivel = nivel
+        self.imediato = imediato
+        self.eventos: List[Evento] = []
+
+    def ativo(self, nivel: int) -> bool:
+        """Indica se eventos deste nível são registrados"""
+        return nivel <= self.nivel
+
+    def registrar(self, tipo: str, *dados) -> None:
+        """Registra um evento com os valores dos seus campos (ver TIPOS)"""
+        if TIPOS[tipo][0] > self.nivel:
+            return
+        if self.imediato:
+            print(formatar_evento(tipo, dados))
+        else:
+            self.eventos.append((tipo, dados))
+
+    def estender(self, eventos: Iterable[Evento]) -> None:
+        """Acrescenta eventos registrados em outro relatório (por exemplo, em outro processo)"""
+        for tipo, dados in eventos:
+            self.registrar(tipo, *dados)
+
+    def limpar(self) -> None:
+        """Descarta os eventos registrados"""
+        self.eventos = []
+
+    def texto(self) -> str:
+        """Relatório completo em texto"""
+        if not self.eventos:
+            return ''
+        return '\n'.join(formatar_evento(tipo, dados) for tipo, dados in self.eventos) + '\n'
+
+    def escrever_texto(self, arquivo: TextIO = None) -> None:
+        """Escreve o relatório em texto de uma só vez (padrão: saída padrão)"""
+        (arquivo or sys.stdout).write(self.texto())
+
+    def escrever_jsonl(self, arquivo: TextIO) -> None:
+        """Escreve um objeto JSON por evento, com o campo 'tipo' e os campos do evento"""
+        linhas = []
+        for tipo, dados in self.eventos:
+            registro = {'tipo': tipo}
+            registro.update(zip(TIPOS[tipo][1], dados))
+            linhas.append(json.dumps(registro, ensure_ascii=False))
+        arquivo.write('\n'.join(linhas) + '\n' if linhas else '')
+
+    def escrever_csv(self, arquivo: TextIO, tipo: str = 'trecho') -> None:
+        """Escreve em CSV os eventos de um tipo (padrão: os trechos das rotas)"""
+        escritor = csv.writer(arquivo)
+        escritor.writerow(TIPOS[tipo][1])
+        escritor.writerows(dados for tipo_evento, dados in self.eventos if tipo_evento == tipo)
+
+    def salvar(self, caminho_arquivo: str, formato: str = 'texto') -> None:
+        """
+        Salva o relatório em arquivo.
+
+        Args:
+            caminho_arquivo: Caminho do arquivo de saída
+            formato: 'texto', 'jsonl' ou 'csv' (trechos das rotas)
+        """
+        escritores = {'texto': self.escrever_texto, 'jsonl': self.escrever_jsonl, 'csv': self.escrever_csv}
+        if formato not in escritores:
+            raise ValueError(f"Formato de relatório desconhecido: {formato}")
+        with open(caminho_arquivo, 'w', encoding='utf-8', newline='') as arquivo:
+            escritores[formato](arquivo)
+
+def relatorio_padrao(relatorio: Relatorio = None) -> Relatorio:
+    """Relatório a usar quando nenhum foi informado: imprime cada evento na hora, como antes"""
+    return relatorio if relatorio is not None else Relatorio(imediato=True)
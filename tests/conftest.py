@@ -0,0 +1,21 @@
+import os
+import sys
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from algoritmos import carregar_entregas_csv
+from relatorio import Relatorio, SILENCIOSO
+
+@pytest.fixture(params=['entregas.csv', 'entregas2.csv'])
+def problema(request, monkeypatch):
+    """Centros e caminhões de main.criar_dados_teste com as entregas de um dos CSVs do repositório"""
+    from main import criar_dados_teste
+
+    monkeypatch.chdir(RAIZ)
+    centros, _ = criar_dados_teste(Relatorio(SILENCIOSO))
+    entregas = carregar_entregas_csv(os.path.join(RAIZ, request.param), Relatorio(SILENCIOSO))
+    assert entregas
+    return centros, entregas
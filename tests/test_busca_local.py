@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from busca_local import comprimento_ciclo, melhorar_rota
+
+def _tabela(n, semente, simetrica=True):
+    rng = np.random.default_rng(semente)
+    coordenadas = rng.uniform(0, 100, (n, 2))
+    tabela = np.hypot(*(coordenadas[:, None, :] - coordenadas[None, :, :]).transpose(2, 0, 1))
+    if not simetrica:
+        tabela = tabela * rng.uniform(1.0, 1.5, tabela.shape)
+        np.fill_diagonal(tabela, 0.0)
+    return tabela
+
+@pytest.mark.parametrize('semente', range(5))
+@pytest.mark.parametrize('n', [4, 12, 60])
+def test_melhorar_rota_nunca_aumenta_o_percurso(n, semente):
+    tabela = _tabela(n, semente)
+    ordem = np.random.default_rng(semente + 100).permutation(np.arange(1, n)).tolist()
+
+    nova, antes, depois = melhorar_rota(tabela, ordem)
+    assert sorted(nova) == list(range(1, n))
+    assert antes == pytest.approx(comprimento_ciclo([0] + ordem, tabela))
+    assert depois == pytest.approx(comprimento_ciclo([0] + nova, tabela))
+    assert depois <= antes + 1e-9
+
+def test_cada_movimento_encurta_o_percurso():
+    tabela = _tabela(40, 7)
+    anterior = comprimento_ciclo(list(range(40)), tabela)
+    for iteracoes in range(1, 30):
+        # Cada movimento aplicado tem ganho positivo: mais iterações nunca pioram a rota
+        _, _, depois = melhorar_rota(tabela, max_iteracoes=iteracoes)
+        assert depois <= anterior + 1e-9
+        anterior = depois
+
+def test_tabela_assimetrica_mantem_a_ordem():
+    tabela = _tabela(20, 3, simetrica=False)
+    ordem = list(range(19, 0, -1))
+    nova, antes, depois = melhorar_rota(tabela, ordem)
+    assert nova == ordem
+    assert antes == depois == pytest.approx(comprimento_ciclo([0] + ordem, tabela))
@@ -0,0 +1,71 @@
+import glob
+import os
+import numpy as np
+import pytest
+from cache_distancias import CacheDistancias
+from grafo import GrafoMatriz, calcular_matriz_distancias
+
+def _pontos(n, semente=0):
+    rng = np.random.default_rng(semente)
+    coordenadas = np.column_stack((rng.uniform(-30, 0, n), rng.uniform(-70, -35, n))).round(5)
+    return list(dict.fromkeys(map(tuple, coordenadas.tolist())))
+
+def _confere(grafo: GrafoMatriz, pontos):
+    """A matriz do grafo, reordenada na ordem de pontos, é a calculada do zero"""
+    indices = [grafo.indice[ponto] for ponto in pontos]
+    np.testing.assert_allclose(np.asarray(grafo.distancias)[np.ix_(indices, indices)],
+                               calcular_matriz_distancias(pontos), rtol=1e-12, atol=1e-9)
+
+def test_ida_e_volta_reproduz_a_matriz(tmp_path):
+    pontos = _pontos(120)
+    cache = CacheDistancias(str(tmp_path), tamanho_bloco=32)
+    _confere(cache.grafo(pontos), pontos)
+    assert (cache.falhas, cache.acertos) == (1, 0)
+
+    # Nova execução, com os mesmos pontos em outra ordem: lida do disco, mapeada em memória
+    outra = CacheDistancias(str(tmp_path), tamanho_bloco=32)
+    embaralhados = [pontos[i] for i in np.random.default_rng(1).permutation(len(pontos))]
+    grafo = outra.grafo(embaralhados)
+    assert (outra.falhas, outra.acertos) == (0, 1)
+    assert isinstance(grafo.distancias, np.memmap)
+    _confere(grafo, pontos)
+
+def test_conjunto_maior_estende_a_matriz_gravada(tmp_path):
+    pontos = _pontos(150)
+    cache = CacheDistancias(str(tmp_path), tamanho_bloco=16)
+    cache.grafo(pontos[:100])
+
+    grafo = cache.grafo(pontos)
+    assert cache.extensoes == 1
+    assert grafo.pontos[:100] == pontos[:100]  # O bloco gravado vem primeiro
+    _confere(grafo, pontos)
+
+    # A matriz estendida também fica gravada
+    assert CacheDistancias(str(tmp_path)).grafo(pontos[::-1]).pontos == grafo.pontos
+
+def test_subconjunto_pequeno_demais_nao_e_estendido(tmp_path):
+    pontos = _pontos(100)
+    cache = CacheDistancias(str(tmp_path), fracao_minima_reaproveitada=0.5)
+    cache.grafo(pontos[:20])
+    _confere(cache.grafo(pontos), pontos)
+    assert (cache.extensoes, cache.falhas) == (0, 2)
+
+def test_arquivo_de_pontos_trocado_e_recusado(tmp_path):
+    pontos = _pontos(60)
+    cache = CacheDistancias(str(tmp_path))
+    cache.grafo(pontos)
+    caminho_pontos, = glob.glob(os.path.join(str(tmp_path), '*' + CacheDistancias.EXTENSAO_PONTOS))
+    np.save(caminho_pontos, np.asarray(pontos[::-1], dtype=np.float64))
+
+    outra = CacheDistancias(str(tmp_path))
+    grafo = outra.grafo(pontos)
+    assert outra.acertos == 0
+    _confere(grafo, pontos)
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_dtype_faz_parte_da_chave(tmp_path, dtype):
+    pontos = _pontos(40)
+    grafo = CacheDistancias(str(tmp_path), dtype=dtype).grafo(pontos)
+    assert grafo.distancias.dtype == np.dtype(dtype)
+    assert CacheDistancias(str(tmp_path), dtype=np.float16).chave(pontos) != \
+        CacheDistancias(str(tmp_path), dtype=dtype).chave(pontos)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from benchmark import gerar_cenario
+from models import Caminhao
+from grafo import construir_grafo, construir_grafo_matriz, CacheCaminhos, no_centro, no_entrega
+from algoritmos import atribuir_entregas_aos_centros
+from economias import atribuir_entregas_por_economias, construir_rotas_economias, tabela_distancias
+from insercao import distancia_sequencia
+from relatorio import Relatorio, SILENCIOSO
+
+def _cabe_no_prazo(distancia, caminhao, prazo):
+    # Mesma conta de economias._caminhao_viavel, com folga só para o arredondamento
+    return distancia / caminhao.velocidade_media <= caminhao.limite_de_horas * prazo * (1 + 1e-9)
+
+def _confere_rotas(centros, entregas_por_centro, grafo, cache):
+    for centro, entregas in zip(centros, entregas_por_centro):
+        atendidas = [entrega for caminhao in centro.caminhoes for entrega in caminhao.entregas]
+        # Cada entrega do centro fica em exatamente um caminhão ou entre as não atendidas
+        assert sorted(id(entrega) for entrega in atendidas + centro.entregas) == sorted(map(id, entregas))
+
+        for caminhao in centro.caminhoes:
+            if not caminhao.entregas:
+                continue
+            assert sum(entrega.peso for entrega in caminhao.entregas) <= caminhao.capacidade_max
+            pontos = [no_centro(grafo, centro)] + [no_entrega(grafo, entrega) for entrega in caminhao.entregas]
+            distancia = distancia_sequencia(tabela_distancias(pontos, grafo, cache), 0, range(1, len(pontos)))
+            prazo = min(entrega.prazo for entrega in caminhao.entregas)
+            assert _cabe_no_prazo(distancia, caminhao, prazo), (centro.nome, caminhao.id)
+
+@pytest.mark.parametrize('tipo', ['completo', 'matriz'])
+def test_rotas_respeitam_capacidade_e_prazo(problema, tipo):
+    centros, entregas = problema
+    grafo = construir_grafo_matriz(centros, entregas) if tipo == 'matriz' else construir_grafo(centros, entregas)
+    cache = CacheCaminhos(grafo)
+    atribuir_entregas_aos_centros(centros, entregas, Relatorio(SILENCIOSO))
+    entregas_por_centro = [list(centro.entregas) for centro in centros]
+
+    atribuir_entregas_por_economias(centros, grafo, cache, relatorio=Relatorio(SILENCIOSO))
+    _confere_rotas(centros, entregas_por_centro, grafo, cache)
+    assert any(caminhao.entregas for centro in centros for caminhao in centro.caminhoes)
+
+@pytest.mark.parametrize('max_vizinhos', [None, 5])
+def test_rotas_respeitam_capacidade_e_prazo_em_cenario_gerado(max_vizinhos):
+    centros, entregas = gerar_cenario(600, n_centros=3, prazo=(1, 4), semente=7)
+    grafo = construir_grafo_matriz(centros, entregas)
+    cache = CacheCaminhos(grafo)
+    atribuir_entregas_aos_centros(centros, entregas, Relatorio(SILENCIOSO))
+    entregas_por_centro = [list(centro.entregas) for centro in centros]
+
+    atribuir_entregas_por_economias(centros, grafo, cache, max_vizinhos, relatorio=Relatorio(SILENCIOSO))
+    _confere_rotas(centros, entregas_por_centro, grafo, cache)
+
+@pytest.mark.parametrize('simetrica', [True, False])
+def test_construir_rotas_economias_em_tabela_aleatoria(simetrica):
+    rng = np.random.default_rng(3)
+    n = 40
+    coordenadas = rng.uniform(0, 300, (n + 1, 2))
+    distancias = np.hypot(*(coordenadas[:, None, :] - coordenadas[None, :, :]).transpose(2, 0, 1))
+    if not simetrica:
+        distancias = distancias * rng.uniform(1.0, 1.5, distancias.shape)  # Mão única: ida e volta diferentes
+        np.fill_diagonal(distancias, 0.0)
+    pesos = rng.uniform(50, 400, n).tolist()
+    prazos = rng.integers(1, 3, n).tolist()
+    caminhoes = [Caminhao(1, 1000.0, velocidade_media=80.0, limite_de_horas=8.0),
+                 Caminhao(2, 2500.0, velocidade_media=60.0, limite_de_horas=12.0)]
+
+    rotas = construir_rotas_economias(distancias, pesos, prazos, caminhoes)
+    nos = [no for rota, _, _ in rotas for no in rota]
+    assert len(nos) == len(set(nos))
+    assert any(len(rota) > 1 for rota, _, _ in rotas)
+    for rota, carga, distancia in rotas:
+        assert carga == pytest.approx(sum(pesos[no - 1] for no in rota))
+        # A distância acumulada nas junções é a da rota na ordem de visita (e no sentido dela)
+        assert distancia == pytest.approx(distancia_sequencia(distancias, 0, rota))
+        prazo = min(prazos[no - 1] for no in rota)
+        assert any(carga <= caminhao.capacidade_max and _cabe_no_prazo(distancia, caminhao, prazo)
+                   for caminhao in caminhoes)
@@ -0,0 +1,78 @@
+import math
+import numpy as np
+import pytest
+from grafo import ArvoreCaminhos, construir_grafo_esparso, dijkstra
+from hierarquia import HierarquiaContracao
+from malha_viaria import MalhaViaria
+from relatorio import Relatorio, SILENCIOSO
+
+def _pontos(n, semente):
+    rng = np.random.default_rng(semente)
+    coordenadas = np.column_stack((rng.uniform(-25, -5, n), rng.uniform(-55, -35, n))).round(5)
+    return list(dict.fromkeys(map(tuple, coordenadas.tolist())))
+
+def _comprimento(grafo, caminho):
+    return sum(grafo[origem][destino] for origem, destino in zip(caminho, caminho[1:]))
+
+@pytest.mark.parametrize('semente', [1, 2, 3])
+def test_consultas_iguais_ao_dijkstra_em_grafo_knn(semente):
+    pontos = _pontos(300, semente)
+    grafo = construir_grafo_esparso(pontos, k_vizinhos=4, relatorio=Relatorio(SILENCIOSO))
+    hierarquia = HierarquiaContracao.construir(grafo)
+    rng = np.random.default_rng(semente)
+
+    origens = [pontos[i] for i in rng.choice(len(pontos), 15, replace=False)]
+    destinos = [pontos[i] for i in rng.choice(len(pontos), 15, replace=False)]
+    tabela = hierarquia.tabela(origens, destinos)
+    for i, origem in enumerate(origens):
+        arvore = ArvoreCaminhos(grafo, origem)
+        for j, destino in enumerate(destinos):
+            esperado = arvore.distancia(destino)
+            assert hierarquia.distancia(origem, destino) == pytest.approx(esperado, rel=1e-9, abs=1e-9)
+            assert tabela[i, j] == pytest.approx(esperado, rel=1e-9, abs=1e-9)
+
+            caminho = hierarquia.caminho(origem, destino)
+            assert caminho[0] == origem and caminho[-1] == destino
+            assert _comprimento(grafo, caminho) == pytest.approx(esperado, rel=1e-9, abs=1e-9)
+            assert _comprimento(grafo, caminho) == pytest.approx(_comprimento(grafo, dijkstra(grafo, origem, destino)),
+                                                                 rel=1e-9, abs=1e-9)
+
+def test_consultas_iguais_ao_dijkstra_com_mao_unica():
+    rng = np.random.default_rng(4)
+    pontos = _pontos(150, 4)
+    malha = MalhaViaria()
+    for origem, destino in zip(pontos, pontos[1:] + pontos[:1]):
+        malha.adicionar_via(origem, destino, mao_unica=True)  # Um ciclo de mão única liga todos
+    for _ in range(200):
+        a, b = rng.choice(len(pontos), 2, replace=False)
+        malha.adicionar_via(pontos[a], pontos[b], mao_unica=bool(rng.integers(2)))
+    malha.construir_reverso()
+    hierarquia = HierarquiaContracao.construir(malha)
+
+    for origem in pontos[:10]:
+        arvore = ArvoreCaminhos(malha, origem)
+        for destino in pontos[::7]:
+            esperado = arvore.distancia(destino)
+            assert math.isfinite(esperado)
+            assert hierarquia.distancia(origem, destino) == pytest.approx(esperado, rel=1e-9, abs=1e-9)
+            assert _comprimento(malha, hierarquia.caminho(origem, destino)) == pytest.approx(esperado, rel=1e-9,
+                                                                                            abs=1e-9)
+
+def test_hierarquia_gravada_responde_igual(tmp_path):
+    pontos = _pontos(200, 6)
+    grafo = construir_grafo_esparso(pontos, k_vizinhos=4, relatorio=Relatorio(SILENCIOSO))
+    hierarquia = HierarquiaContracao.construir(grafo)
+    arquivo = str(tmp_path / 'hierarquia.npz')
+    hierarquia.salvar(arquivo)
+    lida = HierarquiaContracao.carregar(arquivo)
+
+    amostra = pontos[::10]
+    np.testing.assert_allclose(lida.tabela(amostra), hierarquia.tabela(amostra))
+    for destino in amostra:
+        assert lida.caminho(pontos[0], destino) == hierarquia.caminho(pontos[0], destino)
+
+def test_grafo_denso_e_recusado():
+    pontos = _pontos(20, 5)
+    grafo = construir_grafo_esparso(pontos, k_vizinhos=19, relatorio=Relatorio(SILENCIOSO))
+    with pytest.raises(ValueError):
+        HierarquiaContracao.construir(grafo)
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from models import CentroDistribuicao, Entrega, Caminhao
+from grafo import construir_grafo, construir_grafo_matriz, CacheCaminhos
+from algoritmos import (INVIAVEL, VIAVEL, atribuir_entregas_aos_caminhoes, atribuir_entregas_aos_centros,
+                        pre_verificar_viabilidade, verificar_viabilidade_entrega)
+from malha_viaria import MalhaViaria, construir_grafo_viario
+from relatorio import Relatorio, SILENCIOSO
+
+def _grafo(tipo, centros, entregas):
+    if tipo == 'matriz':
+        return construir_grafo_matriz(centros, entregas)
+    if tipo == 'knn':
+        return construir_grafo(centros, entregas, k_vizinhos=4, relatorio=Relatorio(SILENCIOSO))
+    return construir_grafo(centros, entregas)
+
+def _limitar_horas(centros, limite_de_horas):
+    """Jornada curta para que parte das combinações caminhão x entrega fique fora do prazo"""
+    if limite_de_horas is not None:
+        for centro in centros:
+            for caminhao in centro.caminhoes:
+                caminhao.limite_de_horas = limite_de_horas
+
+def _atribuir_referencia(centros, grafo, cache):
+    """atribuir_entregas_aos_caminhoes como antes da pré-verificação: verificação exata de cada par"""
+    for centro in centros:
+        centro.entregas.sort(key=lambda e: e.prazo)
+        for caminhao in centro.caminhoes:
+            capacidade_restante = caminhao.capacidade_max
+            caminhao.entregas = []
+            for entrega in centro.entregas[:]:
+                if (entrega.peso <= capacidade_restante and
+                        verificar_viabilidade_entrega(caminhao, entrega, centro, grafo, centros, [], cache)):
+                    caminhao.entregas.append(entrega)
+                    capacidade_restante -= entrega.peso
+                    centro.entregas.remove(entrega)
+
+@pytest.mark.parametrize('limite_de_horas', [None, 1.0])
+@pytest.mark.parametrize('tipo', ['completo', 'matriz', 'knn'])
+def test_mascara_concorda_com_verificacao_exata(problema, tipo, limite_de_horas):
+    centros, entregas = problema
+    _limitar_horas(centros, limite_de_horas)
+    grafo = _grafo(tipo, centros, entregas)
+    cache = CacheCaminhos(grafo)
+    atribuir_entregas_aos_centros(centros, entregas, Relatorio(SILENCIOSO))
+
+    for centro in centros:
+        estados = pre_verificar_viabilidade(centro, centro.entregas, grafo, cache)
+        assert estados.shape == (len(centro.caminhoes), len(centro.entregas))
+        for k, caminhao in enumerate(centro.caminhoes):
+            for i, entrega in enumerate(centro.entregas):
+                exato = verificar_viabilidade_entrega(caminhao, entrega, centro, grafo, centros, [], cache)
+                if estados[k, i] == VIAVEL:
+                    assert exato, (centro.nome, caminhao.id, entrega.id)
+                elif estados[k, i] == INVIAVEL:
+                    assert not exato, (centro.nome, caminhao.id, entrega.id)
+
+@pytest.mark.parametrize('limite_de_horas', [None, 1.0])
+@pytest.mark.parametrize('tipo', ['completo', 'matriz'])
+def test_atribuicao_igual_a_verificacao_par_a_par(problema, tipo, limite_de_horas):
+    centros, entregas = problema
+    _limitar_horas(centros, limite_de_horas)
+    grafo = _grafo(tipo, centros, entregas)
+    cache = CacheCaminhos(grafo)
+    atribuir_entregas_aos_centros(centros, entregas, Relatorio(SILENCIOSO))
+    entregas_por_centro = [list(centro.entregas) for centro in centros]
+
+    atribuir_entregas_aos_caminhoes(centros, grafo, [], cache, Relatorio(SILENCIOSO))
+    obtido = [[[entrega.id for entrega in caminhao.entregas] for caminhao in centro.caminhoes] for centro in centros]
+    sobras = [sorted(entrega.id for entrega in centro.entregas) for centro in centros]
+
+    for centro, lista in zip(centros, entregas_por_centro):
+        centro.entregas = list(lista)
+    _atribuir_referencia(centros, grafo, cache)
+    esperado = [[[entrega.id for entrega in caminhao.entregas] for caminhao in centro.caminhoes] for centro in centros]
+
+    assert obtido == esperado
+    assert sobras == [sorted(entrega.id for entrega in centro.entregas) for centro in centros]
+
+def test_mascara_na_malha_viaria_com_velocidades():
+    rng = np.random.default_rng(0)
+    malha = MalhaViaria()
+    for i in range(15):
+        for j in range(15):
+            ponto = (-10 + i * 0.2, -50 + j * 0.2)
+            if i < 14:
+                malha.adicionar_via(ponto, (-10 + (i + 1) * 0.2, -50 + j * 0.2), velocidade_kmh=20.0)
+            if j < 14:
+                malha.adicionar_via(ponto, (-10 + i * 0.2, -50 + (j + 1) * 0.2))
+    centro = CentroDistribuicao(1, "Centro", (-8.5, -48.5))
+    centro.caminhoes = [Caminhao(1, 1000.0, velocidade_media=80.0, limite_de_horas=2.0),
+                        Caminhao(2, 1000.0, velocidade_media=30.0, limite_de_horas=1.0)]
+    entregas = [Entrega(k, (float(lat), float(lon)), f"Destino {k}", 1.0, 1)
+                for k, (lat, lon) in enumerate(zip(rng.uniform(-10, -7.2, 100), rng.uniform(-50, -47.2, 100)))]
+    grafo = construir_grafo_viario([centro], entregas, malha, Relatorio(SILENCIOSO))
+    cache = CacheCaminhos(grafo)
+
+    estados = pre_verificar_viabilidade(centro, entregas, grafo, cache)
+    exato = np.array([[verificar_viabilidade_entrega(caminhao, entrega, centro, grafo, [centro], [], cache)
+                       for entrega in entregas] for caminhao in centro.caminhoes])
+    assert exato[estados == VIAVEL].all()
+    assert not exato[estados == INVIAVEL].any()
+
+    # As vias lentas pesam: sem elas, mais entregas cabem no prazo
+    malha.velocidades.clear()
+    sem_velocidades = np.array([[verificar_viabilidade_entrega(caminhao, entrega, centro, grafo, [centro], [], cache)
+                                 for entrega in entregas] for caminhao in centro.caminhoes])
+    assert sem_velocidades.sum() > exato.sum()
@@ -0,0 +1,240 @@
+"""
+Varredura de configurações de frota ("e se tivéssemos ...?").
+
+Compara várias frotas para o mesmo conjunto de centros e entregas sem refazer
+o que não depende da frota: o grafo (matriz de distâncias) é construído e as
+entregas são atribuídas aos centros mais próximos uma única vez. Cada
+configuração refaz só o carregamento dos caminhões e o cálculo das rotas, em
+um pool de processos que lê a matriz em memória compartilhada (como em
+paralelo.py) e mantém o cache de caminhos de uma configuração para a outra.
+
+Uma configuração diz, para cada centro (pelo id), a lista de caminhões como
+tuplas (capacidade_max, velocidade_media, limite_de_horas). grade_de_frotas
+monta a grade de todas as combinações de quantidade e parâmetros, com a
+mesma frota em todos os centros.
+
+Exemplo:
+    python varredura.py --quantidades 1 2 3 --capacidades 1000 8000 --limites 8 12 --csv frotas.csv
+"""
+from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import sys
+import time
+from models import CentroDistribuicao, Entrega, Caminhao
+from grafo import GrafoMatriz, CacheCaminhos, RegistroLocais, construir_grafo_matriz, distancia_entre
+from algoritmos import atribuir_entregas_aos_centros, atribuir_entregas_aos_caminhoes, calcular_rota_caminhao
+from economias import atribuir_entregas_por_economias
+from paralelo import matriz_compartilhada, anexar_matriz
+from relatorio import Relatorio, SILENCIOSO
+
+# Caminhões de cada centro: id do centro -> [(capacidade_max, velocidade_media, limite_de_horas), ...]
+ConfiguracaoFrota = Dict[int, List[Tuple[float, float, float]]]
+
+# Colunas da tabela de resultados
+COLUNAS_VARREDURA = ('configuracao', 'frota', 'caminhoes', 'caminhoes_usados', 'distancia_total_km',
+                     'horas_total', 'nao_atribuidas', 'segundos')
+
+# Estado de cada processo trabalhador, preenchido uma vez pelo inicializador
+_grafo_trabalhador: GrafoMatriz = None
+_cache_trabalhador: CacheCaminhos = None
+_registro_trabalhador: RegistroLocais = None
+_centros_trabalhador: List[CentroDistribuicao] = None
+_memoria_trabalhador = None
+
+def grade_de_frotas(centros: List[CentroDistribuicao], quantidades: List[int], capacidades: List[float],
+                    velocidades: List[float], limites: List[float]) -> List[ConfiguracaoFrota]:
+    """
+    Todas as combinações de quantidade de caminhões e parâmetros, com a
+    mesma frota (caminhões iguais) em todos os centros.
+    """
+    return [{centro.id: [(capacidade, velocidade, limite)] * quantidade for centro in centros}
+            for quantidade, capacidade, velocidade, limite
+            in itertools.product(quantidades, capacidades, velocidades, limites)]
+
+def descrever_frota(configuracao: ConfiguracaoFrota) -> str:
+    """Descrição curta, agrupando os centros que têm a mesma frota"""
+    grupos: Dict[Tuple, List[int]] = {}
+    for id_centro, caminhoes in configuracao.items():
+        grupos.setdefault(tuple(caminhoes), []).append(id_centro)
+
+    partes = []
+    for caminhoes, ids in grupos.items():
+        tipos = [f"{caminhoes.count(tipo)}x({tipo[0]:g} kg, {tipo[1]:g} km/h, {tipo[2]:g} h)"
+                 for tipo in dict.fromkeys(caminhoes)] or ["sem caminhões"]
+        prefixo = "" if len(grupos) == 1 else f"centros {','.join(map(str, ids))}: "
+        partes.append(prefixo + " + ".join(tipos))
+    return "; ".join(partes)
+
+def montar_frota(centros: List[CentroDistribuicao], configuracao: ConfiguracaoFrota) -> None:
+    """
+    Cria os caminhões da configuração nos centros, numerados em sequência na
+    ordem dos centros (a mesma numeração de main.criar_dados_teste).
+    """
+    proximo_id = 1
+    for centro in centros:
+        centro.caminhoes = []
+        for capacidade, velocidade, limite in configuracao.get(centro.id, []):
+            centro.caminhoes.append(Caminhao(proximo_id, capacidade, velocidade_media=velocidade,
+                                             limite_de_horas=limite))
+            proximo_id += 1
+
+def _inicializar_trabalhador(nome_memoria: str, forma: Tuple[int, int], dtype: str,
+                             pontos: List[Tuple[float, float]], registro: RegistroLocais,
+                             centros: List[CentroDistribuicao]) -> None:
+    """Monta o grafo sobre a memória compartilhada e guarda os centros com as entregas já atribuídas"""
+    global _grafo_trabalhador, _cache_trabalhador, _registro_trabalhador, _centros_trabalhador, _memoria_trabalhador
+
+    _memoria_trabalhador, _grafo_trabalhador = anexar_matriz(nome_memoria, forma, dtype, pontos)
+    _cache_trabalhador = CacheCaminhos(_grafo_trabalhador)
+    _registro_trabalhador = registro
+    _centros_trabalhador = centros
+
+def avaliar_frota(centros_base: List[CentroDistribuicao], configuracao: ConfiguracaoFrota, grafo: GrafoMatriz,
+                  cache: CacheCaminhos, registro: RegistroLocais, melhorar: bool = False,
+                  economias: bool = False) -> Dict:
+    """
+    Carrega os caminhões da configuração e calcula as rotas, sobre cópias dos
+    centros (as entregas já atribuídas a cada centro não são alteradas).
+
+    Returns:
+        Linha da tabela (ver COLUNAS_VARREDURA), sem 'configuracao'
+    """
+    inicio = time.perf_counter()
+    centros = []
+    for base in centros_base:
+        centro = CentroDistribuicao(base.id, base.nome, base.localizacao)
+        centro.entregas = list(base.entregas)
+        centros.append(centro)
+    montar_frota(centros, configuracao)
+
+    relatorio = Relatorio(SILENCIOSO)
+    if economias:
+        atribuir_entregas_por_economias(centros, grafo, cache, relatorio=relatorio)
+    else:
+        atribuir_entregas_aos_caminhoes(centros, grafo, [], cache, relatorio)
+
+    distancia_total = 0.0
+    horas_total = 0.0
+    usados = 0
+    for centro in centros:
+        for caminhao in centro.caminhoes:
+            if not caminhao.entregas:
+                continue
+            caminhao.rota = calcular_rota_caminhao(grafo, caminhao, centro, centros, [], cache, registro,
+                                                   melhorar=melhorar, manter_ordem=economias, relatorio=relatorio)
+            distancia = sum(distancia_entre(grafo, a, b) for a, b in zip(caminhao.rota, caminhao.rota[1:]))
+            distancia_total += distancia
+            horas_total += distancia / caminhao.velocidade_media
+            usados += 1
+
+    return {
+        'frota': descrever_frota(configuracao),
+        'caminhoes': sum(len(centro.caminhoes) for centro in centros),
+        'caminhoes_usados': usados,
+        'distancia_total_km': round(distancia_total, 2),
+        'horas_total': round(horas_total, 2),
+        'nao_atribuidas': sum(len(centro.entregas) for centro in centros),
+        'segundos': round(time.perf_counter() - inicio, 4)
+    }
+
+def _avaliar_no_trabalhador(tarefa: Tuple[ConfiguracaoFrota, bool, bool]) -> Dict:
+    configuracao, melhorar, economias = tarefa
+    return avaliar_frota(_centros_trabalhador, configuracao, _grafo_trabalhador, _cache_trabalhador,
+                         _registro_trabalhador, melhorar, economias)
+
+def varrer_frotas(centros: List[CentroDistribuicao], entregas: List[Entrega], configuracoes: List[ConfiguracaoFrota],
+                  grafo: GrafoMatriz = None, processos: int = None, melhorar: bool = False,
+                  economias: bool = False) -> List[Dict]:
+    """
+    Avalia cada configuração de frota sobre os mesmos centros e entregas.
+
+    O grafo (se não for informado) e a atribuição das entregas aos centros são
+    calculados uma vez; as configurações são distribuídas entre os processos,
+    e cada processo reaproveita o seu cache de caminhos entre elas. Os
+    caminhões atuais dos centros não são alterados.
+
+    Args:
+        centros: Centros de distribuição
+        entregas: Entregas a distribuir
+        configuracoes: Frotas a comparar (ver grade_de_frotas)
+        grafo: GrafoMatriz já construído (por exemplo, do cache_distancias)
+        processos: Número de processos (padrão: número de núcleos)
+        melhorar: Aplica 2-opt/Or-opt às rotas
+        economias: Carrega os caminhões com Clarke-Wright (economias.py)
+
+    Returns:
+        Uma linha por configuração, na ordem recebida (ver COLUNAS_VARREDURA)
+    """
+    if grafo is None:
+        grafo = construir_grafo_matriz(centros, entregas)
+    if not isinstance(grafo, GrafoMatriz):
+        raise TypeError("A varredura de frotas requer um GrafoMatriz (construir_grafo_matriz)")
+
+    base = [CentroDistribuicao(centro.id, centro.nome, centro.localizacao) for centro in centros]
+    atribuir_entregas_aos_centros(base, entregas, Relatorio(SILENCIOSO))
+    registro = RegistroLocais(centros, entregas, grafo)
+
+    tarefas = [(configuracao, melhorar, economias) for configuracao in configuracoes]
+    with matriz_compartilhada(grafo) as (nome_memoria, forma, dtype):
+        with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_trabalhador,
+                                 initargs=(nome_memoria, forma, dtype, grafo.pontos, registro, base)) as executor:
+            resultados = list(executor.map(_avaliar_no_trabalhador, tarefas))
+
+    for i, linha in enumerate(resultados, start=1):
+        linha['configuracao'] = i
+    return resultados
+
+def imprimir_tabela(resultados: List[Dict]) -> None:
+    """Tabela das configurações, da menor para a maior distância entre as que atendem mais entregas"""
+    print(f"{'#':>3} {'caminhões':>9} {'usados':>6} {'distância km':>13} {'horas':>9} {'não atrib.':>10} {'s':>7}  frota")
+    for linha in sorted(resultados, key=lambda l: (l['nao_atribuidas'], l['distancia_total_km'])):
+        print(f"{linha['configuracao']:>3} {linha['caminhoes']:>9} {linha['caminhoes_usados']:>6} "
+              f"{linha['distancia_total_km']:>13.2f} {linha['horas_total']:>9.2f} {linha['nao_atribuidas']:>10} "
+              f"{linha['segundos']:>7.3f}  {linha['frota']}")
+
+def salvar_csv(resultados: List[Dict], caminho_arquivo: str) -> None:
+    with open(caminho_arquivo, 'w', encoding='utf-8', newline='') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=COLUNAS_VARREDURA)
+        escritor.writeheader()
+        escritor.writerows(resultados)
+
+def main(argumentos: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compara configurações de frota reaproveitando o grafo e a "
+                                                 "atribuição das entregas aos centros")
+    parser.add_argument('--cenario', default=None,
+                        help="Cenário JSON (cenarios.py) com centros e entregas; padrão: os dados de main.py")
+    parser.add_argument('--quantidades', type=int, nargs='+', default=[2], help="Caminhões por centro")
+    parser.add_argument('--capacidades', type=float, nargs='+', default=[8000.0], help="capacidade_max (kg)")
+    parser.add_argument('--velocidades', type=float, nargs='+', default=[60.0], help="velocidade_media (km/h)")
+    parser.add_argument('--limites', type=float, nargs='+', default=[8.0], help="limite_de_horas por dia")
+    parser.add_argument('--processos', type=int, default=None, help="Processos no pool (padrão: núcleos)")
+    parser.add_argument('--melhorar', action='store_true', help="Aplica 2-opt/Or-opt às rotas")
+    parser.add_argument('--economias', action='store_true', help="Carrega os caminhões com Clarke-Wright")
+    parser.add_argument('--csv', default=None, help="Grava a tabela em CSV")
+    args = parser.parse_args(argumentos)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if args.cenario:
+            from cenarios import carregar_cenario
+            _, centros, entregas, _ = carregar_cenario(args.cenario)
+        else:
+            from main import criar_dados_teste
+            centros, entregas = criar_dados_teste()
+
+    configuracoes = grade_de_frotas(centros, args.quantidades, args.capacidades, args.velocidades, args.limites)
+    inicio = time.perf_counter()
+    resultados = varrer_frotas(centros, entregas, configuracoes, processos=args.processos,
+                               melhorar=args.melhorar, economias=args.economias)
+    imprimir_tabela(resultados)
+    print(f"{len(resultados)} configurações em {time.perf_counter() - inicio:.2f} s")
+    if args.csv:
+        salvar_csv(resultados, args.csv)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())